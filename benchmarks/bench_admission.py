@@ -0,0 +1,74 @@
+"""Cost per datagram of DhcpServer.respond() with and without
+the admission filter.
+
+The cases are a single MAC flooding DISCOVERs,
+OFFERs from another server,
+and new clients each sending one DISCOVER,
+which the filter admits and so only adds to.
+
+Run from the repository root with:
+    python -m benchmarks.bench_admission
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.admission import AdmissionFilter
+
+import logging
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import List, Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/14')
+PACKETS = 100_000
+
+
+def packet(
+        opCode: OpCode,
+        transactionId: int,
+        mac: int,
+        messageType: MessageType) -> bytes:
+    return DhcpPacket.fromArgs(
+        opCode,
+        transactionId,
+        0,
+        IPv4Address(0),
+        IPv4Address(0),
+        IPv4Address(0),
+        mac,
+        messageType).encode()
+
+
+def nanosecondsPerPacket(
+        datagrams: List[bytes],
+        admission: Optional[AdmissionFilter]) -> float:
+    server = DhcpServer(
+        INTERFACE, maxTransactions=PACKETS, admission=admission)
+    start = time.perf_counter()
+    for datagram in datagrams:
+        try:
+            server.respond(datagram)
+        except ValueError:
+            pass
+    return (time.perf_counter() - start) / len(datagrams) * 1e9
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    cases = [
+        ('DISCOVER flood of one MAC', [
+            packet(OpCode.REQUEST, i, 1, MessageType.DISCOVER)
+            for i in range(1, PACKETS + 1)]),
+        ('OFFERs of another server', [
+            packet(OpCode.REPLY, i, i, MessageType.OFFER)
+            for i in range(1, PACKETS + 1)]),
+        ('DISCOVERs of new clients', [
+            packet(OpCode.REQUEST, i, i, MessageType.DISCOVER)
+            for i in range(1, PACKETS + 1)]),
+    ]
+    print(f'{"case":<28} {"unfiltered":>12} {"filtered":>12}')
+    for name, datagrams in cases:
+        unfiltered = nanosecondsPerPacket(datagrams, None)
+        filtered = nanosecondsPerPacket(datagrams, AdmissionFilter())
+        print(f'{name:<28} {unfiltered:>9.0f} ns {filtered:>9.0f} ns')
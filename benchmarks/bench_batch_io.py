@@ -0,0 +1,136 @@
+"""Throughput and system calls of the single packet socket loop
+against the batched loop over loopback.
+
+The client sends bursts of DISCOVERs from distinct clients,
+as in a boot storm, and waits for the OFFERs of each burst
+before sending the next. The server process answers
+until it has been idle for a moment.
+
+Run from the repository root with:
+    python -m benchmarks.bench_batch_io
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.batch_io import BatchStats, serveBatched
+
+import logging
+import multiprocessing
+import socket
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Optional, Tuple
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+PACKETS = 50_000
+BURST = 256
+BATCH_SIZES = [1, 16, 64, 256]
+IDLE_TIMEOUT = 0.5
+SOCKET_BUFFER = 8 * 1024 * 1024
+
+Address = Tuple[str, int]
+
+
+def serveSingle(
+        server: DhcpServer,
+        sock: socket.socket,
+        replyAddress: Address,
+        stats: BatchStats) -> None:
+    """The single packet loop of dhcpserver.py, counting system calls."""
+    sock.settimeout(IDLE_TIMEOUT)
+    while True:
+        stats.recvCalls += 1
+        try:
+            packetBytes = sock.recv(4096)
+        except socket.timeout:
+            return
+        stats.packets += 1
+        response = server.recv(DhcpPacket.decode(packetBytes))
+        if response is not None:
+            stats.sendCalls += 1
+            stats.replies += 1
+            sock.sendto(server.encode(response), replyAddress)
+
+
+def runServer(
+        batchSize: Optional[int],
+        ready,
+        results,
+        replyAddress: Address) -> None:
+    logging.disable(logging.CRITICAL)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    sock.bind(('127.0.0.1', 0))
+    server = DhcpServer(INTERFACE, maxTransactions=PACKETS)
+    stats = BatchStats()
+    ready.put(sock.getsockname())
+
+    if batchSize is None:
+        serveSingle(server, sock, replyAddress, stats)
+    else:
+        serveBatched(
+            server, sock, replyAddress, batchSize, stats, IDLE_TIMEOUT)
+    results.put(stats)
+
+
+def run(batchSize: Optional[int]) -> Tuple[BatchStats, int, float]:
+    """Returns the server's stats,
+    the number of replies received and the seconds taken.
+    """
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    client.bind(('127.0.0.1', 0))
+    client.settimeout(IDLE_TIMEOUT / 5)
+
+    ready: multiprocessing.Queue = multiprocessing.Queue()
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=runServer,
+        args=(batchSize, ready, results, client.getsockname()))
+    process.start()
+    serverAddress = ready.get()
+
+    packets = [
+        DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            transactionId,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            IPv4Address(0),
+            transactionId,
+            MessageType.DISCOVER).encode()
+        for transactionId in range(1, PACKETS + 1)]
+
+    received = 0
+    start = time.perf_counter()
+    for burstStart in range(0, PACKETS, BURST):
+        burst = packets[burstStart:burstStart + BURST]
+        for packet in burst:
+            client.sendto(packet, serverAddress)
+        for _ in burst:
+            try:
+                client.recv(4096)
+            except socket.timeout:
+                # the rest of the burst was dropped
+                break
+            received += 1
+    elapsed = time.perf_counter() - start
+
+    stats = results.get()
+    process.join()
+    client.close()
+    return stats, received, elapsed
+
+
+if __name__ == '__main__':
+    print(
+        f'{"loop":>10}  {"handled":>8}  {"replies":>8}  '
+        f'{"replies/sec":>11}  {"syscalls/packet":>15}')
+    for batchSize in [None, *BATCH_SIZES]:
+        stats, received, elapsed = run(batchSize)
+        name = 'single' if batchSize is None else f'batch {batchSize}'
+        print(
+            f'{name:>10}  {stats.packets:>8}  {received:>8}  '
+            f'{received / elapsed:>11.0f}  '
+            f'{stats.syscalls / max(stats.packets, 1):>15.2f}')
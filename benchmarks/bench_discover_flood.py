@@ -0,0 +1,46 @@
+"""Memory held by the server under a flood of DISCOVERs
+that are never followed up with a REQUEST.
+
+Run from the repository root with:
+    python -m benchmarks.bench_discover_flood
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import logging
+import time
+import tracemalloc
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.0/16')
+MAX_TRANSACTIONS = 4096
+FLOOD_SIZE = 200_000
+REPORT_EVERY = 25_000
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    tracemalloc.start()
+    server = DhcpServer(INTERFACE, MAX_TRANSACTIONS)
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    print(f'{"DISCOVERs":>9}  {"KiB held":>8}')
+    start = time.perf_counter()
+    for transactionId in range(1, FLOOD_SIZE + 1):
+        server.recv(DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            transactionId,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            IPv4Address(0),
+            transactionId,
+            MessageType.DISCOVER))
+        if transactionId % REPORT_EVERY == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f'{transactionId:>9}  {(current - baseline) / 1024:>8.0f}')
+
+    elapsed = time.perf_counter() - start
+    print(f'{FLOOD_SIZE / elapsed:.0f} DISCOVERs/sec (traced)')
@@ -0,0 +1,67 @@
+"""DISCOVER + REQUEST exchanges per second
+with logging at WARNING and with structured events.
+
+Run from the repository root with:
+    python -m benchmarks.bench_event_log
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.event_log import BinarySink, EventLog, JsonLinesSink
+
+import io
+import logging
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Optional
+
+INTERFACE = IPv4Interface('10.0.0.0/14')
+EXCHANGES = 50_000
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address,
+        messageType: MessageType) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        IPv4Address(0),
+        mac,
+        messageType)
+
+
+def exchangesPerSecond(events: Optional[EventLog]) -> float:
+    server = DhcpServer(INTERFACE, maxTransactions=EXCHANGES, events=events)
+    discovers = [
+        packet(i, i, IPv4Address(0), MessageType.DISCOVER)
+        for i in range(1, EXCHANGES + 1)]
+
+    start = time.perf_counter()
+    for discover in discovers:
+        offer = server.recv(discover)
+        assert offer is not None
+        server.recv(packet(
+            discover.transactionId,
+            discover.clientHardwareAddr,
+            offer.yourIp,
+            MessageType.REQUEST))
+    return EXCHANGES / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    # a configured but quiet logger as when serving in production
+    logging.basicConfig(level=logging.WARNING, stream=io.StringIO())
+
+    cases = [
+        ('no events', None),
+        ('binary events', EventLog(BinarySink(io.BytesIO()))),
+        ('binary events 1/64', EventLog(BinarySink(io.BytesIO()), 64)),
+        ('JSON lines events', EventLog(JsonLinesSink(io.StringIO()))),
+    ]
+    for name, events in cases:
+        print(f'{name:<20} {exchangesPerSecond(events):>8.0f} exchanges/sec')
@@ -0,0 +1,87 @@
+"""Memory and time of 100k concurrent half-open DISCOVERs,
+clients which are offered an address and never REQUEST it.
+
+The memory traced in the transaction modules while the offers pile up
+is divided by their count,
+then all of them time out in a single sweep.
+
+Run from the repository root with:
+    python -m benchmarks.bench_half_open
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import gc
+import logging
+import time
+import tracemalloc
+from ipaddress import IPv4Address, IPv4Interface
+from typing import List
+
+INTERFACE = IPv4Interface('10.0.0.1/14')
+CLIENTS = 100_000
+TRANSACTION_FILES = ('*/server_transaction.py', '*/transaction_table.py')
+
+
+class Clock:
+    """Clock moved by hand so every offer can be timed out at once."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def discovers() -> List[DhcpPacket]:
+    return [
+        DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            mac,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            IPv4Address(0),
+            mac,
+            MessageType.DISCOVER)
+        for mac in range(1, CLIENTS + 1)]
+
+
+def bytesPerTransaction(packets: List[DhcpPacket]) -> float:
+    """Bytes traced in the transaction modules per half-open DISCOVER."""
+    server = DhcpServer(INTERFACE, maxTransactions=CLIENTS)
+    gc.collect()
+    tracemalloc.start()
+    for packet in packets:
+        server.recv(packet)
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, pattern) for pattern in TRANSACTION_FILES])
+    tracemalloc.stop()
+    assert server.transactionCount == CLIENTS
+    return sum(stat.size for stat in snapshot.statistics('filename')) \
+        / CLIENTS
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    packets = discovers()
+
+    print(f'{bytesPerTransaction(packets):.0f} bytes per transaction')
+
+    clock = Clock()
+    server = DhcpServer(INTERFACE, maxTransactions=CLIENTS, clock=clock)
+    start = time.perf_counter()
+    for packet in packets:
+        server.recv(packet)
+    offer = time.perf_counter() - start
+    assert server.transactionCount == CLIENTS
+    print(f'{offer / CLIENTS * 1e6:.2f} us per DISCOVER')
+
+    clock.now += 3600
+    start = time.perf_counter()
+    server.sweep()
+    timeout = time.perf_counter() - start
+    assert server.transactionCount == 0
+    print(f'{timeout / CLIENTS * 1e6:.2f} us per timeout')
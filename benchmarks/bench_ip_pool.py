@@ -0,0 +1,104 @@
+"""DISCOVER latency as a /16 pool fills up.
+
+The pool is filled in a random order through REQUESTs,
+so the free addresses are scattered across the whole network,
+and the latency of answering a DISCOVER is sampled at each fill level.
+
+Run from the repository root with:
+    python -m benchmarks.bench_ip_pool
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import logging
+import random
+import time
+from typing import Set, Tuple
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.0/16')
+FILL_LEVELS = [0, 10, 25, 50, 75, 90, 95, 99]
+SAMPLES = 200
+
+
+def request(server: DhcpServer, transactionId: int, ip: IPv4Address) -> None:
+    """Lease ip to a fresh client with a REQUEST."""
+    server.recv(DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        INTERFACE.ip,
+        transactionId,
+        MessageType.REQUEST))
+
+
+def discoverLatency(
+        server: DhcpServer,
+        firstId: int) -> Tuple[float, Set[IPv4Address]]:
+    """Mean seconds spent answering a DISCOVER from a new client.
+
+    Every sampled client goes on to REQUEST its offer
+    so the pool is left with no marked IPs.
+    Returns the latency and the IPs leased while sampling.
+    """
+
+    elapsed = 0.0
+    leased: Set[IPv4Address] = set()
+    for transactionId in range(firstId, firstId + SAMPLES):
+        discover = DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            transactionId,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            IPv4Address(0),
+            transactionId,
+            MessageType.DISCOVER)
+
+        start = time.perf_counter()
+        offer = server.recv(discover)
+        elapsed += time.perf_counter() - start
+
+        assert offer is not None
+        server.recv(DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            transactionId,
+            0,
+            IPv4Address(0),
+            offer.yourIp,
+            offer.serverIp,
+            transactionId,
+            MessageType.REQUEST))
+        leased.add(offer.yourIp)
+
+    return elapsed / SAMPLES, leased
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    server = DhcpServer(INTERFACE)
+    hosts = list(INTERFACE.network.hosts())
+    random.seed(0)
+    random.shuffle(hosts)
+
+    poolSize = len(hosts)
+    nextId = 1
+    leased: Set[IPv4Address] = set()
+    print(f'{"fill %":>6}  {"DISCOVER us":>11}')
+    for level in FILL_LEVELS:
+        target = poolSize * level // 100
+        while len(leased) < target:
+            ip = hosts.pop()
+            if ip not in leased:
+                request(server, nextId, ip)
+                nextId += 1
+                leased.add(ip)
+
+        latency, sampled = discoverLatency(server, nextId)
+        leased |= sampled
+        nextId += SAMPLES
+        print(f'{level:>6}  {latency * 1e6:>11.2f}')
@@ -0,0 +1,71 @@
+"""RELEASE and RENEW latency with 100k active leases.
+
+Run from the repository root with:
+    python -m benchmarks.bench_lease_expiry
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import logging
+import random
+import time
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.0/14')
+ACTIVE_LEASES = 100_000
+SAMPLES = 1000
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address,
+        messageType: MessageType) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        INTERFACE.ip,
+        mac,
+        messageType)
+
+
+def lease(
+        server: DhcpServer,
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address) -> None:
+    """Lease ip to mac with a REQUEST."""
+    server.recv(packet(transactionId, mac, ip, MessageType.REQUEST))
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    server = DhcpServer(INTERFACE)
+    hosts = list(INTERFACE.network.hosts())[:ACTIVE_LEASES]
+    for mac, ip in enumerate(hosts, 1):
+        lease(server, mac, mac, ip)
+
+    random.seed(0)
+    sampled = random.sample(range(1, ACTIVE_LEASES + 1), SAMPLES)
+    nextId = ACTIVE_LEASES + 1
+
+    start = time.perf_counter()
+    for mac in sampled:
+        server.recv(packet(nextId, mac, hosts[mac - 1], MessageType.RELEASE))
+        nextId += 1
+    release = (time.perf_counter() - start) / SAMPLES
+
+    start = time.perf_counter()
+    for mac in sampled:
+        lease(server, nextId, mac, hosts[mac - 1])
+        nextId += 1
+    renew = (time.perf_counter() - start) / SAMPLES
+
+    print(f'active leases: {ACTIVE_LEASES}')
+    print(f'RELEASE: {release * 1e6:.2f} us')
+    print(f'RENEW (REQUEST): {renew * 1e6:.2f} us')
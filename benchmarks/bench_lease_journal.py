@@ -0,0 +1,55 @@
+"""Time to restore 1M leases from a lease journal.
+
+A journal is filled with binds for 1M clients through LeaseJournal
+plus a tail of releases and rebinds, compacted into a snapshot
+and then replayed, first on its own and then into a DhcpServer.
+
+Run from the repository root with:
+    python -m benchmarks.bench_lease_journal
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.lease_journal import LeaseJournal
+
+import logging
+import tempfile
+import time
+from ipaddress import IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/12')
+LEASES = 1_000_000
+TAIL = 100_000
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as directory:
+        base = int(INTERFACE.network.network_address) + 2
+        expiry = time.time() + 3600
+
+        journal = LeaseJournal(directory, groupCommitSize=LEASES)
+        start = time.perf_counter()
+        journal.compact([
+            (base + i, i + 1, expiry) for i in range(LEASES)])
+        for i in range(0, TAIL, 2):
+            journal.release(base + i, i + 1)
+            journal.bind(base + i, i + 1, expiry + 60)
+        journal.close()
+        print(
+            f'wrote snapshot of {LEASES} and tail of {TAIL}: '
+            f'{time.perf_counter() - start:.3f} s')
+
+        journal = LeaseJournal(directory)
+        start = time.perf_counter()
+        records = journal.loadColumns()
+        print(
+            f'replayed {len(records.ips)} records: '
+            f'{time.perf_counter() - start:.3f} s')
+
+        start = time.perf_counter()
+        DhcpServer(INTERFACE, journal=journal)
+        print(
+            f'restored DhcpServer (pool setup included): '
+            f'{time.perf_counter() - start:.3f} s')
+        journal.close()
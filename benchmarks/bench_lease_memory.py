@@ -0,0 +1,61 @@
+"""Memory held per lease by a DhcpServer with 1M leases.
+
+The leases are restored from a lease journal,
+the quickest way to fill a server,
+and the memory traced while restoring them is divided by their count.
+The fixed cost of the empty server is reported separately.
+
+Run from the repository root with:
+    python -m benchmarks.bench_lease_memory
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.lease_journal import LeaseJournal
+
+import gc
+import logging
+import tempfile
+import time
+import tracemalloc
+from ipaddress import IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/12')
+LEASES = 1_000_000
+
+
+def tracedServer(journal: LeaseJournal) -> int:
+    """Bytes traced while creating a server from journal."""
+    gc.collect()
+    tracemalloc.start()
+    server = DhcpServer(INTERFACE, journal=journal)
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del server
+    return traced
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as empty:
+        emptyJournal = LeaseJournal(empty)
+        fixed = tracedServer(emptyJournal)
+        emptyJournal.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        base = int(INTERFACE.network.network_address) + 2
+        expiry = time.time() + 3600
+        journal = LeaseJournal(directory)
+        journal.compact([
+            (base + i, 0x020000000000 + i, expiry) for i in range(LEASES)])
+
+        start = time.perf_counter()
+        full = tracedServer(journal)
+        elapsed = time.perf_counter() - start
+        journal.close()
+
+    print(f'empty server:   {fixed / 2**20:>8.1f} MiB')
+    print(f'with {LEASES} leases: {full / 2**20:>8.1f} MiB')
+    print(f'per lease:      {(full - fixed) / LEASES:>8.1f} bytes')
+    print(f'restore (traced): {elapsed:.2f} s')
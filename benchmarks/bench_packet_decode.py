@@ -0,0 +1,70 @@
+"""Packets per second parsed by the incremental DhcpPartialPacket path
+and by the single pass DhcpPacket.decode().
+
+The packet carries the options a typical client REQUEST does.
+
+Run from the repository root with:
+    python -m benchmarks.bench_packet_decode
+"""
+
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import time
+from ipaddress import IPv4Address
+from typing import Callable
+
+ITERATIONS = 100_000
+
+# client identifier, requested IP, max message size, host name,
+# vendor class and parameter request list
+CLIENT_OPTIONS = bytes(
+    [61, 7, 1, 0x01, 0x23, 0x45, 0x67, 0x89, 0xab]
+    + [50, 4, 192, 168, 0, 10]
+    + [57, 2, 0x05, 0xdc]
+    + [12, 8, *b'host-001']
+    + [60, 8, *b'MSFT 5.0']
+    + [55, 10, 1, 3, 6, 15, 31, 33, 43, 44, 46, 47])
+
+
+def parseIncrementally(packet: bytes) -> DhcpPacket:
+    """The parsing loop previously used by dhcpserver.py and DhcpClient."""
+    partialPacket = DhcpPacket.fromPacket(
+        packet[:DhcpPacket.initialPacketSize])
+    offset: int = DhcpPacket.initialPacketSize
+    while partialPacket.bytesNeeded > 0:
+        nextOffset = offset + partialPacket.bytesNeeded
+        partialPacket.parseMore(
+            packet[offset:offset + partialPacket.bytesNeeded])
+        offset = nextOffset
+
+    return partialPacket.packet
+
+
+def packetsPerSecond(
+        parse: Callable[[bytes], DhcpPacket],
+        packet: bytes) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        parse(packet)
+    return ITERATIONS / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    packet = DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        0xdeadbeef,
+        3,
+        IPv4Address(0),
+        IPv4Address('192.168.0.10'),
+        IPv4Address('192.168.0.255'),
+        0x0123456789ab,
+        MessageType.REQUEST,
+        600).encode()
+    # splice the client options in front of the end option
+    packet = packet[:-1] + CLIENT_OPTIONS + packet[-1:]
+
+    incremental = packetsPerSecond(parseIncrementally, packet)
+    singlePass = packetsPerSecond(DhcpPacket.decode, packet)
+    print(f'incremental: {incremental:>10.0f} packets/sec')
+    print(f'single pass: {singlePass:>10.0f} packets/sec')
+    print(f'speedup:     {singlePass / incremental:>10.2f}x')
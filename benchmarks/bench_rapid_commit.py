@@ -0,0 +1,94 @@
+"""Leasing and renewing with DISCOVER/OFFER/REQUEST/ACK
+and with Rapid Commit (option 80).
+
+Every client sends its DISCOVER before any client sends its REQUEST,
+as in a boot storm, so the transactions of the offers pile up.
+Then every client renews its lease with a single REQUEST.
+Packets are those the clients send to the server.
+
+Run from the repository root with:
+    python -m benchmarks.bench_rapid_commit
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import logging
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Any, List, Mapping, Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+CLIENTS = 20_000
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: int,
+        messageType: MessageType,
+        options: Optional[Mapping[int, Any]] = None) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        IPv4Address(0),
+        mac,
+        messageType,
+        options=options)
+
+
+def run(rapidCommit: bool) -> None:
+    server = DhcpServer(INTERFACE, maxTransactions=CLIENTS)
+    options = {80: b''} if rapidCommit else None
+    macs = range(1, CLIENTS + 1)
+    discovers = [
+        packet(mac, mac, 0, MessageType.DISCOVER, options) for mac in macs]
+
+    start = time.perf_counter()
+    replies: List[DhcpPacket] = []
+    for discover in discovers:
+        reply = server.recv(discover)
+        assert reply is not None
+        replies.append(reply)
+    packets = len(discovers)
+    transactions = server.transactionCount
+    if not rapidCommit:
+        for reply in replies:
+            server.recv(packet(
+                reply.transactionId,
+                reply.clientHardwareAddr,
+                reply.yourIpInt,
+                MessageType.REQUEST))
+        packets += len(replies)
+    lease = time.perf_counter() - start
+    assert server.leaseCount == CLIENTS
+
+    renewals = [
+        packet(CLIENTS + reply.transactionId,
+               reply.clientHardwareAddr,
+               reply.yourIpInt,
+               MessageType.REQUEST)
+        for reply in replies]
+    start = time.perf_counter()
+    acks = sum(
+        server.recv(renewal).messageType is MessageType.ACK
+        for renewal in renewals)
+    renew = time.perf_counter() - start
+
+    print(f'  lease: {packets / CLIENTS:.0f} sent per client, '
+          f'{lease / CLIENTS * 1e6:.2f} us per client, '
+          f'{transactions} transactions at the peak')
+    print(f'  renew: 1 sent per client, '
+          f'{renew / CLIENTS * 1e6:.2f} us per client, '
+          f'{acks} ACKs, {server.transactionCount} transactions')
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    print('DISCOVER/OFFER/REQUEST/ACK')
+    run(False)
+    print('Rapid Commit')
+    run(True)
@@ -0,0 +1,83 @@
+"""Packets per second handled one at a time by DhcpServer.recv()
+and in batches by DhcpServer.recvMany().
+
+Every client sends a DISCOVER followed by a REQUEST,
+with the DISCOVERs and REQUESTs of a batch of clients interleaved
+as they would be in a capture of a boot storm.
+
+Run from the repository root with:
+    python -m benchmarks.bench_recv_many
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import logging
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import List, Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+CLIENTS = 50_000
+BATCH_SIZE = 64
+
+
+def discover(transactionId: int) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        IPv4Address(0),
+        IPv4Address(0),
+        transactionId,
+        MessageType.DISCOVER)
+
+
+def request(offer: DhcpPacket) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        offer.transactionId,
+        0,
+        IPv4Address(0),
+        offer.yourIp,
+        offer.serverIp,
+        offer.clientHardwareAddr,
+        MessageType.REQUEST)
+
+
+def replay(batched: bool) -> float:
+    """Returns the packets per second handled."""
+
+    server = DhcpServer(INTERFACE, maxTransactions=CLIENTS)
+    handled = 0
+    start = time.perf_counter()
+    for firstId in range(1, CLIENTS + 1, BATCH_SIZE):
+        discovers = [
+            discover(transactionId)
+            for transactionId in range(
+                firstId, min(firstId + BATCH_SIZE, CLIENTS + 1))]
+        offers: List[Optional[DhcpPacket]]
+        if not batched:
+            offers = [server.recv(packet) for packet in discovers]
+        else:
+            offers = server.recvMany(discovers)
+
+        requests = [request(offer) for offer in offers if offer is not None]
+        if not batched:
+            for packet in requests:
+                server.recv(packet)
+        else:
+            server.recvMany(requests)
+        handled += len(discovers) + len(requests)
+    return handled / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+
+    single = replay(False)
+    batched = replay(True)
+    print(f'recv:     {single:>10.0f} packets/sec')
+    print(f'recvMany: {batched:>10.0f} packets/sec')
+    print(f'speedup:  {batched / single:>10.2f}x')
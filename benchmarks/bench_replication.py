@@ -0,0 +1,226 @@
+"""Replication lag and failover takeover time of an active/active pair.
+
+Two server processes split the clients by MAC hash bucket
+and replicate their leases to each other over TCP.
+Every packet of the clients is sent to both, as a broadcast would be.
+
+After a burst of DISCOVER/OFFER/REQUEST/ACK exchanges
+both servers must know every lease,
+and the lag from queueing a bind to the peer applying it is reported.
+Then the first server is frozen (SIGSTOP), so the second only notices
+by missing heartbeats, and later killed (SIGKILL), closing its connection,
+and the time until the second answers the clients of the first is reported.
+
+Run from the repository root with:
+    python -m benchmarks.bench_replication
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.replication import (
+    LeaseReplication, bucketOf, pairBuckets, servePair)
+from dhcp.sharding import poolSlice
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+SERVER_PORTS = [4500, 4501]
+REPLICATION_PORTS = [4510, 4511]
+REPLY_PORT = 4502
+CLIENTS = 20_000
+# exchanges in flight at once
+WINDOW = 64
+# time for the pair to connect before sending
+STARTUP_DELAY = 2
+# time between the DISCOVERs probing for a takeover
+PROBE_INTERVAL = 0.001
+
+
+def runPairServer(half: int, control: Connection) -> None:
+    """Serve half of the pair, answering stats requests on control."""
+    logging.disable(logging.CRITICAL)
+    replication = LeaseReplication(
+        ('127.0.0.1', REPLICATION_PORTS[half]),
+        ('127.0.0.1', REPLICATION_PORTS[1 - half]))
+    server = DhcpServer(
+        INTERFACE,
+        maxTransactions=CLIENTS,
+        inlineExpiry=False,
+        poolOffsets=poolSlice(INTERFACE.network, half, 2),
+        replication=replication)
+
+    def sendStats() -> None:
+        control.recv()
+        control.send({
+            'leases': server.leaseCount,
+            'recordsSent': replication.recordsSent,
+            'batchesSent': replication.batchesSent,
+            'recordsReceived': replication.recordsReceived,
+            'lagBounds': replication.lag.bounds,
+            'lagCounts': replication.lag.counts,
+            'maxLag': replication.maxLag})
+
+    async def serve() -> None:
+        asyncio.get_running_loop().add_reader(control.fileno(), sendStats)
+        await servePair(
+            server,
+            SERVER_PORTS[half],
+            ('127.0.0.1', REPLY_PORT),
+            replication,
+            half)
+
+    asyncio.run(serve())
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address,
+        messageType: MessageType) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        IPv4Address(0),
+        mac,
+        messageType).encode()
+
+
+def sendToBoth(sock: socket.socket, data: bytes) -> None:
+    for port in SERVER_PORTS:
+        sock.sendto(data, ('127.0.0.1', port))
+
+
+def exchanges(sock: socket.socket) -> int:
+    """Lease an address to every client, WINDOW at a time.
+
+    Returns the number of ACKs.
+    """
+
+    acks = 0
+    for first in range(1, CLIENTS + 1, WINDOW):
+        macs = range(first, min(first + WINDOW, CLIENTS + 1))
+        for mac in macs:
+            sendToBoth(
+                sock, packet(mac, mac, IPv4Address(0), MessageType.DISCOVER))
+        pending = len(macs) * 2
+        while pending:
+            try:
+                reply = DhcpPacket.decode(sock.recv(4096))
+            except socket.timeout:
+                break
+            pending -= 1
+            if reply.messageType is MessageType.OFFER:
+                sendToBoth(sock, packet(
+                    reply.transactionId,
+                    reply.clientHardwareAddr,
+                    reply.yourIp,
+                    MessageType.REQUEST))
+            elif reply.messageType is MessageType.ACK:
+                acks += 1
+    return acks
+
+
+def takeoverTime(sock: socket.socket, firstMac: int) -> float:
+    """Seconds until a client of half 0 gets an OFFER from half 1."""
+    buckets = pairBuckets(0)
+    mac = firstMac
+    start = time.monotonic()
+    sock.settimeout(PROBE_INTERVAL)
+    while True:
+        while bucketOf(mac) not in buckets:
+            mac += 1
+        sock.sendto(
+            packet(
+                mac & 0xffffffff, mac, IPv4Address(0), MessageType.DISCOVER),
+            ('127.0.0.1', SERVER_PORTS[1]))
+        mac += 1
+        try:
+            while True:
+                reply = DhcpPacket.decode(sock.recv(4096))
+                if bucketOf(reply.clientHardwareAddr) in buckets:
+                    sock.settimeout(1)
+                    return time.monotonic() - start
+        except socket.timeout:
+            pass
+
+
+def lagPercentile(stats: Dict[str, Any], percent: float) -> Optional[float]:
+    """Upper bound of the lag bucket holding the percentile."""
+    counts: List[int] = stats['lagCounts']
+    target = sum(counts) * percent / 100
+    cumulative = 0
+    for bound, count in zip(stats['lagBounds'] + [None], counts):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return None
+
+
+def requestStats(control: Connection) -> Dict[str, Any]:
+    control.send('stats')
+    return control.recv()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', REPLY_PORT))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    sock.settimeout(1)
+
+    context = multiprocessing.get_context('fork')
+    controls = []
+    processes = []
+    for half in (0, 1):
+        control, workerControl = context.Pipe()
+        process = context.Process(
+            target=runPairServer, args=(half, workerControl))
+        process.start()
+        controls.append(control)
+        processes.append(process)
+
+    try:
+        time.sleep(STARTUP_DELAY)
+        start = time.perf_counter()
+        acks = exchanges(sock)
+        elapsed = time.perf_counter() - start
+        print(f'{acks} of {CLIENTS} clients leased '
+              f'at {acks / elapsed:.0f} exchanges/sec')
+
+        time.sleep(1)
+        for half, control in enumerate(controls):
+            stats = requestStats(control)
+            print(f'half {half}: {stats["leases"]} leases known, '
+                  f'sent {stats["recordsSent"]} records '
+                  f'in {stats["batchesSent"]} batches (with heartbeats), '
+                  f'applied {stats["recordsReceived"]}')
+            print(f'  replication lag p50 <= {lagPercentile(stats, 50)} s, '
+                  f'p99 <= {lagPercentile(stats, 99)} s, '
+                  f'max {stats["maxLag"] * 1e3:.2f} ms')
+
+        os.kill(processes[0].pid, signal.SIGSTOP)
+        print(f'takeover of a frozen peer: '
+              f'{takeoverTime(sock, 1 << 32) * 1e3:.0f} ms')
+        os.kill(processes[0].pid, signal.SIGCONT)
+        # let the pair reconnect and the first half resume
+        time.sleep(STARTUP_DELAY)
+
+        os.kill(processes[0].pid, signal.SIGKILL)
+        print(f'takeover of a killed peer: '
+              f'{takeoverTime(sock, 2 << 32) * 1e3:.0f} ms')
+    finally:
+        for process in processes:
+            process.kill()
+            process.join()
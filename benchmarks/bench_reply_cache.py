@@ -0,0 +1,86 @@
+"""Replies to retransmitting clients with and without the reply cache.
+
+Every client retransmits both its DISCOVER and its REQUEST once
+before the server's reply reaches it.
+Each NAK sends a client back to DISCOVER,
+which is counted as an extra DISCOVER.
+
+Run from the repository root with:
+    python -m benchmarks.bench_reply_cache
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.reply_cache import ReplyCache
+
+import logging
+import time
+from collections import Counter
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+CLIENTS = 20_000
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address,
+        messageType: MessageType) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        IPv4Address(0),
+        mac,
+        messageType).encode()
+
+
+def run(replyCache: Optional[ReplyCache]) -> None:
+    server = DhcpServer(
+        INTERFACE, maxTransactions=CLIENTS, replyCache=replyCache)
+    replies: Counter = Counter()
+
+    def send(data: bytes) -> Optional[DhcpPacket]:
+        reply = server.respond(data)
+        if reply is None:
+            return None
+        decoded = DhcpPacket.decode(reply)
+        replies[decoded.messageType.name] += 1
+        return decoded
+
+    start = time.perf_counter()
+    extraDiscovers = 0
+    for mac in range(1, CLIENTS + 1):
+        discover = packet(mac, mac, IPv4Address(0), MessageType.DISCOVER)
+        offer = send(discover)
+        retransmitted = send(discover)
+        if retransmitted is not None and (
+                retransmitted.messageType is MessageType.NAK):
+            extraDiscovers += 1
+        if offer is None:
+            continue
+        request = packet(mac, mac, offer.yourIp, MessageType.REQUEST)
+        send(request)
+        retransmitted = send(request)
+        if retransmitted is not None and (
+                retransmitted.messageType is MessageType.NAK):
+            extraDiscovers += 1
+    elapsed = time.perf_counter() - start
+
+    print(f'  {CLIENTS / elapsed:>8.0f} clients/sec, '
+          f'{extraDiscovers} extra DISCOVERs, '
+          f'{server.leaseCount} leases')
+    print('  replies: ' + ', '.join(
+        f'{name} {count}' for name, count in sorted(replies.items())))
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    print('without the reply cache')
+    run(None)
+    print('with the reply cache')
+    run(ReplyCache())
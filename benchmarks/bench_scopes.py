@@ -0,0 +1,113 @@
+"""Routing relayed packets to their scope with 10 to 10000 scopes.
+
+The index of scopes by network is compared with
+scanning the networks of the scopes in turn,
+and the whole cost of answering a relayed DISCOVER is reported
+along with the time to build the scopes.
+The DISCOVERs are spread over every scope,
+so with many scopes most land in one whose state is out of the CPU cache.
+
+Run from the repository root with:
+    python -m benchmarks.bench_scopes
+"""
+
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.scopes import MultiScopeServer
+
+import gc
+import logging
+import random
+import time
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network
+from typing import List
+
+SERVER_INTERFACE = IPv4Interface('192.168.0.1/24')
+SCOPE_COUNTS = [10, 100, 1000, 10_000]
+LOOKUPS = 100_000
+DISCOVERS = 20_000
+
+
+def relayAgents(count: int) -> List[IPv4Interface]:
+    """Interfaces of count relay agents, each on a /24 of 10.0.0.0/8."""
+    return [
+        IPv4Interface(f'{network[1]}/{network.prefixlen}')
+        for network, _ in zip(
+            IPv4Network('10.0.0.0/8').subnets(new_prefix=24), range(count))]
+
+
+def nanosecondsPerScan(
+        agents: List[IPv4Interface],
+        gatewayIps: List[int]) -> float:
+    networks = [
+        (int(agent.network.network_address),
+            int(agent.network.broadcast_address))
+        for agent in agents]
+    start = time.perf_counter()
+    for ip in gatewayIps:
+        for first, last in networks:
+            if first <= ip <= last:
+                break
+    return (time.perf_counter() - start) / len(gatewayIps) * 1e9
+
+
+def nanosecondsPerLookup(
+        server: MultiScopeServer,
+        packets: List[DhcpPacket]) -> float:
+    scopeOf = server.scopeOf
+    start = time.perf_counter()
+    for packet in packets:
+        scopeOf(packet)
+    return (time.perf_counter() - start) / len(packets) * 1e9
+
+
+def nanosecondsPerDiscover(
+        server: MultiScopeServer,
+        datagrams: List[bytes]) -> float:
+    start = time.perf_counter()
+    for datagram in datagrams:
+        server.respond(datagram)
+    return (time.perf_counter() - start) / len(datagrams) * 1e9
+
+
+def discover(mac: int, gatewayIp: int) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        mac,
+        0,
+        IPv4Address(0),
+        IPv4Address(0),
+        IPv4Address(0),
+        mac,
+        MessageType.DISCOVER,
+        gatewayIp=gatewayIp)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    random.seed(0)
+    print(f'{"scopes":>6} {"build":>9} {"scan":>11} {"index":>9} '
+          f'{"DISCOVER":>10}')
+    for count in SCOPE_COUNTS:
+        agents = relayAgents(count)
+        start = time.perf_counter()
+        server = MultiScopeServer(SERVER_INTERFACE.ip)
+        server.addScope(SERVER_INTERFACE)
+        for agent in agents:
+            server.addScope(agent)
+        build = time.perf_counter() - start
+        # as dhcpserver.py does after loading the scopes
+        gc.freeze()
+
+        gatewayIps = [
+            int(random.choice(agents).ip) for _ in range(LOOKUPS)]
+        scan = nanosecondsPerScan(agents, gatewayIps)
+        lookup = nanosecondsPerLookup(
+            server,
+            [discover(mac, ip) for mac, ip in enumerate(gatewayIps, 1)])
+        datagrams = [
+            discover(mac, ip).encode()
+            for mac, ip in enumerate(gatewayIps[:DISCOVERS], 1)]
+        respond = nanosecondsPerDiscover(server, datagrams)
+        print(f'{count:>6} {build:>7.2f} s {scan:>8.0f} ns '
+              f'{lookup:>6.0f} ns {respond:>7.0f} ns')
+        gc.unfreeze()
@@ -0,0 +1,109 @@
+"""Replies per second of 1, 2, 4 and 8 workers sharing a port
+with SO_REUSEPORT.
+
+Sender processes flood the workers with DISCOVERs of distinct MACs
+from many sockets, so the kernel spreads them over the workers
+and most land on a worker not owning their MAC and are forwarded.
+The OFFERs are counted as they arrive.
+Replies can only scale with workers up to the cores left over
+by the senders and this process.
+
+Run from the repository root with:
+    python -m benchmarks.bench_sharding
+"""
+
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.sharding import startWorkers
+
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from typing import List
+
+INTERFACE = IPv4Interface('10.0.0.1/16')
+SERVER_PORT = 4300
+REPLY_PORT = 4301
+WORKER_COUNTS = [1, 2, 4, 8]
+SENDERS = 2
+SOCKETS_PER_SENDER = 16
+DISCOVERS_PER_SENDER = 20_000
+DURATION = 3
+# time for the workers to bind before sending
+STARTUP_DELAY = 1
+
+
+def discovers(sender: int) -> List[bytes]:
+    first = sender * DISCOVERS_PER_SENDER + 1
+    return [
+        DhcpPacket.fromArgs(
+            OpCode.REQUEST,
+            i,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            IPv4Address(0),
+            i,
+            MessageType.DISCOVER).encode()
+        for i in range(first, first + DISCOVERS_PER_SENDER)]
+
+
+def flood(sender: int, until: float) -> None:
+    """Send DISCOVERs round robin over many sockets until time until."""
+    datagrams = discovers(sender)
+    sockets = [
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for _ in range(SOCKETS_PER_SENDER)]
+    address = ('127.0.0.1', SERVER_PORT)
+    i = 0
+    while time.time() < until:
+        for _ in range(1000):
+            try:
+                sockets[i % SOCKETS_PER_SENDER].sendto(
+                    datagrams[i % DISCOVERS_PER_SENDER], address)
+            except OSError:
+                pass
+            i += 1
+
+
+def repliesPerSecond(workers: int) -> float:
+    replySocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    replySocket.bind(('127.0.0.1', REPLY_PORT))
+    replySocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    replySocket.settimeout(0.1)
+    processes = startWorkers(
+        INTERFACE, workers, SERVER_PORT, ('127.0.0.1', REPLY_PORT))
+    try:
+        time.sleep(STARTUP_DELAY)
+        start = time.time()
+        end = start + DURATION
+        senders = [
+            multiprocessing.Process(target=flood, args=(sender, end))
+            for sender in range(SENDERS)]
+        for sender in senders:
+            sender.start()
+
+        replies = 0
+        while time.time() < end:
+            try:
+                replySocket.recv(4096)
+            except socket.timeout:
+                continue
+            replies += 1
+        for sender in senders:
+            sender.join()
+        return replies / (time.time() - start)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        replySocket.close()
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    print(f'{os.cpu_count()} CPUs, {SENDERS} sender processes')
+    for workers in WORKER_COUNTS:
+        print(f'{workers} workers {repliesPerSecond(workers):>10.0f} replies/sec')
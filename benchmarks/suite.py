@@ -0,0 +1,373 @@
+"""Microbenchmark suite of parsing, encoding, allocation, releases
+and whole DISCOVER/OFFER/REQUEST/ACK exchanges.
+
+Every case reports operations per second
+and the p50 and p99 latency of single operations,
+the memory case reports the bytes held per lease.
+The results are compared with a baseline
+and the suite exits with status 1 if any case regressed
+by more than the threshold.
+Only the p50 latency and memory are checked,
+throughput and tail latency swing with every garbage collection
+or noisy neighbour.
+
+The p50 of a case also moves between processes,
+so every run of the timed cases is made in a fresh process
+and the median of their p50s is compared
+with the slowest p50 of the runs of the baseline,
+which is the noise measured when recording it.
+
+Timings are only comparable on the same machine,
+so the baseline is not committed:
+record one on the machine running the check before changing anything.
+
+Run from the repository root with:
+    python -m benchmarks.suite --save
+and after the change with:
+    python -m benchmarks.suite
+"""
+
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.lease_journal import LeaseJournal
+from benchmarks.bench_packet_decode import CLIENT_OPTIONS, parseIncrementally
+
+import argparse
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Any, Callable, Dict, List
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 5
+
+ALLOCATION_INTERFACE = IPv4Interface('10.0.0.1/16')
+ALLOCATION_FILL_LEVELS = [0, 50, 90, 99]
+ALLOCATION_SAMPLES = 500
+RELEASE_INTERFACE = IPv4Interface('10.0.0.1/14')
+RELEASE_LEASES = 100_000
+RELEASE_SAMPLES = 2000
+EXCHANGE_INTERFACE = IPv4Interface('10.0.0.1/16')
+EXCHANGES = 20_000
+CODEC_ITERATIONS = 50_000
+
+Result = Dict[str, float]
+
+
+def measure(run: Callable[[int], Any], iterations: int) -> Result:
+    """Time run(i) for each i in range(iterations)
+    with the garbage collector paused.
+    """
+
+    latencies: List[int] = []
+    perfCounter = time.perf_counter_ns
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(iterations):
+            start = perfCounter()
+            run(i)
+            latencies.append(perfCounter() - start)
+    finally:
+        gc.enable()
+
+    latencies.sort()
+    return {
+        'opsPerSec': iterations * 1e9 / sum(latencies),
+        'p50Us': latencies[iterations // 2] / 1e3,
+        'p99Us': latencies[iterations * 99 // 100] / 1e3}
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: int,
+        messageType: MessageType) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, transactionId, 0, 0, ip, 0, mac, messageType)
+
+
+def leasedServer(interface: IPv4Interface, leases: int) -> DhcpServer:
+    """Server with lease i of the (i + 1)th host address to MAC i + 1."""
+    server = DhcpServer(interface)
+    base = int(interface.network.network_address) + 2
+    for i in range(leases):
+        server.recv(packet(i + 1, i + 1, base + i, MessageType.REQUEST))
+    return server
+
+
+def restoredServer(
+        interface: IPv4Interface,
+        leases: int,
+        directory: str) -> DhcpServer:
+    """Server with the leases of leasedServer()
+    restored from a journal in directory.
+
+    The journal is closed so the server must not lease or release.
+    """
+
+    base = int(interface.network.network_address) + 2
+    expiry = time.time() + 3600
+    journal = LeaseJournal(directory)
+    journal.compact([(base + i, i + 1, expiry) for i in range(leases)])
+    server = DhcpServer(interface, journal=journal)
+    journal.close()
+    return server
+
+
+def codecCases() -> Dict[str, Result]:
+    request = DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        0xdeadbeef,
+        3,
+        IPv4Address(0),
+        IPv4Address('192.168.0.10'),
+        IPv4Address('192.168.0.255'),
+        0x0123456789ab,
+        MessageType.REQUEST,
+        3600)
+    datagram = request.encode() + CLIENT_OPTIONS
+    server = DhcpServer(IPv4Interface('192.168.0.255/24'))
+    offer = packet(1, 1, int(IPv4Address('192.168.0.10')), MessageType.OFFER)
+    offer.opCode = OpCode.REPLY
+    offer.leaseTime = 600
+
+    return {
+        'parse.incremental': measure(
+            lambda i: parseIncrementally(datagram), CODEC_ITERATIONS),
+        'parse.decode': measure(
+            lambda i: DhcpPacket.decode(datagram), CODEC_ITERATIONS),
+        'encode.packet': measure(
+            lambda i: offer.encode(), CODEC_ITERATIONS),
+        'encode.server': measure(
+            lambda i: server.encode(offer), CODEC_ITERATIONS)}
+
+
+def allocationCases() -> Dict[str, Result]:
+    """DISCOVERs from new clients as the pool fills up,
+    each one choosing the next free address.
+
+    Every client goes on to REQUEST its offer, untimed.
+    """
+
+    server = DhcpServer(ALLOCATION_INTERFACE, maxTransactions=1 << 16)
+    poolSize = server.freeCount
+    offers: List[DhcpPacket] = []
+
+    def discover(i: int) -> None:
+        offer = server.recv(packet(i, i, 0, MessageType.DISCOVER))
+        assert offer is not None
+        offers.append(offer)
+
+    def requestOffers() -> None:
+        for offer in offers:
+            server.recv(packet(
+                offer.transactionId,
+                offer.clientHardwareAddr,
+                offer.yourIpInt,
+                MessageType.REQUEST))
+        offers.clear()
+
+    nextId = 1
+    results: Dict[str, Result] = {}
+    for level in ALLOCATION_FILL_LEVELS:
+        while poolSize - server.freeCount < poolSize * level // 100:
+            discover(nextId)
+            requestOffers()
+            nextId += 1
+
+        firstId = nextId
+        results[f'allocate.fill{level}'] = measure(
+            lambda i: discover(firstId + i), ALLOCATION_SAMPLES)
+        requestOffers()
+        nextId += ALLOCATION_SAMPLES
+    return results
+
+
+def releaseCases() -> Dict[str, Result]:
+    server = leasedServer(RELEASE_INTERFACE, RELEASE_LEASES)
+    step = RELEASE_LEASES // RELEASE_SAMPLES
+    return {
+        'release.100k': measure(
+            lambda i: server.recv(packet(
+                RELEASE_LEASES + i, i * step + 1, 0, MessageType.RELEASE)),
+            RELEASE_SAMPLES)}
+
+
+def exchangeCases() -> Dict[str, Result]:
+    """Whole DISCOVER/OFFER/REQUEST/ACK exchanges of new clients."""
+    server = DhcpServer(EXCHANGE_INTERFACE, maxTransactions=EXCHANGES)
+
+    def exchange(i: int) -> None:
+        offer = server.recv(packet(i + 1, i + 1, 0, MessageType.DISCOVER))
+        assert offer is not None
+        server.recv(packet(
+            i + 1, i + 1, offer.yourIpInt, MessageType.REQUEST))
+
+    return {'exchange.dora': measure(exchange, EXCHANGES)}
+
+
+def memoryCases() -> Dict[str, Result]:
+    with tempfile.TemporaryDirectory() as directory:
+        gc.collect()
+        tracemalloc.start()
+        server = restoredServer(RELEASE_INTERFACE, 0, directory)
+        empty, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del server
+
+        gc.collect()
+        tracemalloc.start()
+        server = restoredServer(RELEASE_INTERFACE, RELEASE_LEASES, directory)
+        gc.collect()
+        full, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del server
+
+    return {'memory.lease': {
+        'bytesPerLease': (full - empty) / RELEASE_LEASES}}
+
+
+def timedCases(run: int) -> Dict[str, Result]:
+    """One run of every timed case."""
+    logging.disable(logging.CRITICAL)
+    results: Dict[str, Result] = {}
+    for cases in (codecCases, allocationCases, releaseCases, exchangeCases):
+        results.update(cases())
+    return results
+
+
+def median(values: List[float]) -> float:
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def runSuite(repeat: int) -> Dict[str, Result]:
+    """Run every case, the timed ones repeat times in fresh processes,
+    keeping the median of each field and the slowest p50 as p50MaxUs.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        runs = pool.map(timedCases, range(repeat), chunksize=1)
+
+    results: Dict[str, Result] = {}
+    for name in runs[0]:
+        results[name] = {
+            field: median([run[name][field] for run in runs])
+            for field in runs[0][name]}
+        results[name]['p50MaxUs'] = max(run[name]['p50Us'] for run in runs)
+    results.update(memoryCases())
+    return results
+
+
+def regressions(
+        results: Dict[str, Result],
+        baseline: Dict[str, Result],
+        threshold: float) -> List[str]:
+    """Descriptions of the results worse than baseline by over threshold."""
+    found: List[str] = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if 'p50Us' in result and 'p50MaxUs' in base:
+            if result['p50Us'] > base['p50MaxUs'] * (1 + threshold):
+                found.append(
+                    f'{name}: p50 {result["p50Us"]:.2f} us, '
+                    f'baseline {base["p50Us"]:.2f} us '
+                    f'up to {base["p50MaxUs"]:.2f} us')
+        if 'bytesPerLease' in result and 'bytesPerLease' in base:
+            if result['bytesPerLease'] > base['bytesPerLease'] * (1 + threshold):
+                found.append(
+                    f'{name}: {result["bytesPerLease"]:.1f} bytes/lease, '
+                    f'baseline {base["bytesPerLease"]:.1f}')
+    return found
+
+
+def printResults(
+        results: Dict[str, Result],
+        baseline: Dict[str, Result]) -> None:
+    print(f'{"case":<20} {"ops/sec":>10} {"p50 us":>8} {"p99 us":>8} '
+          f'{"p50 vs baseline":>15}')
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        if 'opsPerSec' in result:
+            change = ''
+            if 'p50Us' in base:
+                change = f'{result["p50Us"] / base["p50Us"] - 1:+.1%}'
+            print(
+                f'{name:<20} {result["opsPerSec"]:>10.0f} '
+                f'{result["p50Us"]:>8.2f} {result["p99Us"]:>8.2f} '
+                f'{change:>15}')
+        else:
+            change = ''
+            if 'bytesPerLease' in base:
+                change = (
+                    f'{result["bytesPerLease"] / base["bytesPerLease"] - 1:+.1%}')
+            print(
+                f'{name:<20} {result["bytesPerLease"]:>10.1f} bytes/lease '
+                f'{change:>15}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--baseline',
+        default=BASELINE_PATH,
+        metavar='FILE',
+        help='baseline JSON to compare with (default: %(default)s)')
+    parser.add_argument(
+        '--save',
+        action='store_true',
+        help='write the results to the baseline instead of comparing')
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help='fraction worse than the baseline that fails '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=DEFAULT_REPEAT,
+        help='runs of each timed case, each in a fresh process, '
+             'to keep the median of (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = runSuite(args.repeat)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+            f.write('\n')
+        printResults(results, {})
+        print(f'Saved the baseline to {args.baseline}')
+        sys.exit(0)
+
+    baseline: Dict[str, Result] = {}
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f'No baseline at {args.baseline}, nothing to compare with')
+
+    printResults(results, baseline)
+    found = regressions(results, baseline, args.threshold)
+    if found:
+        print(f'Regressions over {args.threshold:.0%}:')
+        for regression in found:
+            print(f'  {regression}')
+        sys.exit(1)
@@ -0,0 +1,116 @@
+from dhcp.packet import MessageType, OpCode
+
+from array import array
+from struct import Struct
+
+Seconds = float
+
+DEFAULT_RATE = 2
+DEFAULT_BURST = 10
+# slots of the token buckets, a power of two
+DEFAULT_SLOTS = 1 << 16
+
+
+class AdmissionFilter:
+    """Cheap checks of raw datagrams before they are parsed.
+
+    Datagrams too short to hold option 53, without the magic cookie
+    or sent by a server are dropped.
+    Each MAC is then limited to rate packets per second
+    with bursts of up to burst packets.
+
+    The rate limit is a token bucket kept as the single time
+    its bucket is next full (GCRA) in a direct-mapped table of slots
+    indexed by the low bits of the MAC, its serial number for NICs,
+    so memory is fixed whatever the number of MACs.
+    MACs sharing a slot overwrite each other's bucket,
+    which can only let more packets through, never fewer.
+    """
+
+    __slots__ = (
+        'rate',
+        'burst',
+        'malformed',
+        'fromServers',
+        'rateLimited',
+        '__interval',
+        '__tolerance',
+        '__mask',
+        '__macs',
+        '__fullAt')
+
+    # op, client hardware address, magic cookie
+    # and the type, length and value of the first option
+    __peek = Struct('>B27xQ192x4sBBB')
+    __unpack = __peek.unpack_from
+    __size = __peek.size
+    __magic = bytes([0x63, 0x82, 0x53, 0x63])
+    __requestOp = OpCode.REQUEST.value
+    # message types only ever sent by servers,
+    # renewals are answered statelessly so the ACK older clients
+    # sent to end one is ignored by the server and dropped here too
+    __serverMessageTypes = frozenset([
+        MessageType.OFFER.value,
+        MessageType.ACK.value,
+        MessageType.NAK.value])
+
+    def __init__(
+            self,
+            rate: float = DEFAULT_RATE,
+            burst: int = DEFAULT_BURST,
+            slots: int = DEFAULT_SLOTS):
+        if rate <= 0 or burst < 1:
+            raise ValueError('Rate and burst must be positive')
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError('Slots must be a power of two')
+
+        self.rate = rate
+        self.burst = burst
+        # counts of the datagrams dropped by reason
+        self.malformed = 0
+        self.fromServers = 0
+        self.rateLimited = 0
+
+        # a packet takes one interval worth of tokens
+        self.__interval: Seconds = 1 / rate
+        self.__tolerance: Seconds = (burst - 1) / rate
+        self.__mask = slots - 1
+        self.__macs = array('Q', bytes(8 * slots))
+        # time (absolute) each bucket is full again, 0 if it is full
+        self.__fullAt = array('d', bytes(8 * slots))
+
+    @property
+    def dropped(self) -> int:
+        return self.malformed + self.fromServers + self.rateLimited
+
+    def admit(self, data: bytes, curTime: Seconds) -> bool:
+        """Whether datagram data received at curTime is worth parsing."""
+        if len(data) < AdmissionFilter.__size:
+            self.malformed += 1
+            return False
+        op, mac, magic, option, length, messageType = (
+            AdmissionFilter.__unpack(data))
+        if magic != AdmissionFilter.__magic:
+            self.malformed += 1
+            return False
+        if op != AdmissionFilter.__requestOp or (
+                option == 53 and length == 1
+                and messageType in AdmissionFilter.__serverMessageTypes):
+            self.fromServers += 1
+            return False
+
+        slot = mac & self.__mask
+        fullAtBySlot = self.__fullAt
+        fullAt = fullAtBySlot[slot]
+        if self.__macs[slot] != mac:
+            # the bucket of another MAC
+            self.__macs[slot] = mac
+            fullAt = curTime
+        elif fullAt < curTime:
+            # a full bucket
+            fullAt = curTime
+        elif fullAt - curTime > self.__tolerance:
+            self.rateLimited += 1
+            return False
+        fullAtBySlot[slot] = fullAt + self.__interval
+        return True
@@ -0,0 +1,164 @@
+from dhcp.server import DhcpServer
+
+import asyncio
+import logging
+from typing import (
+    Any, Callable, Generic, List, Optional, Protocol, Sequence, Tuple,
+    TypeVar)
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+Address = Tuple[str, int]
+
+# longest time between sweeps even when nothing is due to expire,
+# as new transactions and leases may have been added since
+MAX_SWEEP_INTERVAL: Seconds = 1
+
+
+class SweptServer(Protocol):
+    """What a DatagramServerProtocol needs of its server."""
+
+    clock: Callable[[], Seconds]
+
+    def sweep(self) -> Optional[Seconds]:
+        ...
+
+
+ServerT = TypeVar('ServerT', bound=SweptServer)
+
+
+class DatagramServerProtocol(asyncio.DatagramProtocol, Generic[ServerT]):
+    """asyncio front end feeding datagrams to a server
+    through handleDatagram(), which subclasses implement.
+
+    Expired transactions and leases are swept by an event loop timer
+    instead of while handling packets,
+    so the server should be created with inlineExpiry disabled.
+    """
+
+    def __init__(self, server: ServerT, replyAddress: Address):
+        self.server = server
+        self.replyAddress = replyAddress
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self.__sweepHandle: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self.__sweep()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self.__sweepHandle is not None:
+            self.__sweepHandle.cancel()
+            self.__sweepHandle = None
+
+    def datagram_received(self, data: bytes, addr: Address) -> None:
+        self.handleDatagram(data, addr)
+
+    def handleDatagram(self, data: bytes, addr: Any) -> None:
+        """Handle a datagram from addr and send the reply, if any."""
+        raise NotImplementedError
+
+    def error_received(self, exc: Exception) -> None:
+        log.error(f'Socket error: {exc}')
+
+    def __sweep(self) -> None:
+        """Sweep the server and schedule the next sweep."""
+        nextDeadline = self.server.sweep()
+        delay = MAX_SWEEP_INTERVAL
+        if nextDeadline is not None:
+            delay = min(max(nextDeadline - self.server.clock(), 0), delay)
+        self.__sweepHandle = asyncio.get_running_loop().call_later(
+            delay, self.__sweep)
+
+
+class DhcpServerProtocol(DatagramServerProtocol[DhcpServer]):
+    """asyncio front end feeding datagrams to a DhcpServer.
+
+    See DatagramServerProtocol.
+    """
+
+    def handleDatagram(self, data: bytes, addr: Any) -> None:
+        try:
+            reply = self.server.respond(data)
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet from {addr}: {ve}')
+            return
+
+        if reply is not None and self.transport is not None:
+            self.transport.sendto(reply, self.replyAddress)
+
+
+# a job run on the event loop every interval seconds, see runPeriodically()
+BackgroundJob = Tuple[Seconds, Callable[[], Optional[Callable[[], Any]]]]
+
+
+async def runPeriodically(
+        interval: Seconds,
+        job: Callable[[], Optional[Callable[[], Any]]]) -> None:
+    """Call job every interval seconds
+    and run the function it returns, if any, in the default executor
+    so a slow write, e.g. fsyncing to disk, never stalls packet handling.
+
+    job runs on the event loop and may use the state of the server,
+    while the function it returns runs on another thread and must not.
+    The next call of job waits for that function to finish,
+    so the functions returned run one at a time in order.
+    """
+
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write = job()
+            if write is not None:
+                await loop.run_in_executor(None, write)
+        except Exception:
+            log.exception('Background job failed')
+
+
+def startBackgroundJobs(
+        backgroundJobs: Sequence[BackgroundJob]) -> List[asyncio.Task]:
+    """Start running every (interval, job) pair of backgroundJobs."""
+    return [
+        asyncio.create_task(runPeriodically(interval, job))
+        for interval, job in backgroundJobs]
+
+
+def journalJobs(server: DhcpServer) -> List[BackgroundJob]:
+    """The background job committing the journal of server, if any,
+    which should have been created with inlineCommit disabled.
+    """
+
+    journal = server.journal
+    if journal is None:
+        return []
+    return [(journal.groupCommitDelay, server.commitJournal)]
+
+
+async def serve(
+        server: DhcpServer,
+        port: int,
+        replyAddress: Address,
+        backgroundJobs: Sequence[BackgroundJob] = ()) -> None:
+    """Serve DHCP on port until cancelled.
+
+    backgroundJobs are pairs of an interval and a job
+    to run periodically alongside the server,
+    e.g. committing its journal, see journalJobs().
+    """
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: DhcpServerProtocol(server, replyAddress),
+        local_addr=('0.0.0.0', port),
+        allow_broadcast=True)
+    log.info(f'Server bound to port {port}')
+
+    tasks = startBackgroundJobs(backgroundJobs)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        transport.close()
@@ -0,0 +1,170 @@
+from dhcp.packet import DhcpPacket
+from dhcp.server import DhcpServer
+
+import logging
+import selectors
+import socket
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+Address = Tuple[str, int]
+
+DEFAULT_BATCH_SIZE = 64
+MAX_PACKET_SIZE = 4096
+
+
+class BatchStats:
+    """Counters of the work done by serveBatched()."""
+
+    def __init__(self):
+        self.batches = 0
+        self.packets = 0
+        self.replies = 0
+        # system calls made, including the recv that found no more packets
+        self.waits = 0
+        self.recvCalls = 0
+        self.sendCalls = 0
+
+    @property
+    def syscalls(self) -> int:
+        return self.waits + self.recvCalls + self.sendCalls
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}('
+            f'batches={self.batches}, '
+            f'packets={self.packets}, '
+            f'replies={self.replies}, '
+            f'waits={self.waits}, '
+            f'recvCalls={self.recvCalls}, '
+            f'sendCalls={self.sendCalls})')
+
+
+class PacketRing:
+    """Preallocated receive buffers for a batch of datagrams."""
+
+    def __init__(
+            self,
+            batchSize: int = DEFAULT_BATCH_SIZE,
+            bufferSize: int = MAX_PACKET_SIZE):
+        if batchSize < 1:
+            raise ValueError('Batch size must be positive')
+
+        self.batchSize = batchSize
+        self.__buffers = [bytearray(bufferSize) for _ in range(batchSize)]
+        self.__views = [memoryview(buffer) for buffer in self.__buffers]
+
+    def recvBatch(
+            self,
+            sock: socket.socket,
+            stats: Optional[BatchStats] = None) -> List[memoryview]:
+        """Drain up to self.batchSize datagrams from non-blocking sock.
+
+        The returned views point into the ring's buffers
+        and are only valid until the next call.
+        """
+
+        received: List[memoryview] = []
+        for view in self.__views:
+            if stats is not None:
+                stats.recvCalls += 1
+            try:
+                size = sock.recv_into(view)
+            except BlockingIOError:
+                break
+            received.append(view[:size])
+        return received
+
+
+def handleBatch(
+        server: DhcpServer,
+        datagrams: List[memoryview]) -> List[bytes]:
+    """Run a batch of datagrams through the server
+    and return the encoded replies in the order of the datagrams,
+    those of retransmissions coming from the reply cache.
+    """
+
+    packets: List[DhcpPacket] = []
+    # reply of each datagram answered, by order of arrival,
+    # None until the fresh packets are handled
+    replies: List[Optional[bytes]] = []
+    # index in replies of the reply to each of packets
+    slots: List[int] = []
+    for datagram in datagrams:
+        if not server.admit(datagram):
+            continue
+        try:
+            packet = server.decode(datagram)
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet: {ve}')
+            continue
+        # retransmissions are answered without handling them again
+        cached = server.cachedReply(packet)
+        if cached is None:
+            packets.append(packet)
+            slots.append(len(replies))
+            replies.append(None)
+        else:
+            replies.append(cached)
+    for packet, slot, response in zip(
+            packets, slots, server.recvMany(packets)):
+        if response is None:
+            continue
+        try:
+            replies[slot] = server.encode(response, packet)
+        except ValueError as ve:
+            log.warning(f'Dropped reply to malformed packet: {ve}')
+    return [reply for reply in replies if reply is not None]
+
+
+def serveBatched(
+        server: DhcpServer,
+        sock: socket.socket,
+        replyAddress: Address,
+        batchSize: int = DEFAULT_BATCH_SIZE,
+        stats: Optional[BatchStats] = None,
+        idleTimeout: Optional[float] = None) -> None:
+    """Serve sock in batches.
+
+    Each time the socket becomes readable it is drained
+    into a ring of preallocated buffers until it would block
+    or the batch is full, the batch is run through the server
+    and then all of its replies are sent.
+
+    Returns once no packet arrives for idleTimeout seconds,
+    or never if idleTimeout is None.
+
+    Packets only keep their options decodable until the next batch
+    as the batch's buffers are reused.
+    """
+
+    sock.setblocking(False)
+    ring = PacketRing(batchSize)
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        while True:
+            if stats is not None:
+                stats.waits += 1
+            if not selector.select(idleTimeout):
+                return
+
+            datagrams = ring.recvBatch(sock, stats)
+            while datagrams:
+                replies = handleBatch(server, datagrams)
+                for reply in replies:
+                    try:
+                        sock.sendto(reply, replyAddress)
+                    except BlockingIOError:
+                        log.warning('Dropped reply as the send buffer is full')
+
+                if stats is not None:
+                    stats.batches += 1
+                    stats.packets += len(datagrams)
+                    stats.replies += len(replies)
+                    stats.sendCalls += len(replies)
+
+                if len(datagrams) < batchSize:
+                    # the socket was drained
+                    break
+                datagrams = ring.recvBatch(sock, stats)
@@ -1,13 +1,23 @@
-from dhcp.client_transaction import ClientTransaction
+from dhcp.client_transaction import ClientTransaction, DEFAULT_LEASE_TIME
+from dhcp.client_timers import (
+    renewalRetry, renewalTimes, retransmissionTimeout, startDelay)
 from dhcp.transaction import TransactionType
 from dhcp.packet import DhcpPacket, MessageType, OpCode
 
+import random
+import time
 from ipaddress import IPv4Address, IPv4Interface
 from socket import *
+from typing import Optional
 
+Seconds = float
 
 SERVER_PORT = 4200
 SERVER_INTERFACE = '144.37.118.233'
+# a transaction is given up after this many retransmissions
+MAX_RETRANSMISSIONS = 4
+# shortest wait on the socket, a timeout of 0 would make it non-blocking
+MIN_WAIT: Seconds = 0.001
 
 class DhcpClient:
     """Dhcp Client Logic"""
@@ -20,59 +30,141 @@ class DhcpClient:
         self.clientSocket = socket(AF_INET, SOCK_DGRAM)
         self.clientSocket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
         self.clientSocket.bind(('', SERVER_PORT))
+        self.random = random.Random()
+        # (monotonic) times of T1, T2 and the end of the lease
+        self.renewTime: Seconds = 0
+        self.rebindTime: Seconds = 0
+        self.leaseEnd: Seconds = 0
 
         self.transaction.clientIp = IPv4Address('0.0.0.0')
+        # clients powered on together should not DISCOVER together
+        time.sleep(startDelay(self.random))
         self.renew(TransactionType.DISCOVER)
 
     def parsePacket(self, packet: bytes) -> DhcpPacket:
-        partialPacket = DhcpPacket.fromPacket(
-            packet[:DhcpPacket.initialPacketSize])
-        offset: int = DhcpPacket.initialPacketSize
-        while partialPacket.bytesNeeded > 0:
-            nextOffset = offset + partialPacket.bytesNeeded
-            partialPacket.parseMore(
-                packet[offset:offset + partialPacket.bytesNeeded])
-            offset = nextOffset
-
-        return partialPacket.packet
-
-    def renew(self, transactionType: TransactionType)->None:
-        """Start at Discover or request depending on transaction type"""
-        
+        return DhcpPacket.decode(packet)
+
+    def renew(self, transactionType: TransactionType) -> bool:
+        """Start at Discover or request depending on transaction type.
+
+        Packets the server does not answer are retransmitted
+        with randomized exponential backoff.
+        Returns whether the server ACKed.
+        """
+
+        # a new transaction ID for every exchange
+        self.transaction = ClientTransaction()
+        self.transaction.clientIp = self.clientIp
         self.transaction.yourIp = self.lastClientIp
         #generate start packet for discover
         startPacket = self.transaction.start(transactionType)
-        
-
-        #send start packet
         print(f'Packet: {startPacket}')
-        self.clientSocket.sendto( startPacket.encode(),(SERVER_INTERFACE, SERVER_PORT))
-             
-        transactionType == TransactionType.RENEW
-            
-        isTransactionOver = False
-        while not isTransactionOver:
-            #loop until transaction is finished
-            returnBytes = self.clientSocket.recv(2048)
-            returnPacket = self.parsePacket(returnBytes)
-            print(f'Client: Packet received from server: \n {returnPacket}')
-            isTransactionOver, requestPacket = self.transaction.recv(returnPacket)
-
-            
-            print(f'Client: Response to server: \n Packet: {requestPacket}')
-            
-            if requestPacket is not None:
-                
-                self.clientSocket.sendto(requestPacket.encode(),(SERVER_INTERFACE, SERVER_PORT))
-            #print(f'Test A {isTransactionOver}')
-    
 
+        returnPacket = self.__exchange(startPacket)
+        if returnPacket is None:
+            print("Client: No reply from server.")
+            return False
         if returnPacket.messageType == MessageType.ACK:
             self.clientIp = returnPacket.yourIp
             self.lastClientIp = self.clientIp
-        else:
-            print("Client: Declined by server.")
+            self.__leased(returnPacket.leaseTime or DEFAULT_LEASE_TIME)
+            return True
+        print("Client: Declined by server.")
+        # a NAKed renewal means the address cannot be used anymore
+        self.clientIp = IPv4Address('0.0.0.0')
+        return False
+
+    def maintain(self) -> None:
+        """Keep a lease until interrupted,
+        renewing it at T1, rebinding it at T2
+        and starting over with a DISCOVER once it is lost.
+        """
+
+        while True:
+            now = time.monotonic()
+            if self.clientIp == IPv4Address('0.0.0.0') or (
+                    now >= self.leaseEnd):
+                self.clientIp = IPv4Address('0.0.0.0')
+                if not self.renew(TransactionType.DISCOVER):
+                    time.sleep(retransmissionTimeout(
+                        MAX_RETRANSMISSIONS, self.random))
+            elif now < self.renewTime:
+                time.sleep(self.renewTime - now)
+            elif not self.renew(TransactionType.RENEW):
+                if self.clientIp != IPv4Address('0.0.0.0'):
+                    # unanswered, retry until T2, then until the lease ends
+                    now = time.monotonic()
+                    deadline = (
+                        self.rebindTime if now < self.rebindTime
+                        else self.leaseEnd)
+                    time.sleep(renewalRetry(deadline - now))
+            else:
+                print(f'Client: Renewed {self.clientIp}')
+
+    def __leased(self, leaseTime: Seconds) -> None:
+        """Set the timers of a lease of leaseTime starting now."""
+        now = time.monotonic()
+        t1, t2 = renewalTimes(leaseTime, self.random)
+        self.renewTime = now + t1
+        self.rebindTime = now + t2
+        self.leaseEnd = now + leaseTime
+
+    def __exchange(self, packet: DhcpPacket) -> Optional[DhcpPacket]:
+        """Run the transaction started by packet,
+        retransmitting the last packet sent while the server does not reply.
+
+        Returns the last reply of the server,
+        None if it did not reply to any retransmission.
+        """
+
+        attempt = 0
+        deadline = self.__send(packet, attempt)
+        while True:
+            #loop until transaction is finished
+            try:
+                self.clientSocket.settimeout(
+                    max(deadline - time.monotonic(), MIN_WAIT))
+                returnBytes = self.clientSocket.recv(2048)
+            except TimeoutError:
+                if attempt == MAX_RETRANSMISSIONS:
+                    return None
+                attempt += 1
+                print(f'Client: No reply, retransmission {attempt}')
+                deadline = self.__send(packet, attempt)
+                continue
+
+            try:
+                returnPacket = self.parsePacket(returnBytes)
+            except ValueError as ve:
+                # not a DHCP packet, keep waiting for the reply
+                print(f'Client: Dropped malformed packet: {ve}')
+                continue
+            print(f'Client: Packet received from server: \n {returnPacket}')
+            if returnPacket.transactionId != packet.transactionId:
+                # a late reply to an earlier transaction
+                continue
+            if returnPacket.messageType == MessageType.NAK:
+                return returnPacket
+            isTransactionOver, requestPacket = self.transaction.recv(
+                returnPacket)
 
+            print(f'Client: Response to server: \n Packet: {requestPacket}')
+            if isTransactionOver:
+                return returnPacket
+            if requestPacket is not None:
+                packet = requestPacket
+                attempt = 0
+                deadline = self.__send(packet, attempt)
+
+    def __send(self, packet: DhcpPacket, attempt: int) -> Seconds:
+        """Send the attempt-th transmission of packet
+        and return the (monotonic) time to retransmit it.
+        """
+
+        self.clientSocket.sendto(
+            packet.encode(), (SERVER_INTERFACE, SERVER_PORT))
+        return time.monotonic() + retransmissionTimeout(
+            attempt, self.random)
 
     def release(self)->None:
         if self.clientIp == IPv4Address('0.0.0.0'):
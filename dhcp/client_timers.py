@@ -0,0 +1,63 @@
+import random
+from typing import Tuple
+
+Seconds = float
+
+# RFC 2131 4.1: retransmit after 4 seconds, doubling up to 64 seconds,
+# each delay randomized by up to a second either way
+INITIAL_TIMEOUT: Seconds = 4
+MAX_TIMEOUT: Seconds = 64
+TIMEOUT_FUZZ: Seconds = 1
+# RFC 2131 4.4.1: wait 1 to 10 seconds before the first DISCOVER
+MIN_START_DELAY: Seconds = 1
+MAX_START_DELAY: Seconds = 10
+# RFC 2131 4.4.5: renew at T1 and rebind at T2, fractions of the lease
+T1_FRACTION = 0.5
+T2_FRACTION = 0.875
+# T1 and T2 are each randomized by up to this fraction either way
+TIMER_JITTER = 0.1
+# RFC 2131 4.4.5: an unanswered renewal is retried after half the time
+# left to T2, or to the end of the lease when rebinding,
+# but not sooner than this
+MIN_RENEWAL_RETRY: Seconds = 60
+
+
+def startDelay(rand: random.Random) -> Seconds:
+    """Delay before the first DISCOVER,
+    so clients powered on together do not DISCOVER together.
+    """
+
+    return rand.uniform(MIN_START_DELAY, MAX_START_DELAY)
+
+
+def retransmissionTimeout(attempt: int, rand: random.Random) -> Seconds:
+    """Time to wait for a reply to the attempt-th retransmission
+    of a packet, 0 being the first transmission, before sending it again.
+    """
+
+    timeout = min(INITIAL_TIMEOUT * 2 ** min(attempt, 16), MAX_TIMEOUT)
+    return timeout + rand.uniform(-TIMEOUT_FUZZ, TIMEOUT_FUZZ)
+
+
+def renewalTimes(
+        leaseTime: Seconds,
+        rand: random.Random) -> Tuple[Seconds, Seconds]:
+    """Times after being ACKed a lease of leaseTime
+    to renew it, T1, and to rebind it, T2.
+
+    Both are jittered so clients leased together do not renew together.
+    """
+
+    t1 = leaseTime * T1_FRACTION * rand.uniform(
+        1 - TIMER_JITTER, 1 + TIMER_JITTER)
+    t2 = leaseTime * T2_FRACTION * rand.uniform(
+        1 - TIMER_JITTER, 1 + TIMER_JITTER)
+    return t1, min(max(t2, t1), leaseTime)
+
+
+def renewalRetry(timeLeft: Seconds) -> Seconds:
+    """Delay before retrying an unanswered renewal (or rebinding)
+    with timeLeft until T2 (or the end of the lease).
+    """
+
+    return min(max(timeLeft / 2, MIN_RENEWAL_RETRY), max(timeLeft, 0))
@@ -2,23 +2,43 @@ from dhcp.transaction import Transaction, TransactionType
 from dhcp.packet import DhcpPacket, MessageType, OpCode
 
 from ipaddress import IPv4Address
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 from enum import Enum
+import logging
 import time
 import uuid
 
+log = logging.getLogger(__name__)
+
 Seconds = float
 DEFAULT_LEASE_TIME: Seconds = 30
 
 class ClientTransaction(Transaction):
     """Class for representing an onogoing transaction with the server."""
 
-    def __init__(self):
-        self.clientHardwareAddr = uuid.getnode()
-        #Used to simulate computer3
-       # self.clientHardwareAddr = 2345346436546463
-        self.transactionId = uuid.uuid1().int>>96
-        self.transactionStartTime = time.time()
+    def __init__(
+            self,
+            clientHardwareAddr: Optional[int] = None,
+            transactionId: Optional[int] = None,
+            clock: Callable[[], Seconds] = time.time,
+            rapidCommit: bool = False):
+        """Create a transaction for the MAC of this computer
+        unless given another, e.g. to simulate many clients.
+
+        clock gives the current time, e.g. a virtual clock in simulations.
+
+        With rapidCommit, a DISCOVER asks for an ACK straight away
+        instead of an OFFER (option 80, RFC 4039).
+        """
+
+        self.clock = clock
+        self.rapidCommit = rapidCommit
+        self.clientHardwareAddr = (
+            uuid.getnode() if clientHardwareAddr is None
+            else clientHardwareAddr)
+        self.transactionId = (
+            uuid.uuid1().int>>96 if transactionId is None else transactionId)
+        self.transactionStartTime = clock()
         self.clientIp: IPv4Address
         self.yourIp: IPv4Address
         self._phase: int = 0;
@@ -42,7 +62,8 @@ class ClientTransaction(Transaction):
                 IPv4Address('255.255.255.255'), #serverIp
                 self.clientHardwareAddr,
                 MessageType.DISCOVER,
-                int(DEFAULT_LEASE_TIME)
+                int(DEFAULT_LEASE_TIME),
+                {80: b''} if self.rapidCommit else None
                 )
         
         elif transactionType == TransactionType.RENEW:
@@ -70,12 +91,12 @@ class ClientTransaction(Transaction):
         if self._phase == 1:
             if packet.clientHardwareAddr == self.clientHardwareAddr:
                 if packet.messageType == MessageType.OFFER:
-                    print("Client: Received offer message")
-                    print("Client: Sending request message")
+                    log.info("Client: Received offer message")
+                    log.info("Client: Sending request message")
                     return False, DhcpPacket.fromArgs(
                         OpCode.REQUEST, #opCode
                         packet.transactionId,
-                        int(time.time() - self.transactionStartTime),
+                        int(self.clock() - self.transactionStartTime),
                         packet.clientIp, #clientIP
                         packet.yourIp,
                         packet.serverIp,
@@ -84,38 +105,27 @@ class ClientTransaction(Transaction):
                         int(DEFAULT_LEASE_TIME)
                         )
                 if packet.messageType == MessageType.ACK:
-                    print("Client: Received ACK message")
-                    print("Client: IP has already been issued to client: " + str(packet.yourIp))
+                    log.info("Client: Received ACK message")
+                    log.info(
+                        "Client: IP has already been issued to client: %s",
+                        packet.yourIp)
                     return True, None
                 else:
-                    print("Client: Error: Phase-MessageType mismatch.")
+                    log.error("Client: Error: Phase-MessageType mismatch.")
                     return False, None
         elif packet.messageType == MessageType.DECLINE:
-            print("Client: REQUEST DECLINED")
+            log.info("Client: REQUEST DECLINED")
             return False, None
 
         elif packet.messageType == MessageType.ACK:
+            # the server answers the REQUEST with an ACK ending the session,
+            # it expects no further packet
             if packet.clientHardwareAddr == self.clientHardwareAddr:
-                if self._phase == 3:
-                    if packet.messageType == MessageType.ACK:
-                        self.clientIp = packet.yourIp
-                        print("Client: Received ACK message")
-                        print(f"Client: Renewed IP {self.clientIp}")
-                        return True, DhcpPacket.fromArgs(
-                            OpCode.REQUEST, #opCode
-                            packet.transactionId,
-                            int(time.time() - self.transactionStartTime),
-                            packet.clientIp, #clientIP
-                            packet.yourIp,
-                            packet.serverIp,
-                            packet.clientHardwareAddr,
-                            MessageType.ACK,
-                            int(DEFAULT_LEASE_TIME)
-                            )
-                    else:
-                        print("Client: Error: Phase-MessageType mismatch")
+                self.clientIp = packet.yourIp
+                log.info("Client: Received ACK message")
+                log.info("Client: Leased IP %s", self.clientIp)
             else:
-                print("Client: MAC address does not match, could not ACK.")
+                log.error("Client: MAC address does not match.")
             return True, None
         return True, None
     def release(self)->DhcpPacket:
@@ -0,0 +1,118 @@
+from dhcp.packet import MessageType
+
+import json
+from enum import Enum
+from struct import Struct
+from typing import BinaryIO, Iterator, Optional, TextIO, Tuple
+
+Seconds = float
+# time, event, message type (0 for none), transaction ID, mac and ip as an int
+EventRecord = Tuple[Seconds, int, int, int, int, int]
+
+
+class EventType(Enum):
+    RECV = 1
+    REPLY = 2
+    LEASE = 3
+    FREE = 4
+    EXPIRE = 5
+    TIMEOUT = 6
+    EVICT = 7
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}.{self.name}>'
+
+
+class JsonLinesSink:
+    """Writes events as one JSON object per line."""
+
+    def __init__(self, file: TextIO):
+        self.file = file
+
+    def write(self, record: EventRecord) -> None:
+        curTime, event, messageType, transactionId, mac, ip = record
+        self.file.write(json.dumps({
+            'time': curTime,
+            'event': EventType(event).name,
+            'messageType':
+                MessageType(messageType).name if messageType else None,
+            'transactionId': transactionId,
+            'mac': mac,
+            'ip': ip}))
+        self.file.write('\n')
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+class BinarySink:
+    """Writes events as fixed width binary records, see read()."""
+
+    record = Struct('>dBB2xIQI')
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+
+    def write(self, record: EventRecord) -> None:
+        self.file.write(BinarySink.record.pack(*record))
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    @staticmethod
+    def read(data: bytes) -> Iterator[EventRecord]:
+        usable = len(data) - len(data) % BinarySink.record.size
+        return BinarySink.record.iter_unpack(memoryview(data)[:usable])
+
+
+class EventLog:
+    """Structured events of a DhcpServer for offline analysis.
+
+    Per-packet events (RECV and REPLY) are sampled,
+    keeping every sampleEvery-th packet,
+    while lease and transaction events are always kept.
+
+    Records are only built once an event is kept
+    and a server without an EventLog pays nothing for events.
+    """
+
+    __slots__ = ('sink', 'sampleEvery', '__countdown')
+
+    def __init__(self, sink, sampleEvery: int = 1):
+        """sink is a JsonLinesSink, a BinarySink
+        or anything with write(record) and flush().
+        """
+
+        if sampleEvery < 1:
+            raise ValueError('Sampling interval must be positive')
+
+        self.sink = sink
+        self.sampleEvery = sampleEvery
+        self.__countdown = 1
+
+    def samplePacket(self) -> bool:
+        """Whether to keep the events of the next packet."""
+        self.__countdown -= 1
+        if self.__countdown:
+            return False
+        self.__countdown = self.sampleEvery
+        return True
+
+    def emit(
+            self,
+            curTime: Seconds,
+            event: EventType,
+            messageType: Optional[MessageType] = None,
+            transactionId: int = 0,
+            clientHardwareAddr: int = 0,
+            ip: int = 0) -> None:
+        self.sink.write((
+            curTime,
+            event.value,
+            0 if messageType is None else messageType.value,
+            transactionId,
+            clientHardwareAddr,
+            ip))
+
+    def flush(self) -> None:
+        self.sink.flush()
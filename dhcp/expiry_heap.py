@@ -0,0 +1,104 @@
+import heapq
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+# keys must be hashable and orderable, e.g. ints
+K = TypeVar('K')
+
+Seconds = float
+
+
+class ExpiryHeap(Generic[K]):
+    """Min-heap of keys ordered by their (absolute) expiry time.
+
+    Each key has at most one live expiry.
+    Rescheduling or cancelling a key only leaves its old heap entry dead
+    (lazy deletion) so both are O(log n) and O(1) respectively.
+    An entry is live while it is the current entry of its key.
+    Dead entries are skipped when popping
+    and the heap is compacted once they outnumber the live ones.
+    """
+
+    __slots__ = ('__heap', '__entries')
+
+    def __init__(self):
+        # heap entries are (expiry, key) tuples
+        self.__heap: List[Tuple[Seconds, K]] = []
+        self.__entries: Dict[K, Tuple[Seconds, K]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.__entries
+
+    def isEmpty(self) -> bool:
+        return not self.__entries
+
+    def schedule(self, key: K, expiry: Seconds) -> None:
+        """Set the expiry of key, replacing any previous one."""
+        # replacing the entry of key kills any old one
+        entry = (expiry, key)
+        self.__entries[key] = entry
+        heapq.heappush(self.__heap, entry)
+        self.__compactIfSparse()
+
+    def scheduleMany(self, expiries: Iterable[Tuple[K, Seconds]]) -> None:
+        """Set the expiries of many keys at once,
+        which is O(n) instead of O(n log n).
+        """
+
+        entries = self.__entries
+        heap = self.__heap
+        for key, expiry in expiries:
+            entry = (expiry, key)
+            entries[key] = entry
+            heap.append(entry)
+        heapq.heapify(self.__heap)
+        self.__compactIfSparse()
+
+    def cancel(self, key: K) -> bool:
+        """Remove the expiry of key. Returns false if key had none."""
+        if self.__entries.pop(key, None) is None:
+            return False
+        self.__compactIfSparse()
+        return True
+
+    def expiryOf(self, key: K) -> Optional[Seconds]:
+        entry = self.__entries.get(key)
+        return None if entry is None else entry[0]
+
+    def peekExpiry(self) -> Optional[Seconds]:
+        """Closest expiry or None if there are no keys."""
+        self.__dropDeadTop()
+        return self.__heap[0][0] if self.__heap else None
+
+    def popExpired(self, curTime: Seconds) -> List[K]:
+        """Remove and return all keys expiring at or before curTime
+        in order of expiry.
+        """
+
+        expired: List[K] = []
+        heap = self.__heap
+        entries = self.__entries
+        while heap and heap[0][0] <= curTime:
+            entry = heapq.heappop(heap)
+            key = entry[1]
+            if entries.get(key) is entry:
+                del entries[key]
+                expired.append(key)
+        return expired
+
+    def __dropDeadTop(self) -> None:
+        heap = self.__heap
+        entries = self.__entries
+        while heap and entries.get(heap[0][1]) is not heap[0]:
+            heapq.heappop(heap)
+
+    def __compactIfSparse(self) -> None:
+        """Rebuild the heap without dead entries
+        once more than half of it is dead.
+        """
+
+        if len(self.__heap) > 2 * len(self.__entries) + 64:
+            self.__heap = list(self.__entries.values())
+            heapq.heapify(self.__heap)
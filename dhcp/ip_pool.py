@@ -0,0 +1,229 @@
+from array import array
+from typing import Iterable, Optional
+from ipaddress import IPv4Address, IPv4Network
+
+
+class IpPool:
+    """Allocator for the host addresses of a network.
+
+    Addresses are tracked by their integer offset into the network
+    which is also how they are given to and returned from the pool,
+    see offsetOf() and ipAt().
+    The free offsets are kept in a dense array
+    with a second array mapping each offset to its slot in the first,
+    so allocating, taking a specific address and freeing
+    are all O(1) swap-removes or appends,
+    and an exhausted pool is simply an empty free array.
+
+    Initially addresses are handed out from the lowest upwards.
+    Freed addresses are reused before untouched ones.
+
+    With offsets only the host addresses at those offsets are handed out,
+    e.g. a slice of a network shared by several pools,
+    the others are treated as excluded.
+
+    Free addresses can be held, e.g. for the client which last had them,
+    see hold(). Held addresses sit at the bottom of the stack
+    so they are only allocated once every other address is taken,
+    but can still be taken directly.
+    """
+
+    def __init__(
+            self,
+            network: IPv4Network,
+            exclude: Iterable[IPv4Address] = (),
+            offsets: Optional[range] = None):
+        self.network = network
+        self.__base: int = int(network.network_address)
+        # offsets 0 and numAddresses - 1 are the network and broadcast address
+        self.__end: int = max(network.num_addresses - 1, 1)
+
+        owned = range(1, self.__end) if offsets is None else range(
+            max(offsets.start, 1), min(offsets.stop, self.__end))
+        # free offsets, the top of the stack is allocated first,
+        # followed by the reserved ones outside of offsets
+        self.__free = array('I', reversed(owned))
+        self.__free.extend(range(1, owned.start))
+        self.__free.extend(range(owned.stop, self.__end))
+        # slot of each offset in self.__free
+        self.__slots = array('I', [0]) * (self.__end + 1)
+        for slot, offset in enumerate(self.__free):
+            self.__slots[offset] = slot
+        self.__freeCount: int = len(owned)
+        # offsets in slots at or after this are never handed out
+        self.__reservedStart: int = self.__freeCount
+        # free offsets in slots before this are held
+        self.__heldCount: int = 0
+
+        for ip in exclude:
+            offset = self.offsetOf(int(ip))
+            if offset is not None and self.take(offset):
+                # move the just taken offset into the reserved slots
+                self.__reservedStart -= 1
+                self.__swapSlots(self.__freeCount, self.__reservedStart)
+
+        self.size: int = self.__reservedStart
+
+    @property
+    def freeCount(self) -> int:
+        return self.__freeCount
+
+    @property
+    def heldCount(self) -> int:
+        """Count of free addresses held."""
+        return self.__heldCount
+
+    @property
+    def usedCount(self) -> int:
+        return self.size - self.__freeCount
+
+    def isExhausted(self) -> bool:
+        return self.__freeCount == 0
+
+    def offsetOf(self, ip: int) -> Optional[int]:
+        """Offset of ip (as an int) into the network
+        or None if ip is not a host address.
+        """
+
+        offset = ip - self.__base
+        if 0 < offset < self.__end:
+            return offset
+        return None
+
+    def ipAt(self, offset: int) -> int:
+        """Address (as an int) at offset into the network."""
+        return self.__base + offset
+
+    def __swapSlots(self, slotA: int, slotB: int) -> None:
+        offsetA = self.__free[slotA]
+        offsetB = self.__free[slotB]
+        self.__free[slotA] = offsetB
+        self.__slots[offsetB] = slotA
+        self.__free[slotB] = offsetA
+        self.__slots[offsetA] = slotB
+
+    def __contains__(self, ip: int) -> bool:
+        return self.offsetOf(ip) is not None
+
+    def isFree(self, offset: int) -> bool:
+        return self.__slots[offset] < self.__freeCount
+
+    def isHeld(self, offset: int) -> bool:
+        return self.__slots[offset] < self.__heldCount
+
+    def hold(self, offset: int) -> bool:
+        """Hold the free address at offset back from allocation.
+
+        Returns false if the address is not free or already held.
+        """
+
+        slot = self.__slots[offset]
+        if not self.__heldCount <= slot < self.__freeCount:
+            return False
+
+        # swap the offset just above the held ones and include it
+        self.__swapSlots(slot, self.__heldCount)
+        self.__heldCount += 1
+        return True
+
+    def unhold(self, offset: int) -> bool:
+        """Let the held address at offset be allocated again.
+
+        Returns false if the address is not held.
+        """
+
+        slot = self.__slots[offset]
+        if slot >= self.__heldCount:
+            return False
+
+        # swap the offset with the last held one and exclude it
+        self.__heldCount -= 1
+        self.__swapSlots(slot, self.__heldCount)
+        return True
+
+    def peek(self) -> Optional[int]:
+        """The offset allocate() would return
+        or None if the pool is exhausted.
+        """
+
+        if self.__freeCount == 0:
+            return None
+        return self.__free[self.__freeCount - 1]
+
+    def allocate(self) -> Optional[int]:
+        """Take the offset of the next free address
+        or return None if the pool is exhausted.
+        """
+
+        if self.__freeCount == 0:
+            return None
+        self.__freeCount -= 1
+        if self.__heldCount > self.__freeCount:
+            # only held addresses were left
+            self.__heldCount = self.__freeCount
+        return self.__free[self.__freeCount]
+
+    def take(self, offset: int) -> bool:
+        """Take the address at offset out of the pool.
+
+        Returns false if the address is not free.
+        """
+
+        slot = self.__slots[offset]
+        if slot >= self.__freeCount:
+            return False
+
+        if slot < self.__heldCount:
+            # move the offset out of the held ones first
+            self.__heldCount -= 1
+            self.__swapSlots(slot, self.__heldCount)
+            slot = self.__heldCount
+        # swap the taken offset with the top of the stack and pop it
+        self.__freeCount -= 1
+        self.__swapSlots(slot, self.__freeCount)
+        return True
+
+    def takeMany(self, offsets: Iterable[int]) -> int:
+        """Take the addresses at many offsets out of the pool at once,
+        e.g. to restore leases,
+        rebuilding the free array in one pass instead of a swap per offset.
+
+        Offsets of addresses that are not free are skipped.
+        Returns the count of addresses taken.
+        """
+
+        isTaken = bytearray(self.__end + 1)
+        for offset in offsets:
+            isTaken[offset] = 1
+
+        free = self.__free
+        freeCount = self.__freeCount
+        stack = free[:freeCount]
+        stillFree = array(
+            'I', [offset for offset in stack if not isTaken[offset]])
+        newlyTaken = array('I', [offset for offset in stack if isTaken[offset]])
+        # the order of free offsets is kept so held ones stay at the bottom
+        self.__heldCount -= sum(
+            isTaken[offset] for offset in free[:self.__heldCount])
+        self.__free = stillFree + newlyTaken + free[freeCount:]
+        self.__freeCount = len(stillFree)
+        slots = self.__slots
+        for slot, offset in enumerate(self.__free[:freeCount]):
+            slots[offset] = slot
+        return len(newlyTaken)
+
+    def release(self, offset: int) -> bool:
+        """Return the address at offset to the pool.
+
+        Returns false if the address is not taken
+        or is one of the excluded addresses.
+        """
+
+        slot = self.__slots[offset]
+        if not self.__freeCount <= slot < self.__reservedStart:
+            return False
+
+        # swap the offset just above the top of the stack and push it
+        self.__swapSlots(slot, self.__freeCount)
+        self.__freeCount += 1
+        return True
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DEFAULT_CAPACITY = 65536
+
+
+class LeaseHistory:
+    """Bounded history of the address each MAC last held,
+    so a returning client can be offered the same address again.
+
+    Addresses are kept as their offset into the pool.
+    When full, the least recently recorded MAC is evicted,
+    so memory is bounded by capacity whatever the number of MACs.
+    """
+
+    __slots__ = ('capacity', 'hits', '__offsets')
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError('Capacity must be positive')
+
+        self.capacity = capacity
+        # count of clients offered their last address again
+        self.hits = 0
+        # last offset by MAC, least recently recorded first
+        self.__offsets: OrderedDict[int, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__offsets)
+
+    def get(self, clientHardwareAddr: int) -> Optional[int]:
+        """Offset last held by a MAC or None."""
+        return self.__offsets.get(clientHardwareAddr)
+
+    def record(
+            self,
+            clientHardwareAddr: int,
+            offset: int) -> Optional[Tuple[int, int]]:
+        """Remember the offset a MAC just stopped holding.
+
+        Returns the (MAC, offset) evicted to make room, if any.
+        """
+
+        offsets = self.__offsets
+        offsets.pop(clientHardwareAddr, None)
+        offsets[clientHardwareAddr] = offset
+        if len(offsets) > self.capacity:
+            return offsets.popitem(last=False)
+        return None
+
+    def forget(self, clientHardwareAddr: int) -> Optional[int]:
+        """Drop the entry of a MAC, returning its offset if it had one."""
+        return self.__offsets.pop(clientHardwareAddr, None)
@@ -0,0 +1,295 @@
+import logging
+import os
+import sys
+import time
+from array import array
+from struct import Struct
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+# ip as an int, client hardware address and expiry (absolute)
+LeaseRecord = Tuple[int, int, Seconds]
+# a LeaseRecord followed by the op
+JournalRecord = Tuple[int, int, Seconds, int]
+
+
+class JournalColumns(NamedTuple):
+    """Every record of a journal in replay order, field by field."""
+
+    ips: 'array[int]'
+    clientHardwareAddrs: 'array[int]'
+    expiries: 'array[float]'
+    ops: bytes
+
+
+DEFAULT_GROUP_COMMIT_SIZE = 256
+DEFAULT_GROUP_COMMIT_DELAY: Seconds = 0.05
+# fewest journal records worth compacting into a snapshot
+MIN_COMPACTION_RECORDS = 100_000
+
+
+class LeaseJournal:
+    """Append-only binary journal of lease binds and releases
+    with periodic snapshots.
+
+    Every record is a fixed width (ip, mac, expiry, op).
+    Records are buffered and written with a single fsync
+    when flush() is called,
+    which its server does once isFlushDue().
+    detachFlush() and detachCompaction() leave the write
+    to be run off the server's thread.
+
+    compact() writes the live leases as a snapshot
+    and empties the journal.
+    Both files start with a GENERATION record
+    counting the compactions, so a journal older than the snapshot,
+    left over by a crash before it was emptied, is never replayed.
+    loadColumns() replays the snapshot and then the journal.
+
+    Not thread safe, the journal must only be used by its server
+    but for the functions detached from it.
+    """
+
+    BIND = 1
+    RELEASE = 2
+    GENERATION = 3
+
+    __record = Struct('>IQdB3x')
+    __snapshotName = 'leases.snapshot'
+    __journalName = 'leases.journal'
+
+    def __init__(
+            self,
+            directory: str,
+            groupCommitSize: int = DEFAULT_GROUP_COMMIT_SIZE,
+            groupCommitDelay: Seconds = DEFAULT_GROUP_COMMIT_DELAY):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.groupCommitSize = groupCommitSize
+        self.groupCommitDelay = groupCommitDelay
+
+        self.__snapshotPath = os.path.join(
+            directory, LeaseJournal.__snapshotName)
+        self.__journalPath = os.path.join(
+            directory, LeaseJournal.__journalName)
+
+        self.__pending = bytearray()
+        self.__pendingCount = 0
+        self.__pendingSince: Seconds = 0
+        # compactions so far, files without a GENERATION record are the 0th
+        self.__generation = LeaseJournal.__readGeneration(
+            self.__snapshotPath)
+        recordSize = LeaseJournal.__record.size
+        self.__file = open(self.__journalPath, 'ab')
+        # drop a torn record at the end of a crashed write
+        # so appended records stay aligned
+        size = self.__file.tell()
+        if size % recordSize != 0:
+            log.warning('Truncating a partial record at the end of the journal')
+            self.__file.truncate(size - size % recordSize)
+        if (self.__file.tell() == 0
+                or LeaseJournal.__readGeneration(self.__journalPath)
+                < self.__generation):
+            self.__startJournal(self.__generation)
+        # records in the journal file, used to decide when to compact
+        self.journalRecords: int = self.__file.tell() // recordSize - 1
+
+    def bind(self, ip: int, clientHardwareAddr: int, expiry: Seconds) -> None:
+        self.__append(ip, clientHardwareAddr, expiry, LeaseJournal.BIND)
+
+    def release(self, ip: int, clientHardwareAddr: int) -> None:
+        self.__append(ip, clientHardwareAddr, 0, LeaseJournal.RELEASE)
+
+    def __append(
+            self,
+            ip: int,
+            clientHardwareAddr: int,
+            expiry: Seconds,
+            op: int) -> None:
+        if self.__pendingCount == 0:
+            self.__pendingSince = time.monotonic()
+        self.__pending += LeaseJournal.__record.pack(
+            ip, clientHardwareAddr, expiry, op)
+        self.__pendingCount += 1
+
+    def isFlushDue(self) -> bool:
+        """Whether self.groupCommitSize records are pending
+        or pending records have waited self.groupCommitDelay.
+        """
+
+        return self.__pendingCount > 0 and (
+            self.__pendingCount >= self.groupCommitSize
+            or time.monotonic() - self.__pendingSince
+                >= self.groupCommitDelay)
+
+    def flush(self) -> None:
+        """Write and fsync all pending records."""
+        write = self.detachFlush()
+        if write is not None:
+            write()
+
+    def detachFlush(self) -> Optional[Callable[[], None]]:
+        """Take the pending records out of the journal
+        and return the function writing and fsyncing them,
+        or None if there are none.
+
+        The function does blocking I/O only
+        so it can be run on another thread,
+        as long as the functions detached from the journal
+        run one at a time in the order they were detached.
+        """
+
+        if self.__pendingCount == 0:
+            return None
+
+        data = self.__pending
+        self.journalRecords += self.__pendingCount
+        self.__pending = bytearray()
+        self.__pendingCount = 0
+        return lambda: self.__write(data)
+
+    def __write(self, data: bytes) -> None:
+        self.__file.write(data)
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+
+    def needsCompaction(self, liveLeases: int) -> bool:
+        """Whether the journal has grown enough
+        compared to the live leases to be worth compacting.
+        """
+
+        return self.journalRecords >= max(
+            MIN_COMPACTION_RECORDS, 2 * liveLeases)
+
+    def compact(self, leases: List[LeaseRecord]) -> None:
+        """Replace the snapshot with the given live leases
+        and empty the journal.
+
+        The leases must include every pending and journaled record.
+        """
+
+        self.detachCompaction(leases)()
+
+    def detachCompaction(
+            self,
+            leases: List[LeaseRecord]) -> Callable[[], None]:
+        """Take the pending records out of the journal, as compact() does,
+        and return the function writing the snapshot of leases
+        and emptying the journal file.
+
+        The function can be run on another thread, see detachFlush().
+        Records added after detaching are kept
+        and written to the emptied journal by later flushes.
+        """
+
+        self.journalRecords = 0
+        self.__pending = bytearray()
+        self.__pendingCount = 0
+        self.__generation += 1
+        generation = self.__generation
+        return lambda: self.__writeSnapshot(leases, generation)
+
+    def __writeSnapshot(
+            self,
+            leases: List[LeaseRecord],
+            generation: int) -> None:
+        record = LeaseJournal.__record
+        data = bytearray(record.size * (len(leases) + 1))
+        record.pack_into(data, 0, *LeaseJournal.__header(generation))
+        for i, (ip, clientHardwareAddr, expiry) in enumerate(leases, 1):
+            record.pack_into(
+                data,
+                i * record.size,
+                ip,
+                clientHardwareAddr,
+                expiry,
+                LeaseJournal.BIND)
+
+        tmpPath = self.__snapshotPath + '.tmp'
+        with open(tmpPath, 'wb') as snapshot:
+            snapshot.write(data)
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmpPath, self.__snapshotPath)
+
+        # only empty the journal once the snapshot is durable,
+        # until then it is skipped as older than the snapshot
+        self.__startJournal(generation)
+        log.info(f'Compacted {len(leases)} leases into a snapshot')
+
+    def __startJournal(self, generation: int) -> None:
+        """Empty the journal file and stamp it with generation."""
+        self.__file.close()
+        self.__file = open(self.__journalPath, 'wb')
+        self.__write(
+            LeaseJournal.__record.pack(*LeaseJournal.__header(generation)))
+
+    @staticmethod
+    def __header(generation: int) -> JournalRecord:
+        return (0, generation, 0.0, LeaseJournal.GENERATION)
+
+    @staticmethod
+    def __readGeneration(path: str) -> int:
+        """Generation of a snapshot or journal file, 0 if it has none."""
+        return LeaseJournal.__read(path)[0]
+
+    @staticmethod
+    def __read(path: str) -> Tuple[int, bytes]:
+        """Generation of a snapshot or journal file
+        and its whole records after the GENERATION one.
+        """
+
+        record = LeaseJournal.__record
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0, b''
+        data = data[:len(data) - len(data) % record.size]
+        if data and data[20] == LeaseJournal.GENERATION:
+            return record.unpack_from(data)[1], data[record.size:]
+        return 0, data
+
+    def loadColumns(self) -> JournalColumns:
+        """Replay the snapshot and the journal
+        and return all of their records, releases included, in order.
+
+        Each field is copied out of the records with strided slices,
+        so no Python object is made per record
+        and the caller can apply them in one pass, the last one winning.
+        """
+
+        snapshotGeneration, snapshot = LeaseJournal.__read(
+            self.__snapshotPath)
+        journalGeneration, journal = LeaseJournal.__read(self.__journalPath)
+        if journalGeneration < snapshotGeneration:
+            # every record of the journal is already in the snapshot
+            log.warning('Skipped a journal older than the snapshot')
+            journal = b''
+        data = snapshot + journal
+
+        return JournalColumns(
+            LeaseJournal.__column(data, 0, 'I'),
+            LeaseJournal.__column(data, 4, 'Q'),
+            LeaseJournal.__column(data, 12, 'd'),
+            data[20::LeaseJournal.__record.size])
+
+    @staticmethod
+    def __column(data: bytes, start: int, typecode: str) -> array:
+        """The big-endian field of typecode at start of every record."""
+        recordSize = LeaseJournal.__record.size
+        column = array(typecode)
+        size = column.itemsize
+        fieldBytes = bytearray(size * (len(data) // recordSize))
+        for i in range(size):
+            fieldBytes[i::size] = data[start + i::recordSize]
+        column.frombytes(fieldBytes)
+        if sys.byteorder == 'little':
+            column.byteswap()
+        return column
+
+    def close(self) -> None:
+        self.flush()
+        self.__file.close()
@@ -0,0 +1,323 @@
+from dhcp.client_transaction import ClientTransaction
+from dhcp.transaction import TransactionType
+from dhcp.packet import DhcpPacket, MessageType
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from ipaddress import IPv4Address
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+Address = Tuple[str, int]
+
+DEFAULT_RETRANSMIT_TIMEOUT: Seconds = 1
+DEFAULT_MAX_RETRANSMITS = 3
+# first synthetic MAC, a locally administered unicast address
+FIRST_MAC = 0x020000000000
+# how often new transactions are started and retransmits are checked
+TICK: Seconds = 0.001
+
+
+class Scenario(Enum):
+    BOOT_STORM = 'boot'
+    RENEW = 'renew'
+    CHURN = 'churn'
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}.{self.name}>'
+
+
+class SimulatedClient:
+    """State of one simulated client."""
+
+    __slots__ = (
+        'clientHardwareAddr',
+        'ip',
+        'transaction',
+        'startedAt',
+        'sentAt',
+        'lastSent',
+        'retransmits')
+
+    def __init__(self, clientHardwareAddr: int):
+        self.clientHardwareAddr = clientHardwareAddr
+        # leased address or None
+        self.ip: Optional[IPv4Address] = None
+        self.transaction: Optional[ClientTransaction] = None
+        self.startedAt: Seconds = 0
+        self.sentAt: Seconds = 0
+        self.lastSent = b''
+        self.retransmits = 0
+
+
+class LoadStats:
+    """Outcome of the transactions of a load test."""
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.naks = 0
+        self.timeouts = 0
+        self.retransmits = 0
+        self.releases = 0
+        # seconds from the first send to the end of each completed transaction
+        self.latencies: List[Seconds] = []
+        self.startTime: Seconds = time.monotonic()
+        self.endTime: Seconds = self.startTime
+
+    @property
+    def transactionsPerSecond(self) -> float:
+        elapsed = self.endTime - self.startTime
+        return self.completed / elapsed if elapsed > 0 else 0
+
+    def percentile(self, percent: float) -> Seconds:
+        if not self.latencies:
+            return 0
+        latencies = sorted(self.latencies)
+        return latencies[min(
+            len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+    def report(self) -> str:
+        return '\n'.join([
+            f'started:      {self.started}',
+            f'completed:    {self.completed}',
+            f'NAKs:         {self.naks}',
+            f'timeouts:     {self.timeouts}',
+            f'retransmits:  {self.retransmits}',
+            f'releases:     {self.releases}',
+            f'elapsed:      {self.endTime - self.startTime:.2f} s',
+            f'throughput:   {self.transactionsPerSecond:.0f} transactions/sec',
+            'latency ms:   '
+            + '  '.join(
+                f'p{percent}={self.percentile(percent) * 1e3:.2f}'
+                for percent in (50, 90, 99, 100))])
+
+
+class LoadGenerator(asyncio.DatagramProtocol):
+    """Many simulated clients multiplexed over one UDP socket.
+
+    Every client runs its transactions with its own ClientTransaction
+    and a synthetic MAC.
+    Replies are matched to clients by transaction ID.
+    A request without a reply for self.retransmitTimeout is resent
+    up to self.maxRetransmits times before the transaction times out.
+    """
+
+    def __init__(
+            self,
+            serverAddress: Address,
+            clients: int,
+            retransmitTimeout: Seconds = DEFAULT_RETRANSMIT_TIMEOUT,
+            maxRetransmits: int = DEFAULT_MAX_RETRANSMITS):
+        if clients < 1:
+            raise ValueError('Client count must be positive')
+
+        self.serverAddress = serverAddress
+        self.retransmitTimeout = retransmitTimeout
+        self.maxRetransmits = maxRetransmits
+        self.clients = [
+            SimulatedClient(FIRST_MAC + i) for i in range(clients)]
+        self.stats = LoadStats()
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+        # clients with a transaction in flight by transaction ID
+        self.__pending: Dict[int, SimulatedClient] = {}
+        # (time sent, transaction ID) of every send,
+        # the timeout is constant so this is in order of retransmit
+        self.__sends: Deque[Tuple[Seconds, int]] = deque()
+        self.__nextTransactionId = 1
+        self.__nextClient = 0
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def error_received(self, exc: Exception) -> None:
+        log.error(f'Socket error: {exc}')
+
+    def datagram_received(self, data: bytes, addr: Address) -> None:
+        try:
+            packet = DhcpPacket.decode(data)
+        except ValueError as ve:
+            log.warning(f'Dropped malformed reply: {ve}')
+            return
+
+        client = self.__pending.get(packet.transactionId)
+        if (client is None
+                or packet.clientHardwareAddr != client.clientHardwareAddr):
+            # a reply to a retransmit of a finished transaction
+            return
+        if packet.messageType is MessageType.NAK:
+            self.stats.naks += 1
+            client.ip = None
+            self.__finish(client, False)
+            return
+
+        transaction = client.transaction
+        assert transaction is not None
+        isTransactionOver, response = transaction.recv(packet)
+        if response is not None:
+            self.__send(client, response.encode())
+        if isTransactionOver:
+            if packet.messageType is MessageType.ACK:
+                client.ip = packet.yourIp
+            self.__finish(client, packet.messageType is MessageType.ACK)
+
+    def discover(self, client: SimulatedClient) -> None:
+        """Start a DISCOVER/OFFER/REQUEST/ACK exchange."""
+        transaction = self.__begin(client)
+        transaction.clientIp = IPv4Address(0)
+        self.__send(client, transaction.start(
+            TransactionType.DISCOVER).encode())
+
+    def renew(self, client: SimulatedClient) -> None:
+        """Start a renewal of the lease of client."""
+        transaction = self.__begin(client)
+        transaction.clientIp = client.ip or IPv4Address(0)
+        transaction.yourIp = client.ip or IPv4Address(0)
+        self.__send(client, transaction.start(
+            TransactionType.RENEW).encode())
+
+    def releaseAndDiscover(self, client: SimulatedClient) -> None:
+        """Release the lease of client and start over with a DISCOVER."""
+        if client.ip is not None:
+            release = ClientTransaction(client.clientHardwareAddr, 0).release()
+            self.__sendto(release.encode())
+            self.stats.releases += 1
+            client.ip = None
+        self.discover(client)
+
+    async def runPhase(
+            self,
+            start: Callable[[SimulatedClient], None],
+            transactions: int,
+            rate: float,
+            leasedOnly: bool = False) -> LoadStats:
+        """Start transactions with start() at rate per second
+        and wait for all of them to finish.
+
+        Clients are taken in turn, skipping those with a transaction in flight
+        and, with leasedOnly, those without a lease.
+        Returns the stats of the phase.
+        """
+
+        self.stats = stats = LoadStats()
+        while stats.started < transactions or self.__pending:
+            now = time.monotonic()
+            due = min(transactions, int((now - stats.startTime) * rate) + 1)
+            while stats.started < due:
+                client = self.__idleClient(leasedOnly)
+                if client is None:
+                    break
+                start(client)
+                stats.started += 1
+            # every client is busy or unable to start another
+            if stats.started < due and not self.__pending:
+                log.warning(
+                    f'Stopped after {stats.started} transactions '
+                    'as no client can start another')
+                break
+            self.__retransmit(now)
+            await asyncio.sleep(TICK)
+        stats.endTime = time.monotonic()
+        return stats
+
+    def __idleClient(self, leasedOnly: bool) -> Optional[SimulatedClient]:
+        """Next client in turn that is free to start a transaction."""
+        for _ in range(len(self.clients)):
+            client = self.clients[self.__nextClient]
+            self.__nextClient = (self.__nextClient + 1) % len(self.clients)
+            if client.transaction is None and (
+                    not leasedOnly or client.ip is not None):
+                return client
+        return None
+
+    def __begin(self, client: SimulatedClient) -> ClientTransaction:
+        transactionId = self.__nextTransactionId
+        self.__nextTransactionId = (transactionId + 1) & 0xffffffff or 1
+        transaction = ClientTransaction(
+            client.clientHardwareAddr, transactionId)
+        client.transaction = transaction
+        client.startedAt = time.monotonic()
+        client.retransmits = 0
+        self.__pending[transactionId] = client
+        return transaction
+
+    def __finish(self, client: SimulatedClient, completed: bool) -> None:
+        transaction = client.transaction
+        assert transaction is not None
+        del self.__pending[transaction.transactionId]
+        client.transaction = None
+        if completed:
+            self.stats.completed += 1
+            self.stats.latencies.append(time.monotonic() - client.startedAt)
+
+    def __send(self, client: SimulatedClient, data: bytes) -> None:
+        transaction = client.transaction
+        assert transaction is not None
+        client.lastSent = data
+        client.sentAt = time.monotonic()
+        self.__sends.append((client.sentAt, transaction.transactionId))
+        self.__sendto(data)
+
+    def __sendto(self, data: bytes) -> None:
+        if self.transport is not None:
+            self.transport.sendto(data, self.serverAddress)
+
+    def __retransmit(self, now: Seconds) -> None:
+        """Resend or time out the requests unanswered for too long."""
+        sends = self.__sends
+        while sends and sends[0][0] + self.retransmitTimeout <= now:
+            sentAt, transactionId = sends.popleft()
+            client = self.__pending.get(transactionId)
+            if client is None or client.sentAt != sentAt:
+                # answered or sent again since
+                continue
+            if client.retransmits < self.maxRetransmits:
+                client.retransmits += 1
+                self.stats.retransmits += 1
+                self.__send(client, client.lastSent)
+            else:
+                self.stats.timeouts += 1
+                self.__finish(client, False)
+
+
+async def generateLoad(
+        serverAddress: Address,
+        localAddress: Address,
+        scenario: Scenario,
+        clients: int,
+        rate: float,
+        transactions: int,
+        retransmitTimeout: Seconds = DEFAULT_RETRANSMIT_TIMEOUT,
+        maxRetransmits: int = DEFAULT_MAX_RETRANSMITS) -> LoadStats:
+    """Run a load test against the server at serverAddress.
+
+    Replies are expected on localAddress.
+    Apart from a boot storm, every client first gets a lease
+    and only the transactions of the scenario after that are measured.
+    """
+
+    loop = asyncio.get_running_loop()
+    transport, generator = await loop.create_datagram_endpoint(
+        lambda: LoadGenerator(
+            serverAddress, clients, retransmitTimeout, maxRetransmits),
+        local_addr=localAddress)
+    try:
+        if scenario is Scenario.BOOT_STORM:
+            return await generator.runPhase(
+                generator.discover, transactions, rate)
+
+        warmUp = await generator.runPhase(generator.discover, clients, rate)
+        log.info(f'Leased {warmUp.completed} of {clients} clients')
+        if scenario is Scenario.RENEW:
+            return await generator.runPhase(
+                generator.renew, transactions, rate, leasedOnly=True)
+        return await generator.runPhase(
+            generator.releaseAndDiscover, transactions, rate)
+    finally:
+        transport.close()
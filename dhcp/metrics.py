@@ -0,0 +1,221 @@
+from dhcp.packet import DhcpPacket, MessageType
+
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from dhcp.server import DhcpServer
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+
+# time one in this many packets, timing every packet costs far more
+# than counting it
+DEFAULT_TIMING_SAMPLE_EVERY = 16
+# upper bounds of the latency buckets, a final +Inf bucket is implied
+DEFAULT_LATENCY_BUCKETS: List[Seconds] = [
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5,
+    1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1]
+
+
+class Histogram:
+    """Histogram with fixed bucket bounds."""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        self.bounds = sorted(bounds)
+        # the last count is of values above every bound
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class ServerMetrics:
+    """Counters and latency histograms of a DhcpServer.
+
+    Every packet is counted
+    but only one in every timingSampleEvery is timed.
+
+    The server is the only writer and readers,
+    e.g. the thread of serveMetrics(), only read plain ints,
+    so no locking is needed.
+    A scrape may see the counters of a packet partially updated.
+    """
+
+    __slots__ = (
+        'received',
+        'replied',
+        'malformed',
+        'parseTime',
+        'handleTime',
+        'encodeTime',
+        'timingSampleEvery',
+        '__countdown')
+
+    def __init__(
+            self,
+            timingSampleEvery: int = DEFAULT_TIMING_SAMPLE_EVERY,
+            latencyBuckets: Iterable[Seconds] = DEFAULT_LATENCY_BUCKETS):
+        if timingSampleEvery < 1:
+            raise ValueError('Sampling interval must be positive')
+
+        latencyBuckets = list(latencyBuckets)
+        # packet counts indexed by MessageType value
+        self.received = [0] * (len(MessageType) + 1)
+        self.replied = [0] * (len(MessageType) + 1)
+        self.malformed = 0
+        self.parseTime = Histogram(latencyBuckets)
+        self.handleTime = Histogram(latencyBuckets)
+        self.encodeTime = Histogram(latencyBuckets)
+        self.timingSampleEvery = timingSampleEvery
+        self.__countdown = 1
+
+    def sampleTiming(self) -> bool:
+        """Whether to time the next parse, handle or encode."""
+        self.__countdown -= 1
+        if self.__countdown:
+            return False
+        self.__countdown = self.timingSampleEvery
+        return True
+
+    def countPacket(
+            self,
+            packet: DhcpPacket,
+            returnPacket: Optional[DhcpPacket]) -> None:
+        # _value_ is a plain attribute unlike the much slower value property
+        self.received[packet.messageType._value_] += 1
+        if returnPacket is not None:
+            self.replied[returnPacket.messageType._value_] += 1
+
+    def countResent(
+            self,
+            packet: DhcpPacket,
+            replyType: MessageType) -> None:
+        """Count a retransmission answered from the reply cache."""
+        self.received[packet.messageType._value_] += 1
+        self.replied[replyType._value_] += 1
+
+    def render(self, server: 'DhcpServer') -> str:
+        """Prometheus text format of the metrics and the gauges of server."""
+        lines: List[str] = []
+
+        def counter(name: str, help: str, counts: List[int]) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} counter')
+            for messageType in MessageType:
+                lines.append(
+                    f'{name}{{type="{messageType.name}"}} '
+                    f'{counts[messageType.value]}')
+
+        def gauge(name: str, help: str, value: int) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+
+        def histogram(name: str, help: str, histogram: Histogram) -> None:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} histogram')
+            counts = list(histogram.counts)
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum {histogram.sum}')
+            lines.append(f'{name}_count {cumulative}')
+
+        counter(
+            'dhcp_packets_received_total',
+            'Packets received by message type, retransmissions included.',
+            self.received)
+        counter(
+            'dhcp_replies_total',
+            'Replies by message type.',
+            self.replied)
+        lines.append(
+            '# HELP dhcp_packets_malformed_total Datagrams that failed to parse.')
+        lines.append('# TYPE dhcp_packets_malformed_total counter')
+        lines.append(f'dhcp_packets_malformed_total {self.malformed}')
+        if server.replyCache is not None:
+            lines.append(
+                '# HELP dhcp_reply_cache_hits_total '
+                'Retransmissions answered from the reply cache.')
+            lines.append('# TYPE dhcp_reply_cache_hits_total counter')
+            lines.append(
+                f'dhcp_reply_cache_hits_total {server.replyCache.hits}')
+        admission = server.admission
+        if admission is not None:
+            name = 'dhcp_packets_not_admitted_total'
+            lines.append(
+                f'# HELP {name} Datagrams dropped before parsing by reason.')
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{{reason="malformed"}} {admission.malformed}')
+            lines.append(
+                f'{name}{{reason="from_server"}} {admission.fromServers}')
+            lines.append(
+                f'{name}{{reason="rate_limited"}} {admission.rateLimited}')
+        gauge('dhcp_leases', 'Leased addresses.', server.leaseCount)
+        gauge(
+            'dhcp_marked_addresses',
+            'Addresses reserved by in-flight transactions.',
+            server.markedCount)
+        gauge(
+            'dhcp_free_addresses',
+            'Free addresses of the pool.',
+            server.freeCount)
+        gauge(
+            'dhcp_transactions',
+            'In-flight transactions.',
+            server.transactionCount)
+        histogram(
+            'dhcp_parse_seconds', 'Time to parse a datagram.', self.parseTime)
+        histogram(
+            'dhcp_handle_seconds', 'Time to handle a packet.', self.handleTime)
+        histogram(
+            'dhcp_encode_seconds', 'Time to encode a reply.', self.encodeTime)
+        lines.append('')
+        return '\n'.join(lines)
+
+
+def serveMetrics(
+        metrics: ServerMetrics,
+        server: 'DhcpServer',
+        port: int,
+        host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve the metrics over HTTP on host:port from a daemon thread.
+
+    Call shutdown() on the returned HTTP server to stop serving.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = metrics.render(server).encode()
+            self.send_response(200)
+            self.send_header(
+                'Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            log.debug(format, *args)
+
+    httpServer = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(
+        target=httpServer.serve_forever, name='metrics', daemon=True)
+    thread.start()
+    log.info('Metrics served on %s:%s', host, port)
+    return httpServer
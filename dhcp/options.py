@@ -0,0 +1,206 @@
+from typing import (
+    Any, Callable, Container, Dict, Iterator, List, MutableMapping, Optional,
+    Tuple, cast)
+from ipaddress import IPv4Address
+
+Decoder = Callable[[memoryview], Any]
+Encoder = Callable[[Any], bytes]
+
+
+def _decodeIp(value: memoryview) -> IPv4Address:
+    if len(value) != 4:
+        raise ValueError('IP address options must be 4 bytes')
+    return IPv4Address(bytes(value))
+
+
+def _encodeIp(ip: IPv4Address) -> bytes:
+    return ip.packed
+
+
+def _decodeIps(value: memoryview) -> List[IPv4Address]:
+    if len(value) % 4 != 0:
+        raise ValueError(
+            'IP address list options must be a multiple of 4 bytes')
+    return [
+        IPv4Address(bytes(value[i:i + 4])) for i in range(0, len(value), 4)]
+
+
+def _encodeIps(ips: List[IPv4Address]) -> bytes:
+    return b''.join(ip.packed for ip in ips)
+
+
+def _decodeUint(size: int) -> Decoder:
+    def decode(value: memoryview) -> int:
+        if len(value) != size:
+            raise ValueError(f'Integer option must be {size} bytes')
+        return int.from_bytes(value, 'big', signed=False)
+    return decode
+
+
+def _encodeUint(size: int) -> Encoder:
+    return lambda value: value.to_bytes(size, 'big', signed=False)
+
+
+def _decodeStr(value: memoryview) -> str:
+    return bytes(value).decode('utf-8', errors='replace')
+
+
+def _encodeStr(value: str) -> bytes:
+    return value.encode('utf-8')
+
+
+def _decodeBytes(value: memoryview) -> bytes:
+    return bytes(value)
+
+
+def _decodeByteList(value: memoryview) -> List[int]:
+    return list(value)
+
+
+def _decodeSubOptions(value: memoryview) -> Dict[int, bytes]:
+    """Decode the type, length, value sub options of e.g. option 82."""
+    subOptions: Dict[int, bytes] = {}
+    offset = 0
+    while offset < len(value):
+        if offset + 1 >= len(value):
+            raise ValueError('Sub option has no length')
+        nextOffset = offset + 2 + value[offset + 1]
+        if nextOffset > len(value):
+            raise ValueError('Sub option is truncated')
+        subOptions[value[offset]] = bytes(value[offset + 2:nextOffset])
+        offset = nextOffset
+    return subOptions
+
+
+def _encodeSubOptions(subOptions: Dict[int, bytes]) -> bytes:
+    return b''.join(
+        bytes([subType, len(subValue)]) + subValue
+        for subType, subValue in subOptions.items())
+
+
+# decoders and encoders of the options with a known format
+# any other option is decoded as bytes
+# option 53, message type, is registered by dhcp.packet
+OPTION_CODECS: Dict[int, Tuple[Decoder, Encoder]] = {
+    1: (_decodeIp, _encodeIp),  # subnet mask
+    3: (_decodeIps, _encodeIps),  # routers
+    6: (_decodeIps, _encodeIps),  # domain name servers
+    12: (_decodeStr, _encodeStr),  # host name
+    15: (_decodeStr, _encodeStr),  # domain name
+    28: (_decodeIp, _encodeIp),  # broadcast address
+    50: (_decodeIp, _encodeIp),  # requested IP
+    51: (_decodeUint(4), _encodeUint(4)),  # lease time
+    54: (_decodeIp, _encodeIp),  # server identifier
+    55: (_decodeByteList, bytes),  # parameter request list
+    57: (_decodeUint(2), _encodeUint(2)),  # max message size
+    58: (_decodeUint(4), _encodeUint(4)),  # renewal (T1) time
+    59: (_decodeUint(4), _encodeUint(4)),  # rebinding (T2) time
+    61: (_decodeBytes, bytes),  # client identifier
+    82: (_decodeSubOptions, _encodeSubOptions),  # relay agent information
+}
+
+
+def encodeOption(optionType: int, value: Any) -> bytes:
+    """Encode a whole option, type and length included.
+
+    A value of bytes is taken as already encoded,
+    e.g. one copied with DhcpOptions.rawValue().
+    """
+
+    codec = OPTION_CODECS.get(optionType)
+    if codec is None or isinstance(value, (bytes, bytearray)):
+        encoded = bytes(value)
+    else:
+        encoded = codec[1](value)
+    if len(encoded) > 255:
+        raise ValueError(f'Option {optionType} is over 255 bytes')
+    return bytes([optionType, len(encoded)]) + encoded
+
+
+class DhcpOptions(MutableMapping[int, Any]):
+    """Mapping from option type to option value
+    that decodes options only when they are first accessed.
+
+    Parsed options are stored as the offset of their length byte
+    into the raw packet. Accessing an option decodes it with
+    its entry in OPTION_CODECS and caches the result.
+    Setting an option stores the value as is,
+    to be encoded by self.encode().
+    """
+
+    def __init__(
+            self,
+            rawBytes: Optional[memoryview] = None,
+            offsets: Optional[Dict[int, int]] = None):
+        self.__rawBytes = rawBytes
+        # parsed options and the cache of the ones decoded so far
+        self.__offsets: Dict[int, int] = {} if offsets is None else offsets
+        self.__decoded: Dict[int, Any] = {}
+        # options set after parsing
+        self.__values: Dict[int, Any] = {}
+
+    def __rawSlice(self, offset: int) -> memoryview:
+        rawBytes = cast(memoryview, self.__rawBytes)
+        return rawBytes[offset + 1:offset + 1 + rawBytes[offset]]
+
+    def rawValue(self, optionType: int) -> bytes:
+        """The undecoded value of an option."""
+        if optionType in self.__offsets:
+            return bytes(self.__rawSlice(self.__offsets[optionType]))
+        return encodeOption(optionType, self.__values[optionType])[2:]
+
+    def __getitem__(self, optionType: int) -> Any:
+        if optionType in self.__values:
+            return self.__values[optionType]
+        if optionType in self.__decoded:
+            return self.__decoded[optionType]
+
+        value = self.__rawSlice(self.__offsets[optionType])
+        codec = OPTION_CODECS.get(optionType)
+        decoded = bytes(value) if codec is None else codec[0](value)
+        self.__decoded[optionType] = decoded
+        return decoded
+
+    def __setitem__(self, optionType: int, value: Any) -> None:
+        if not 0 < optionType < 255:
+            raise ValueError(f'Option type {optionType} can not hold a value')
+        self.__offsets.pop(optionType, None)
+        self.__decoded.pop(optionType, None)
+        self.__values[optionType] = value
+
+    def __delitem__(self, optionType: int) -> None:
+        if optionType in self.__offsets:
+            del self.__offsets[optionType]
+            self.__decoded.pop(optionType, None)
+        else:
+            del self.__values[optionType]
+
+    def __contains__(self, optionType: object) -> bool:
+        return optionType in self.__offsets or optionType in self.__values
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self.__offsets
+        yield from self.__values
+
+    def __len__(self) -> int:
+        return len(self.__offsets) + len(self.__values)
+
+    def encode(self, exclude: Container[int] = ()) -> bytes:
+        """Encode every option but the excluded ones.
+
+        Parsed options are copied as is.
+        """
+
+        encoded = bytearray()
+        for optionType, offset in self.__offsets.items():
+            if optionType not in exclude:
+                encoded.append(optionType)
+                encoded.append(cast(memoryview, self.__rawBytes)[offset])
+                encoded += self.__rawSlice(offset)
+        for optionType, value in self.__values.items():
+            if optionType not in exclude:
+                encoded += encodeOption(optionType, value)
+        return bytes(encoded)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({dict(self)!r})'
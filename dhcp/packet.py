@@ -1,4 +1,6 @@
-from typing import Optional
+from dhcp.options import OPTION_CODECS, DhcpOptions
+
+from typing import Any, Dict, Mapping, Optional, Union
 from enum import Enum
 from struct import Struct
 from ipaddress import IPv4Address
@@ -20,6 +22,16 @@ class MessageType(Enum):
     INFORM = 8
 
 
+def _decodeMessageType(value: memoryview) -> MessageType:
+    if len(value) != 1:
+        raise ValueError('Message type option must be 1 byte')
+    return MessageType(value[0])
+
+
+OPTION_CODECS[53] = (
+    _decodeMessageType, lambda messageType: bytes([messageType.value]))
+
+
 class DhcpPartialPacket:
     """Class for representing partially parsed DHCP packets.
 
@@ -51,14 +63,16 @@ class DhcpPartialPacket:
 
         self.packet: DhcpPacket = DhcpPacket()
         self.packet.leaseTime = None
+        self.packet.options = DhcpOptions()
 
         unpacked = DhcpPacket.codec.unpack(initialBytes)
         self.packet.opCode = unpacked[0]
         self.packet.transactionId = unpacked[4]
         self.packet.secondsElapsed = unpacked[5]
-        self.packet.clientIp = IPv4Address(unpacked[7])
-        self.packet.yourIp = IPv4Address(unpacked[8])
-        self.packet.serverIp = IPv4Address(unpacked[9])
+        self.packet.clientIpInt = unpacked[7]
+        self.packet.yourIpInt = unpacked[8]
+        self.packet.serverIpInt = unpacked[9]
+        self.packet.gatewayIpInt = unpacked[10]
         # mask out unneeded bits of the client hardware address
         # using the hardware address length in bytes
         self.packet.clientHardwareAddr = unpacked[11]
@@ -120,17 +134,38 @@ class DhcpPartialPacket:
 
 class DhcpPacket:
     """DHCP packet that requires option 53, message type,
-    and optionally option 51, lease time"""
+    and optionally option 51, lease time
+
+    IP addresses are stored as ints in the *IpInt fields
+    and are available as IPv4Addresses through the matching properties.
+    """
+
+    __slots__ = (
+        'opCode',
+        'transactionId',
+        'secondsElapsed',
+        'clientIpInt',
+        'yourIpInt',
+        'serverIpInt',
+        'gatewayIpInt',
+        'clientHardwareAddr',
+        'messageType',
+        'leaseTime',
+        'options')
 
     opCode: OpCode
     transactionId: int
     secondsElapsed: int  # unsigned
-    clientIp: IPv4Address
-    yourIp: IPv4Address
-    serverIp: IPv4Address
+    clientIpInt: int
+    yourIpInt: int
+    serverIpInt: int
+    # IP of the relay agent the packet went through, 0 if not relayed
+    gatewayIpInt: int
     clientHardwareAddr: int
     messageType: MessageType
     leaseTime: Optional[int]  # unsigned
+    # all options, including 53 and 51 when parsed
+    options: DhcpOptions
 
     # main packet + optional header and first optional (not really opional)
     # + type of next optional
@@ -140,6 +175,51 @@ class DhcpPacket:
     __optionHeaderDhcpMagic = [0x63, 0x82, 0x53, 0x63]
     initialPacketSize = codec.size
 
+    # everything before the options, skipping unused fields
+    __headerCodec = Struct('>B3xIH2x4IQ192x4s')
+    # just the client hardware address
+    __hardwareAddrCodec = Struct('>28xQ')
+    # value of option 53 when encoded first
+    __messageTypeOffset = initialPacketSize - 2
+    __magic = bytes(__optionHeaderDhcpMagic)
+    __uint32 = Struct('>I')
+    # calling an Enum to look up a member is slow
+    __opCodes = {opCode.value: opCode for opCode in OpCode}
+    __messageTypes = {
+        messageType.value: messageType for messageType in MessageType}
+
+    @property
+    def clientIp(self) -> IPv4Address:
+        return IPv4Address(self.clientIpInt)
+
+    @clientIp.setter
+    def clientIp(self, ip: IPv4Address) -> None:
+        self.clientIpInt = int(ip)
+
+    @property
+    def yourIp(self) -> IPv4Address:
+        return IPv4Address(self.yourIpInt)
+
+    @yourIp.setter
+    def yourIp(self, ip: IPv4Address) -> None:
+        self.yourIpInt = int(ip)
+
+    @property
+    def serverIp(self) -> IPv4Address:
+        return IPv4Address(self.serverIpInt)
+
+    @serverIp.setter
+    def serverIp(self, ip: IPv4Address) -> None:
+        self.serverIpInt = int(ip)
+
+    @property
+    def gatewayIp(self) -> IPv4Address:
+        return IPv4Address(self.gatewayIpInt)
+
+    @gatewayIp.setter
+    def gatewayIp(self, ip: IPv4Address) -> None:
+        self.gatewayIpInt = int(ip)
+
     @staticmethod
     def fromPacket(initialBytes: bytes) -> DhcpPartialPacket:
         """Begin parsing variable width DHCP packet with always required bytes.
@@ -150,43 +230,168 @@ class DhcpPacket:
 
         return DhcpPartialPacket(initialBytes)
 
+    @staticmethod
+    def peekClientHardwareAddr(packetBytes: bytes) -> int:
+        """Client hardware address of an encoded packet
+        without parsing the rest of it, e.g. to route it.
+
+        A ValueError is raised if the packet is too short to have one.
+        """
+
+        if len(packetBytes) < DhcpPacket.__hardwareAddrCodec.size:
+            raise ValueError('Packet too short for a client hardware address')
+        return DhcpPacket.__hardwareAddrCodec.unpack_from(packetBytes)[0]
+
+    @staticmethod
+    def peekMessageType(packetBytes: bytes) -> MessageType:
+        """Message type of a packet encoded by DhcpPacket.encode(),
+        which is always the first option, without parsing the packet.
+
+        A ValueError is raised if there is no message type there.
+        """
+
+        offset = DhcpPacket.__messageTypeOffset
+        if (len(packetBytes) <= offset + 1
+                or packetBytes[offset - 2:offset] != b'\x35\x01'):
+            raise ValueError('Packet does not start with a message type')
+        messageType = DhcpPacket.__messageTypes.get(packetBytes[offset])
+        if messageType is None:
+            raise ValueError(f'Unknown message type {packetBytes[offset]}')
+        return messageType
+
+    @staticmethod
+    def decode(packetBytes: bytes) -> 'DhcpPacket':
+        """Parse a whole DHCP packet in a single pass.
+
+        The options are walked over a memoryview of packetBytes
+        and only the offsets of their length bytes are recorded.
+        Options other than 53, message type, and 51, lease time
+        are decoded on first access through packet.options.
+        Option 53 is required but may be anywhere.
+        If an option is repeated the first one is used.
+
+        A ValueError is raised for truncated or malformed packets.
+        """
+
+        view = memoryview(packetBytes)
+        end = len(view)
+        offset = DhcpPacket.__headerCodec.size
+        if end <= offset:
+            raise ValueError('Packet too short for a DHCP header')
+
+        (opCode, transactionId, secondsElapsed,
+            clientIp, yourIp, serverIp, gatewayIp,
+            clientHardwareAddr,
+            magic) = DhcpPacket.__headerCodec.unpack_from(view)
+        if magic != DhcpPacket.__magic:
+            raise ValueError('Missing DHCP magic cookie')
+
+        optionOffsets: Dict[int, int] = {}
+        while True:
+            if offset >= end:
+                raise ValueError('Options are not terminated')
+            optionType = view[offset]
+            if optionType == 255:  # end options option
+                break
+            elif optionType == 0:  # pad option
+                offset += 1
+                continue
+            elif offset + 1 >= end:
+                raise ValueError(f'Option {optionType} has no length')
+
+            nextOffset = offset + 2 + view[offset + 1]
+            if nextOffset > end:
+                raise ValueError(f'Option {optionType} is truncated')
+            if optionType not in optionOffsets:
+                optionOffsets[optionType] = offset + 1
+            offset = nextOffset
+
+        if opCode not in DhcpPacket.__opCodes:
+            raise ValueError(f'Unknown op code {opCode}')
+        messageTypeOffset = optionOffsets.get(53)
+        if messageTypeOffset is None or view[messageTypeOffset] != 1:
+            raise ValueError('Missing message type option')
+        messageType = DhcpPacket.__messageTypes.get(
+            view[messageTypeOffset + 1])
+        if messageType is None:
+            raise ValueError(
+                f'Unknown message type {view[messageTypeOffset + 1]}')
+        leaseTimeOffset = optionOffsets.get(51)
+        leaseTime: Optional[int] = None
+        if leaseTimeOffset is not None:
+            if view[leaseTimeOffset] != 4:
+                raise ValueError('Lease time option must be 4 bytes')
+            leaseTime = DhcpPacket.__uint32.unpack_from(
+                view, leaseTimeOffset + 1)[0]
+
+        packetObj = DhcpPacket()
+        packetObj.opCode = DhcpPacket.__opCodes[opCode]
+        packetObj.transactionId = transactionId
+        packetObj.secondsElapsed = secondsElapsed
+        packetObj.clientIpInt = clientIp
+        packetObj.yourIpInt = yourIp
+        packetObj.serverIpInt = serverIp
+        packetObj.gatewayIpInt = gatewayIp
+        packetObj.clientHardwareAddr = clientHardwareAddr
+        packetObj.messageType = messageType
+        packetObj.leaseTime = leaseTime
+        packetObj.options = DhcpOptions(view, optionOffsets)
+        return packetObj
+
     @staticmethod
     def fromArgs(
             opCode: OpCode,
             transactionId: int,
             secondsElapsed: int,  # unsigned
-            clientIp: IPv4Address,
-            yourIp: IPv4Address,
-            serverIp: IPv4Address,
+            clientIp: Union[IPv4Address, int],
+            yourIp: Union[IPv4Address, int],
+            serverIp: Union[IPv4Address, int],
             clientHardwareAddr: int,
             messageType: MessageType,
-            leaseTime: Optional[int] = None
+            leaseTime: Optional[int] = None,
+            options: Optional[Mapping[int, Any]] = None,
+            gatewayIp: Union[IPv4Address, int] = 0
             ) -> 'DhcpPacket':
-        """Consturct a DhcpPacket from args."""
+        """Consturct a DhcpPacket from args.
+
+        IP addresses may be given as IPv4Addresses or ints.
+        Any options besides 53 and 51 can be given by option type.
+        gatewayIp is the relay agent's, 0 for packets not relayed.
+        """
 
         packetObj = DhcpPacket()
         packetObj.opCode = opCode
         packetObj.transactionId = transactionId
         packetObj.secondsElapsed = secondsElapsed
-        packetObj.clientIp = clientIp
-        packetObj.yourIp = yourIp
-        packetObj.serverIp = serverIp
+        packetObj.clientIpInt = int(clientIp)
+        packetObj.yourIpInt = int(yourIp)
+        packetObj.serverIpInt = int(serverIp)
+        packetObj.gatewayIpInt = int(gatewayIp)
         packetObj.clientHardwareAddr = clientHardwareAddr
         packetObj.messageType = messageType
         packetObj.leaseTime = leaseTime
+        if isinstance(options, DhcpOptions):
+            packetObj.options = options
+        else:
+            packetObj.options = DhcpOptions()
+            if options is not None:
+                packetObj.options.update(options)
         return packetObj
 
     def encode(self) -> bytes:
-        """Construct a big endian binary DHCP packet."""
+        """Construct a big endian binary DHCP packet.
+
+        Options 53 and 51 are taken from
+        self.messageType and self.leaseTime
+        and the rest from self.options.
+        """
 
-        lastType: int = 255
-        extraBytes: bytes = b''
+        extraBytes: bytes = self.options.encode((51, 53)) + bytes([255])
         if self.leaseTime is not None:
-            lastType = 51
             extraBytes = (
-                bytes([4]) +
+                bytes([51, 4]) +
                 self.leaseTime.to_bytes(4, 'big') +
-                bytes([255]))
+                extraBytes)
 
         return DhcpPacket.codec.pack(
             self.opCode.value,
@@ -196,10 +401,10 @@ class DhcpPacket:
             self.transactionId,
             self.secondsElapsed,
             1 << 15,  # server will reply via broadcasts
-            int(self.clientIp),
-            int(self.yourIp),
-            int(self.serverIp),
-            0,  # gateway ip
+            self.clientIpInt,
+            self.yourIpInt,
+            self.serverIpInt,
+            self.gatewayIpInt,
             self.clientHardwareAddr,
             b'',  # servername
             b'',  # boot filename
@@ -207,7 +412,7 @@ class DhcpPacket:
             53,
             1,
             self.messageType.value,
-            lastType) + extraBytes
+            extraBytes[0]) + extraBytes[1:]
 
     def __repr__(self):
         return (
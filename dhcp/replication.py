@@ -0,0 +1,326 @@
+from dhcp.packet import DhcpPacket
+from dhcp.async_server import (
+    BackgroundJob, DhcpServerProtocol, startBackgroundJobs)
+from dhcp.metrics import Histogram
+from dhcp.sharding import ownerOf
+
+import asyncio
+import logging
+import time
+from struct import Struct
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from dhcp.server import DhcpServer
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+Address = Tuple[str, int]
+
+# clients are split between the pair by hash bucket as in RFC 3074
+HASH_BUCKETS = 256
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_HEARTBEAT_INTERVAL: Seconds = 0.1
+DEFAULT_PEER_TIMEOUT: Seconds = 0.5
+DEFAULT_RECONNECT_DELAY: Seconds = 0.5
+# bytes of unsent records above which packets are shed
+DEFAULT_HIGH_WATER_MARK = 1 << 20
+LAG_BUCKETS: List[Seconds] = [
+    1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 1]
+
+
+def pairBuckets(half: int) -> range:
+    """Hash buckets of the clients served by half (0 or 1) of a pair."""
+    if half not in (0, 1):
+        raise ValueError('A pair has halves 0 and 1')
+    split = HASH_BUCKETS // 2
+    return range(0, split) if half == 0 else range(split, HASH_BUCKETS)
+
+
+def bucketOf(clientHardwareAddr: int) -> int:
+    return ownerOf(clientHardwareAddr, HASH_BUCKETS)
+
+
+class LeaseReplication:
+    """Stream of lease binds and releases between a pair of servers
+    over TCP, one connection each way.
+
+    Records are batched while the previous batch is being written,
+    every batch is prefixed by its record count
+    and the time its oldest record was queued,
+    so the peer can tell the replication lag.
+    An empty batch is sent as a heartbeat when there is nothing to send.
+    Every (re)connection starts with a snapshot of all leases
+    and records are dropped while disconnected.
+
+    The peer is considered down once its connection is lost
+    or nothing was heard from it for self.peerTimeout.
+    Once more than self.highWaterMark bytes are waiting to be sent
+    the replication is backed up and the server should shed packets.
+    """
+
+    BIND = 1
+    RELEASE = 2
+
+    __header = Struct('>Id')
+    __record = Struct('>IQdB3x')
+
+    def __init__(
+            self,
+            listenAddress: Address,
+            peerAddress: Address,
+            batchSize: int = DEFAULT_BATCH_SIZE,
+            heartbeatInterval: Seconds = DEFAULT_HEARTBEAT_INTERVAL,
+            peerTimeout: Seconds = DEFAULT_PEER_TIMEOUT,
+            highWaterMark: int = DEFAULT_HIGH_WATER_MARK):
+        self.listenAddress = listenAddress
+        self.peerAddress = peerAddress
+        self.batchSize = batchSize
+        self.heartbeatInterval = heartbeatInterval
+        self.peerTimeout = peerTimeout
+        self.highWaterMark = highWaterMark
+
+        self.server: Optional['DhcpServer'] = None
+        self.recordsSent = 0
+        self.batchesSent = 0
+        self.recordsReceived = 0
+        # seconds from queueing the oldest record of a batch to applying it
+        self.lag = Histogram(LAG_BUCKETS)
+        self.maxLag: Seconds = 0
+
+        self.__pending = bytearray()
+        self.__pendingCount = 0
+        self.__pendingSince: Seconds = 0
+        self.__writer: Optional[asyncio.StreamWriter] = None
+        self.__wakeUp = asyncio.Event()
+        self.__peerConnections = 0
+        self.__lastHeard: Seconds = 0
+        self.__tasks: List[asyncio.Task] = []
+        self.__listener: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def isConnected(self) -> bool:
+        """Whether the stream to the peer is open."""
+        return self.__writer is not None
+
+    @property
+    def peerIsUp(self) -> bool:
+        return bool(self.__peerConnections) and (
+            time.monotonic() - self.__lastHeard < self.peerTimeout)
+
+    @property
+    def isBackedUp(self) -> bool:
+        return len(self.__pending) > self.highWaterMark
+
+    def bind(self, ip: int, clientHardwareAddr: int, expiry: Seconds) -> None:
+        self.__append(ip, clientHardwareAddr, expiry, LeaseReplication.BIND)
+
+    def release(self, ip: int, clientHardwareAddr: int) -> None:
+        self.__append(ip, clientHardwareAddr, 0, LeaseReplication.RELEASE)
+
+    def __append(
+            self,
+            ip: int,
+            clientHardwareAddr: int,
+            expiry: Seconds,
+            op: int) -> None:
+        if self.__writer is None:
+            # the peer gets a snapshot once connected
+            return
+        if not self.__pendingCount:
+            self.__pendingSince = time.time()
+            self.__wakeUp.set()
+        self.__pending += LeaseReplication.__record.pack(
+            ip, clientHardwareAddr, expiry, op)
+        self.__pendingCount += 1
+
+    async def start(self, server: 'DhcpServer') -> None:
+        """Listen for the peer and connect to it, replicating server."""
+        self.server = server
+        self.__listener = await asyncio.start_server(
+            self.__receive, *self.listenAddress)
+        self.__tasks.append(asyncio.create_task(self.__send()))
+        log.info('Replication listening on %s:%s', *self.listenAddress)
+
+    def close(self) -> None:
+        for task in self.__tasks:
+            task.cancel()
+        if self.__listener is not None:
+            self.__listener.close()
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+    async def __send(self) -> None:
+        """Keep a connection to the peer and write batches to it."""
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(*self.peerAddress)
+            except OSError as ose:
+                log.debug('Cannot connect to the peer: %s', ose)
+                await asyncio.sleep(DEFAULT_RECONNECT_DELAY)
+                continue
+
+            log.info('Replicating to %s:%s', *self.peerAddress)
+            self.__writer = writer
+            try:
+                await self.__sendSnapshot(writer)
+                while True:
+                    try:
+                        await asyncio.wait_for(
+                            self.__wakeUp.wait(), self.heartbeatInterval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self.__wakeUp.clear()
+                    await self.__sendBatch(writer)
+            except (ConnectionError, OSError) as error:
+                log.warning(
+                    'Lost the replication stream to the peer: %s', error)
+            finally:
+                self.__writer = None
+                self.__pending = bytearray()
+                self.__pendingCount = 0
+                writer.close()
+            await asyncio.sleep(DEFAULT_RECONNECT_DELAY)
+
+    async def __sendSnapshot(self, writer: asyncio.StreamWriter) -> None:
+        assert self.server is not None
+        leases = self.server.leases()
+        record = LeaseReplication.__record
+        for start in range(0, len(leases), self.batchSize):
+            batch = leases[start:start + self.batchSize]
+            writer.write(
+                LeaseReplication.__header.pack(len(batch), time.time()))
+            writer.write(b''.join(
+                record.pack(ip, mac, expiry, LeaseReplication.BIND)
+                for ip, mac, expiry in batch))
+            await writer.drain()
+        log.info('Sent a snapshot of %s leases to the peer', len(leases))
+
+    async def __sendBatch(self, writer: asyncio.StreamWriter) -> None:
+        """Write the pending records, or a heartbeat if there are none,
+        waiting for the peer to keep up.
+        """
+
+        pending = self.__pending
+        count = self.__pendingCount
+        self.__pending = bytearray()
+        self.__pendingCount = 0
+        writer.write(LeaseReplication.__header.pack(
+            count, self.__pendingSince if count else time.time()))
+        writer.write(pending)
+        await writer.drain()
+        self.recordsSent += count
+        self.batchesSent += 1
+
+    async def __receive(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter) -> None:
+        """Apply the batches of one connection from the peer."""
+        peer = writer.get_extra_info('peername')
+        log.info('Peer %s connected', peer)
+        self.__peerConnections += 1
+        self.__lastHeard = time.monotonic()
+        header = LeaseReplication.__header
+        record = LeaseReplication.__record
+        try:
+            while True:
+                count, queuedAt = header.unpack(
+                    await reader.readexactly(header.size))
+                data = await reader.readexactly(count * record.size)
+                self.__lastHeard = time.monotonic()
+                if not count:
+                    continue
+                self.__apply(record.iter_unpack(data))
+                self.recordsReceived += count
+                lag = time.time() - queuedAt
+                self.lag.observe(lag)
+                self.maxLag = max(self.maxLag, lag)
+        except (asyncio.IncompleteReadError, ConnectionError) as error:
+            log.warning('Peer %s is down: %s', peer, error)
+        finally:
+            self.__peerConnections -= 1
+            writer.close()
+
+    def __apply(self, records) -> None:
+        server = self.server
+        assert server is not None
+        for ip, mac, expiry, op in records:
+            if op == LeaseReplication.BIND:
+                server.applyBind(ip, mac, expiry)
+            elif op == LeaseReplication.RELEASE:
+                server.applyRelease(ip, mac)
+            else:
+                log.warning('Ignored a replication record with op %s', op)
+
+
+class PairServerProtocol(DhcpServerProtocol):
+    """DhcpServerProtocol of one server of a pair.
+
+    Only the clients whose MAC hashes into buckets are answered
+    unless the peer is down.
+    Packets are shed while the replication is backed up.
+    """
+
+    def __init__(
+            self,
+            server: 'DhcpServer',
+            replyAddress: Address,
+            replication: LeaseReplication,
+            buckets: range):
+        super().__init__(server, replyAddress)
+        self.replication = replication
+        self.buckets = buckets
+        self.shed = 0
+
+    def datagram_received(self, data: bytes, addr: Address) -> None:
+        try:
+            bucket = bucketOf(DhcpPacket.peekClientHardwareAddr(data))
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet from {addr}: {ve}')
+            return
+
+        replication = self.replication
+        if bucket not in self.buckets and replication.peerIsUp:
+            return
+        if replication.isBackedUp:
+            self.shed += 1
+            return
+        self.handleDatagram(data, addr)
+
+
+async def servePair(
+        server: 'DhcpServer',
+        port: int,
+        replyAddress: Address,
+        replication: LeaseReplication,
+        half: int,
+        backgroundJobs: Sequence[BackgroundJob] = ()) -> None:
+    """Serve half of the clients of a pair on port until cancelled,
+    or all of them while the peer is down.
+
+    backgroundJobs are run alongside the server as by async_server.serve().
+
+    The server should be created with replication
+    and hand out a slice of the pool not overlapping its peer's,
+    e.g. sharding.poolSlice(network, half, 2).
+    """
+
+    loop = asyncio.get_running_loop()
+    await replication.start(server)
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: PairServerProtocol(
+            server, replyAddress, replication, pairBuckets(half)),
+        local_addr=('0.0.0.0', port),
+        allow_broadcast=True)
+    log.info(f'Server bound to port {port} serving half {half} of the pair')
+    tasks = startBackgroundJobs(backgroundJobs)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        transport.close()
+        replication.close()
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+Seconds = float
+# transaction ID, client hardware address and message type value
+ReplyKey = Tuple[int, int, int]
+
+DEFAULT_CAPACITY = 16384
+# clients retransmit after about 4 and 8 seconds
+DEFAULT_TIME_TO_LIVE: Seconds = 10
+
+
+class ReplyCache:
+    """Bounded cache of encoded replies
+    by the transaction ID, MAC and message type of the packet they answer,
+    so retransmissions get the same reply again.
+
+    Every entry gets the same time to live
+    so insertion order is also order of expiry
+    and both expired entries and, when full, the oldest ones
+    are evicted from the front.
+    The keys of every MAC are indexed
+    so its entries can be dropped once they are stale, see invalidate().
+    """
+
+    __slots__ = (
+        'capacity',
+        'timeToLive',
+        'hits',
+        'misses',
+        '__entries',
+        '__keysByMacs')
+
+    def __init__(
+            self,
+            capacity: int = DEFAULT_CAPACITY,
+            timeToLive: Seconds = DEFAULT_TIME_TO_LIVE):
+        if capacity < 1:
+            raise ValueError('Capacity must be positive')
+
+        self.capacity = capacity
+        self.timeToLive = timeToLive
+        self.hits = 0
+        self.misses = 0
+        # (expiry, reply) by key
+        self.__entries: OrderedDict[ReplyKey, Tuple[Seconds, bytes]] = (
+            OrderedDict())
+        self.__keysByMacs: Dict[int, Set[ReplyKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: ReplyKey, curTime: Seconds) -> Optional[bytes]:
+        """The reply cached for key or None."""
+        self.__evictExpired(curTime)
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: ReplyKey, reply: bytes, curTime: Seconds) -> None:
+        """Cache reply for key until self.timeToLive after curTime."""
+        entries = self.__entries
+        if entries.pop(key, None) is None:
+            keys = self.__keysByMacs.get(key[1])
+            if keys is None:
+                self.__keysByMacs[key[1]] = {key}
+            else:
+                keys.add(key)
+        entries[key] = (curTime + self.timeToLive, reply)
+        if len(entries) > self.capacity:
+            self.__unindex(entries.popitem(last=False)[0])
+
+    def invalidate(self, clientHardwareAddr: int) -> None:
+        """Drop the replies cached for clientHardwareAddr,
+        e.g. once its lease is released or expires
+        so a retransmission is not answered with the old lease.
+        """
+
+        keys = self.__keysByMacs.pop(clientHardwareAddr, None)
+        if keys is not None:
+            entries = self.__entries
+            for key in keys:
+                del entries[key]
+
+    def __unindex(self, key: ReplyKey) -> None:
+        keysByMacs = self.__keysByMacs
+        keys = keysByMacs[key[1]]
+        keys.discard(key)
+        if not keys:
+            del keysByMacs[key[1]]
+
+    def __evictExpired(self, curTime: Seconds) -> None:
+        entries = self.__entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key][0] > curTime:
+                return
+            del entries[key]
+            self.__unindex(key)
@@ -0,0 +1,101 @@
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.options import encodeOption
+
+from typing import Any, Mapping, Optional
+from struct import Struct
+from ipaddress import IPv4Address
+
+
+class ReplyEncoder:
+    """Encoder of a server's replies.
+
+    The fixed header and the server wide options
+    are serialized once into a template.
+    Encoding a reply only patches
+    the per client fields of the template in place
+    and copies it out as the final bytes to send.
+
+    Replies with options of their own fall back to DhcpPacket.encode()
+    with the server wide options added.
+    """
+
+    # transaction id, seconds elapsed, flags,
+    # client ip, your ip, server ip, gateway ip and client hardware address
+    # packed from after the op code and hardware fields
+    __fieldsCodec = Struct('>I2H4IQ')
+    __fieldsOffset = 4
+    # offset of the message type value, which is the first option
+    __messageTypeOffset = DhcpPacket.initialPacketSize - 2
+    # offset of the lease time value, which always follows the message type
+    __leaseTimeOffset = DhcpPacket.initialPacketSize + 1
+    __leaseTimeCodec = Struct('>I')
+
+    def __init__(
+            self,
+            serverIp: IPv4Address,
+            options: Optional[Mapping[int, Any]] = None):
+        self.serverIp = serverIp
+        self.options = dict(options) if options is not None else {}
+
+        for reserved in (0, 51, 53, 255):
+            if reserved in self.options:
+                raise ValueError(
+                    f'Option {reserved} can not be a server wide option')
+        optionBytes = b''.join(
+            encodeOption(optionType, value)
+            for optionType, value in self.options.items())
+
+        template = DhcpPacket.fromArgs(
+            OpCode.REPLY,
+            0,
+            0,
+            IPv4Address(0),
+            IPv4Address(0),
+            serverIp,
+            0,
+            MessageType.OFFER).encode()
+        # strip the end option to append the server wide options
+        header = template[:-1]
+
+        self.__withoutLeaseTime = bytearray(header + optionBytes + b'\xff')
+        self.__withLeaseTime = bytearray(
+            header + encodeOption(51, 0) + optionBytes + b'\xff')
+
+    def encode(self, packet: DhcpPacket) -> bytes:
+        """Encode a reply packet along with the server wide options."""
+        if packet.opCode is not OpCode.REPLY or packet.options:
+            options = dict(self.options)
+            options.update(packet.options)
+            return DhcpPacket.fromArgs(
+                packet.opCode,
+                packet.transactionId,
+                packet.secondsElapsed,
+                packet.clientIpInt,
+                packet.yourIpInt,
+                packet.serverIpInt,
+                packet.clientHardwareAddr,
+                packet.messageType,
+                packet.leaseTime,
+                options,
+                packet.gatewayIpInt).encode()
+
+        if packet.leaseTime is None:
+            buffer = self.__withoutLeaseTime
+        else:
+            buffer = self.__withLeaseTime
+            ReplyEncoder.__leaseTimeCodec.pack_into(
+                buffer, ReplyEncoder.__leaseTimeOffset, packet.leaseTime)
+
+        ReplyEncoder.__fieldsCodec.pack_into(
+            buffer,
+            ReplyEncoder.__fieldsOffset,
+            packet.transactionId,
+            packet.secondsElapsed,
+            1 << 15,  # server will reply via broadcasts
+            packet.clientIpInt,
+            packet.yourIpInt,
+            packet.serverIpInt,
+            packet.gatewayIpInt,
+            packet.clientHardwareAddr)
+        buffer[ReplyEncoder.__messageTypeOffset] = packet.messageType.value
+        return bytes(buffer)
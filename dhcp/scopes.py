@@ -0,0 +1,302 @@
+from dhcp.server import (
+    DEFAULT_LEASE_TIME, DEFAULT_MAX_TRANSACTIONS, DhcpServer)
+from dhcp.packet import DhcpPacket
+from dhcp.async_server import DatagramServerProtocol
+from dhcp.expiry_heap import ExpiryHeap
+from dhcp.reply_cache import ReplyCache
+from dhcp.admission import AdmissionFilter
+
+import asyncio
+import logging
+import time
+from array import array
+from bisect import bisect_right
+from typing import (
+    Any, Callable, Dict, Generic, Iterable, List, Mapping, Optional, Set,
+    Tuple, TypeVar)
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+Address = Tuple[str, int]
+T = TypeVar('T')
+
+# relay agents listen on the DHCP server port
+RELAY_PORT = 67
+# sub options of option 82, relay agent information
+CIRCUIT_ID = 1
+LINK_SELECTION = 5  # RFC 3527
+
+
+class ScopeIndex(Generic[T]):
+    """Index of values by the network holding an address.
+
+    The networks may not overlap, so they are kept as intervals
+    sorted by their first address
+    and an address is looked up by bisection in O(log n).
+    """
+
+    __slots__ = ('__starts', '__ends', '__values')
+
+    def __init__(self):
+        # first and last address of each network, in order
+        self.__starts = array('I')
+        self.__ends = array('I')
+        self.__values: List[T] = []
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def add(self, network: IPv4Network, value: T) -> None:
+        """Index value by network.
+
+        A ValueError is raised if network overlaps an indexed network.
+        """
+
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        i = bisect_right(self.__starts, start)
+        if (i > 0 and self.__ends[i - 1] >= start) or (
+                i < len(self.__starts) and self.__starts[i] <= end):
+            raise ValueError(f'{network} overlaps an indexed network')
+        self.__starts.insert(i, start)
+        self.__ends.insert(i, end)
+        self.__values.insert(i, value)
+
+    def find(self, ip: int) -> Optional[T]:
+        """The value of the network holding ip (as an int) or None."""
+        i = bisect_right(self.__starts, ip) - 1
+        if i >= 0 and ip <= self.__ends[i]:
+            return self.__values[i]
+        return None
+
+
+class MultiScopeServer:
+    """Server of many scopes, each a DhcpServer with its own network,
+    lease time and options, behind a single socket.
+
+    Relayed packets are routed by their relay agent information,
+    the circuit ID or link selection sub options of option 82,
+    or else by their gateway IP, the relay agent's address
+    on the client's network.
+    Packets not relayed belong to the scope of the server's own network.
+
+    Expired transactions and leases are swept per scope
+    and only the scopes which received packets since the last sweep
+    or have something due are swept.
+    """
+
+    def __init__(
+            self,
+            serverIp: IPv4Address,
+            maxTransactions: int = DEFAULT_MAX_TRANSACTIONS,
+            clock: Callable[[], Seconds] = time.time,
+            replyCache: Optional[ReplyCache] = None,
+            admission: Optional[AdmissionFilter] = None):
+        """Create a server without any scopes, see addScope().
+
+        maxTransactions is the limit of in-flight transactions per scope.
+        replyCache and admission are shared by all scopes,
+        see DhcpServer.
+        """
+
+        self.serverIp = serverIp
+        self.maxTransactions = maxTransactions
+        self.clock = clock
+        self.replyCache = replyCache
+        self.admission = admission
+        # count of packets dropped for belonging to no scope
+        self.unrouted = 0
+
+        # scopes are known by their number, their index into self.__scopes
+        self.__scopes: List[DhcpServer] = []
+        self.__index: ScopeIndex[int] = ScopeIndex()
+        self.__scopesByCircuitIds: Dict[bytes, int] = {}
+        # scopes handling packets since the last sweep
+        self.__touched: Set[int] = set()
+        # scopes by their next timeout or expiry
+        self.__deadlines: ExpiryHeap[int] = ExpiryHeap()
+
+    def addScope(
+            self,
+            interface: IPv4Interface,
+            leaseTime: Seconds = DEFAULT_LEASE_TIME,
+            options: Optional[Mapping[int, Any]] = None,
+            circuitIds: Iterable[bytes] = ()) -> DhcpServer:
+        """Add a scope handing out the addresses of interface.network
+        for leaseTime and return its server.
+
+        interface is the address of the relay agent on the network
+        or of the server itself for its own network.
+        options are sent along with the subnet mask, server identifier
+        and, on a relayed network, the relay agent as router.
+        Packets whose option 82 has one of circuitIds
+        are routed to the scope whatever their gateway IP.
+        A ValueError is raised if the network overlaps another scope
+        or a circuit ID is taken.
+        """
+
+        for circuitId in circuitIds:
+            if circuitId in self.__scopesByCircuitIds:
+                raise ValueError(f'Circuit ID {circuitId!r} is taken')
+        scopeOptions: Dict[int, Any] = {
+            1: interface.netmask, 54: self.serverIp}
+        if interface.ip != self.serverIp:
+            scopeOptions[3] = [interface.ip]
+        if options is not None:
+            scopeOptions.update(options)
+        scope = DhcpServer(
+            interface,
+            self.maxTransactions,
+            scopeOptions,
+            inlineExpiry=False,
+            clock=self.clock,
+            replyCache=self.replyCache,
+            leaseTime=leaseTime,
+            serverIp=self.serverIp)
+        number = len(self.__scopes)
+        self.__index.add(interface.network, number)
+        for circuitId in circuitIds:
+            self.__scopesByCircuitIds[circuitId] = number
+        self.__scopes.append(scope)
+        return scope
+
+    @property
+    def scopes(self) -> List[DhcpServer]:
+        """The server of each scope by its number."""
+        return list(self.__scopes)
+
+    def scopeOf(self, packet: DhcpPacket) -> Optional[int]:
+        """The number of the scope a packet belongs to or None.
+
+        Raises a ValueError if the relay agent information is malformed.
+        """
+
+        ip = packet.gatewayIpInt or int(self.serverIp)
+        options = packet.options
+        if 82 in options:
+            subOptions = options[82]
+            circuitId = subOptions.get(CIRCUIT_ID)
+            if circuitId is not None:
+                number = self.__scopesByCircuitIds.get(circuitId)
+                if number is not None:
+                    return number
+            linkSelection = subOptions.get(LINK_SELECTION)
+            if linkSelection is not None:
+                if len(linkSelection) != 4:
+                    raise ValueError('Link selection must be 4 bytes')
+                ip = int.from_bytes(linkSelection, 'big')
+        return self.__index.find(ip)
+
+    def admit(self, data: bytes) -> bool:
+        """Whether a datagram passes the admission filter, if any,
+        and is worth decoding.
+        """
+
+        admission = self.admission
+        return admission is None or admission.admit(data, self.clock())
+
+    def respond(self, data: bytes) -> Optional[Tuple[bytes, int]]:
+        """Decode a datagram, handle it in its scope and encode the reply.
+
+        Returns the reply and the IP (as an int) of the relay agent
+        to unicast it to, 0 for the server's own network,
+        or None for no reply.
+        Raises a ValueError if the datagram is malformed.
+        """
+
+        if not self.admit(data):
+            return None
+        packet = DhcpPacket.decode(data)
+        number = self.scopeOf(packet)
+        if number is None:
+            self.unrouted += 1
+            log.debug(
+                'No scope for %s relayed by %s',
+                packet.messageType.name,
+                packet.gatewayIp)
+            return None
+
+        scope = self.__scopes[number]
+        reply = scope.cachedReply(packet)
+        if reply is None:
+            returnPacket = scope.recv(packet)
+            self.__touched.add(number)
+            if returnPacket is None:
+                return None
+            reply = scope.encode(returnPacket, packet)
+        return reply, packet.gatewayIpInt
+
+    def sweep(self) -> Optional[Seconds]:
+        """Sweep the scopes which received packets since the last sweep
+        or have a timeout or expiry due.
+
+        Returns the (absolute) time of the next timeout or expiry
+        of any scope or None if there are none.
+        """
+
+        deadlines = self.__deadlines
+        due = self.__touched
+        due.update(deadlines.popExpired(self.clock()))
+        for number in due:
+            deadline = self.__scopes[number].sweep()
+            if deadline is None:
+                deadlines.cancel(number)
+            else:
+                deadlines.schedule(number, deadline)
+        due.clear()
+        return deadlines.peekExpiry()
+
+    @property
+    def leaseCount(self) -> int:
+        return sum(scope.leaseCount for scope in self.__scopes)
+
+
+class MultiScopeServerProtocol(DatagramServerProtocol[MultiScopeServer]):
+    """asyncio front end of a MultiScopeServer
+    unicasting the replies to relayed packets to their relay agent
+    on relayPort.
+    """
+
+    def __init__(
+            self,
+            server: MultiScopeServer,
+            replyAddress: Address,
+            relayPort: int = RELAY_PORT):
+        super().__init__(server, replyAddress)
+        self.relayPort = relayPort
+
+    def handleDatagram(self, data: bytes, addr: Any) -> None:
+        try:
+            routed = self.server.respond(data)
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet from {addr}: {ve}')
+            return
+
+        if routed is None or self.transport is None:
+            return
+        reply, relayIp = routed
+        if relayIp:
+            self.transport.sendto(
+                reply, (str(IPv4Address(relayIp)), self.relayPort))
+        else:
+            self.transport.sendto(reply, self.replyAddress)
+
+
+async def serveScopes(
+        server: MultiScopeServer,
+        port: int,
+        replyAddress: Address,
+        relayPort: int = RELAY_PORT) -> None:
+    """Serve the scopes of server on port until cancelled."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: MultiScopeServerProtocol(server, replyAddress, relayPort),
+        local_addr=('0.0.0.0', port),
+        allow_broadcast=True)
+    log.info(f'Server of {len(server.scopes)} scopes bound to port {port}')
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
@@ -1,44 +1,174 @@
 from dhcp.packet import DhcpPacket, MessageType, OpCode
-from dhcp.server_transaction import ServerTransaction, TransactionType
-from dhcp.singly_linked_list import DoubleEndedLinkedList
+from dhcp.server_transaction import ServerTransaction
+from dhcp.ip_pool import IpPool
+from dhcp.expiry_heap import ExpiryHeap
+from dhcp.transaction_table import TransactionTable
+from dhcp.reply_encoder import ReplyEncoder
+from dhcp.lease_journal import JournalColumns, LeaseJournal, LeaseRecord
+from dhcp.event_log import EventLog, EventType
+from dhcp.metrics import ServerMetrics
+from dhcp.reply_cache import ReplyCache
+from dhcp.admission import AdmissionFilter
+from dhcp.lease_history import LeaseHistory
 
 import logging
-from typing import MutableMapping, Optional, Tuple, Set
+from array import array
+from typing import (
+    TYPE_CHECKING, Any, Callable, Iterable, List, Mapping, MutableMapping,
+    Optional, Tuple, Set, cast)
 from ipaddress import IPv4Address, IPv4Interface
 import time
 
+if TYPE_CHECKING:
+    from dhcp.replication import LeaseReplication
+
 log = logging.getLogger(__name__)
 
 Seconds = float
 
 DEFAULT_LEASE_TIME: Seconds = 600
 DEFAULT_TRANSACTION_TIMEOUT: Seconds = 10
+# time an address declined by a client as in use is not handed out
+DECLINE_QUARANTINE: Seconds = 600
+DEFAULT_MAX_TRANSACTIONS = 4096
+# option a client sends to get an ACK straight away (RFC 4039)
+RAPID_COMMIT = 80
 
 
 class DhcpServer:
     """Class for handling all DHCP packets and replying appropriately."""
 
-    def __init__(self, interface: IPv4Interface):
-        log.info(f'DHCP server created on {interface}')
+    def __init__(
+            self,
+            interface: IPv4Interface,
+            maxTransactions: int = DEFAULT_MAX_TRANSACTIONS,
+            options: Optional[Mapping[int, Any]] = None,
+            inlineExpiry: bool = True,
+            journal: Optional[LeaseJournal] = None,
+            events: Optional[EventLog] = None,
+            metrics: Optional[ServerMetrics] = None,
+            clock: Callable[[], Seconds] = time.time,
+            poolOffsets: Optional[range] = None,
+            replication: Optional['LeaseReplication'] = None,
+            replyCache: Optional[ReplyCache] = None,
+            admission: Optional[AdmissionFilter] = None,
+            leaseTime: Seconds = DEFAULT_LEASE_TIME,
+            serverIp: Optional[IPv4Address] = None,
+            history: Optional[LeaseHistory] = None,
+            inlineCommit: bool = True):
+        """Create a server handing out the addresses of interface.network
+        for leaseTime.
+
+        serverIp is the address of the server
+        when interface is the one of a relay agent on a remote network,
+        which then never hands out interface.ip either.
+        It defaults to interface.ip.
+
+        options are the options sent with every reply
+        and default to the subnet mask and server identifier,
+        and the relay agent as router on a remote network.
+
+        With inlineExpiry, expired transactions and leases
+        are swept while receiving packets.
+        Otherwise the owner of the server is responsible
+        for calling self.sweep(), e.g. from an event loop timer.
+
+        With a journal, the unexpired leases in it are restored
+        and every lease and release is recorded to it.
+        With inlineCommit, the journal is flushed and compacted
+        while handling packets once due.
+        Otherwise the owner of the server is responsible
+        for running self.commitJournal() periodically,
+        e.g. as a background job of async_server.serve().
+
+        With events, structured records of the packets handled
+        and of the leases and transactions are written to it.
+
+        With metrics, packets are counted
+        and the time to decode, handle and encode them is recorded.
+
+        clock gives the current (absolute) time of leases and transactions,
+        e.g. a virtual clock to simulate days of leases in seconds.
+
+        With poolOffsets only the addresses at those offsets
+        into interface.network are handed out,
+        e.g. the slice of the pool owned by one of several workers.
+
+        With replication, every lease and release is also sent to it
+        to be streamed to a peer server,
+        see applyBind() and applyRelease() for the receiving end.
+
+        With a replyCache, replies encoded for a request
+        are sent again to its retransmissions without handling them,
+        see respond().
+
+        With admission, datagrams failing its cheap checks
+        or over the rate limit of their MAC are dropped before parsing,
+        see admit().
+
+        With history, the address a MAC last held is remembered
+        when its lease ends and offered to it again if still free,
+        and is held back from other clients while remembered.
+        """
 
-        # map from ip addresses to lease time (absolute) and macs
-        self.__leasedIps: MutableMapping[IPv4Address, Tuple[Seconds, int]] = {}
-        self.__leasedIpsByMacs: MutableMapping[int, IPv4Address] = {}
-        # singly linked list for time of timeout
-        # and ips sorted by ascending time of timeout
-        self.__closestLeases: DoubleEndedLinkedList[
-            Tuple[Seconds, IPv4Address]] = DoubleEndedLinkedList()
+        log.info('DHCP server created on %s', interface)
+
+        # whether log.info() and log.debug() are enabled,
+        # checked once per packet or batch instead of per call
+        self.__logInfo = False
+        self.__logDebug = False
+        self.__checkLogLevels()
+        self.__events = events
+        self.__metrics = metrics
+
+        # IPs are kept as their offset into the pool (see IpPool.offsetOf())
+        # lease time (absolute) and mac by offset, a lease time of 0 is no lease
+        numAddresses = interface.network.num_addresses
+        self.__leaseTimes = array('d', bytes(8 * numAddresses))
+        self.__leaseMacs = array('Q', bytes(8 * numAddresses))
+        self.__leaseCount = 0
+        self.__leasedIpsByMacs: MutableMapping[int, int] = {}
+        # leased ips by closest time of timeout
+        self.__closestLeases: ExpiryHeap[int] = ExpiryHeap()
+        # IPs declined as in use by closest end of quarantine
+        self.__quarantinedIps: ExpiryHeap[int] = ExpiryHeap()
         # IPs preliminarily reserved (while doing a transaction)
-        self.__markedIps: Set[IPv4Address] = set()
+        self.__markedIps: Set[int] = set()
 
-        # map from transaction ids to ServerTransactions
-        self.__curTransactions: MutableMapping[int, ServerTransaction] = {}
-        # singly linked list of transactions by closest timeout
-        self.__transactionsByTimeouts: DoubleEndedLinkedList[
-            Tuple[Seconds, ServerTransaction]] = DoubleEndedLinkedList()
+        # in-flight ServerTransactions by transaction id
+        self.__curTransactions = TransactionTable(
+            DEFAULT_TRANSACTION_TIMEOUT, maxTransactions)
 
+        if serverIp is None:
+            serverIp = interface.ip
         self.interface = interface
-        self.__nextIp: Optional[IPv4Address] = None
+        self.inlineExpiry = inlineExpiry
+        self.inlineCommit = inlineCommit
+        self.leaseTime = leaseTime
+        # free host addresses of the network,
+        # the server's own and the relay agent's are never free
+        self.__pool = IpPool(
+            interface.network, [interface.ip, serverIp], poolOffsets)
+        self.__nextIp: Optional[int] = None
+        self.__serverIp = int(serverIp)
+
+        if options is None:
+            options = {1: interface.netmask, 54: serverIp}
+            if serverIp != interface.ip:
+                options[3] = [interface.ip]
+        self.__encoder = ReplyEncoder(serverIp, options)
+
+        self.clock = clock
+        # time of the packets being handled
+        self.__now: Seconds = clock()
+
+        self.__replication = replication
+        self.replyCache = replyCache
+        self.admission = admission
+        self.history = history
+        self.__journal = journal
+        if journal is not None:
+            self.__restoreLeases(journal.loadColumns())
 
     def recv(self, packet: DhcpPacket) -> Optional[DhcpPacket]:
         """Recieves a DHCP packet and returns a response packet.
@@ -46,67 +176,148 @@ class DhcpServer:
         The response packet may be None to indicate to not reply.
         """
 
-        log.info(
-            f'Recieved {packet.messageType.name} '
-            f'with MAC of {packet.clientHardwareAddr} and '
-            f'ID of {packet.transactionId}')
-        log.debug(f'Recieved packet: {packet}')
+        self.__now = self.clock()
+        self.__checkLogLevels()
+        if self.inlineExpiry:
+            self.__timeoutTransactions()
+            if packet.messageType is MessageType.DISCOVER:
+                self.__timeoutIps()
+        if self.__metrics is None:
+            returnPacket = self.__handle(packet)
+        else:
+            returnPacket = self.__handleMetered(packet)
+        self.__commitJournal(False)
+        return returnPacket
 
-        # self.__timeoutTransactions()
+    def recvMany(
+            self,
+            packets: Iterable[DhcpPacket]) -> List[Optional[DhcpPacket]]:
+        """Recieves a batch of DHCP packets
+        and returns their response packets in order.
+
+        The whole batch is handled as if recieved at the same time,
+        with a single sweep of expired transactions and leases,
+        and the leases of the batch are committed to the journal together
+        before returning.
+        A packet raising a ValueError gets no response
+        without dropping the rest of the batch.
+        """
 
-        transaction: Optional[ServerTransaction] = None
+        self.__now = self.clock()
+        self.__checkLogLevels()
+        if self.inlineExpiry:
+            self.__timeoutTransactions()
+            self.__timeoutIps()
+        handle = (
+            self.__handle if self.__metrics is None else self.__handleMetered)
+        returnPackets: List[Optional[DhcpPacket]] = []
+        for packet in packets:
+            try:
+                returnPackets.append(handle(packet))
+            except ValueError as ve:
+                log.warning('Dropped malformed packet: %s', ve)
+                returnPackets.append(None)
+        self.__commitJournal(True)
+        return returnPackets
+
+    def __handleMetered(self, packet: DhcpPacket) -> Optional[DhcpPacket]:
+        """self.__handle() recording the packet in self.__metrics."""
+        metrics = cast(ServerMetrics, self.__metrics)
+        if metrics.sampleTiming():
+            start = time.perf_counter()
+            returnPacket = self.__handle(packet)
+            metrics.handleTime.observe(time.perf_counter() - start)
+        else:
+            returnPacket = self.__handle(packet)
+        metrics.countPacket(packet, returnPacket)
+        return returnPacket
+
+    def __handle(self, packet: DhcpPacket) -> Optional[DhcpPacket]:
+        """Handle a packet recieved at self.__now."""
+
+        if self.__logInfo:
+            log.info(
+                'Recieved %s with MAC of %s and ID of %s',
+                packet.messageType.name,
+                packet.clientHardwareAddr,
+                packet.transactionId)
+        if self.__logDebug:
+            log.debug('Recieved packet: %s', packet)
+        events = self.__events
+        sampledEvents = (
+            events if events is not None and events.samplePacket() else None)
+        if sampledEvents is not None:
+            sampledEvents.emit(
+                self.__now,
+                EventType.RECV,
+                packet.messageType,
+                packet.transactionId,
+                packet.clientHardwareAddr,
+                packet.yourIpInt)
+
+        transaction: Optional[ServerTransaction] = (
+            self.__curTransactions.get(packet.transactionId))
         returnPacket: Optional[DhcpPacket] = None
 
-        if packet.transactionId not in self.__curTransactions:
+        if transaction is None:
             if packet.messageType is MessageType.DISCOVER:
                 if packet.clientHardwareAddr not in self.__leasedIpsByMacs:
-                    self.__timeoutIps()
-                    self.__setNextIp()
-                    if self.__nextIp is not None:
+                    self.__setNextIp(packet.clientHardwareAddr)
+                    if (self.__nextIp is not None
+                            and RAPID_COMMIT in packet.options):
+                        # lease right away instead of offering
+                        self.__leaseIp(
+                            self.__nextIp, packet.clientHardwareAddr)
+                        returnPacket = self.__ack(
+                            packet, self.__nextIp, int(self.leaseTime))
+                    elif self.__nextIp is not None:
                         self.__markIp(self.__nextIp)
-                        transaction = ServerTransaction()
-                        transaction.transactionId = packet.transactionId
-                        transaction.yourIp = self.__nextIp
-                        transaction.serverIp = self.interface.ip
-                        transaction.leaseTime = int(DEFAULT_LEASE_TIME)
+                        transaction = ServerTransaction(
+                            packet.transactionId,
+                            packet.clientHardwareAddr,
+                            self.__pool.ipAt(self.__nextIp))
                         self.__registerTransaction(transaction)
 
                 else:
-                    leaseTime = int(
-                           self.__leasedIps[
-                                self.__leasedIpsByMacs[
-                                    packet.clientHardwareAddr]
-                                ][0]
-                            -  time.time())
+                    offset = self.__leasedIpsByMacs[packet.clientHardwareAddr]
+                    ip = self.__pool.ipAt(offset)
+                    leaseTime = int(self.__leaseTimes[offset] - self.__now)
                     returnPacket = DhcpPacket.fromArgs(
                         OpCode.REPLY,
                         packet.transactionId,
                         packet.secondsElapsed,
-                        self.__leasedIpsByMacs[packet.clientHardwareAddr],
-                        self.__leasedIpsByMacs[packet.clientHardwareAddr],
-                        self.interface.ip,
+                        ip,
+                        ip,
+                        self.__serverIp,
                         packet.clientHardwareAddr,
                         MessageType.ACK,
                         leaseTime if leaseTime >= 0 else 0
                         )
+                    if RAPID_COMMIT in packet.options:
+                        returnPacket.options[RAPID_COMMIT] = b''
 
             elif packet.messageType is MessageType.REQUEST:
-                if packet.yourIp not in self.__leasedIps:
-                    self.__markIp(packet.yourIp)
-                    transaction = ServerTransaction()
-                    transaction.transactionId = packet.transactionId
-                    transaction.yourIp = packet.yourIp
-                    transaction.serverIp = self.interface.ip
-                    transaction.leaseTime = int(DEFAULT_LEASE_TIME)
-                    self.__registerTransaction(transaction)
+                # a renewal or a client rebooting with its last address,
+                # handled without a transaction
+                offset = self.__pool.offsetOf(packet.yourIpInt)
+                if offset is not None and (
+                        self.__pool.isFree(offset)
+                        or (self.__leaseTimes[offset]
+                            and self.__leaseMacs[offset]
+                            == packet.clientHardwareAddr)):
+                    self.__leaseIp(offset, packet.clientHardwareAddr)
+                    returnPacket = self.__ack(
+                        packet, offset, int(self.leaseTime))
                 else:
+                    # leased to another MAC, offered to another client
+                    # or not an address of the pool
                     returnPacket = DhcpPacket.fromArgs(
                         OpCode.REPLY,
                         packet.transactionId,
                         packet.secondsElapsed,
-                        IPv4Address(0),
-                        IPv4Address(0),
-                        self.interface.ip,
+                        0,
+                        0,
+                        self.__serverIp,
                         packet.clientHardwareAddr,
                         MessageType.NAK)
 
@@ -115,152 +326,607 @@ class DhcpServer:
                     self.__freeIp(
                         self.__leasedIpsByMacs[packet.clientHardwareAddr])
                 else:
-                    log.info(f'No IP to release for {packet.clientHardwareAddr}')
+                    log.info(
+                        'No IP to release for %s', packet.clientHardwareAddr)
 
-        else:
-            transaction = self.__curTransactions[packet.transactionId]
+            elif packet.messageType is MessageType.DECLINE:
+                # the address ACKed is in use, the client starts over
+                if packet.clientHardwareAddr in self.__leasedIpsByMacs:
+                    self.__declineIp(
+                        self.__leasedIpsByMacs[packet.clientHardwareAddr])
+                else:
+                    log.info(
+                        'No IP to decline for %s', packet.clientHardwareAddr)
 
         if transaction is not None:
             try:
-                isTransactionOver, returnPacket = transaction.recv(packet)
+                isTransactionOver, returnPacket = transaction.recv(
+                    packet, self.__serverIp, int(self.leaseTime))
             except ValueError as ve:
-                log.error(f'Transaction error: {ve}')
-                self.__unmarkIp(transaction.yourIp)
+                log.error('Transaction error: %s', ve)
+                self.__unmarkIp(self.__offsetOf(transaction))
                 self.__freeTransaction(transaction.transactionId)
                 returnPacket = DhcpPacket.fromArgs(
                     OpCode.REPLY,
                     transaction.transactionId,
                     packet.secondsElapsed,
-                    IPv4Address(0),
-                    IPv4Address(0),
-                    self.interface.ip,
+                    0,
+                    0,
+                    self.__serverIp,
                     transaction.clientHardwareAddr,
                     MessageType.NAK)
             else:
                 if isTransactionOver:
-                    self.__unmarkIp(transaction.yourIp)
-                    if transaction.transactionType is TransactionType.DISCOVER:
-                        if transaction.requestIp not in self.__leasedIps:
-                            self.__leaseIp(
-                                transaction.yourIp,
-                                transaction.clientHardwareAddr)
-                        else:
-                            returnPacket = DhcpPacket.fromArgs(
-                                OpCode.REPLY,
-                                transaction.transactionId,
-                                packet.secondsElapsed,
-                                packet.yourIp,
-                                IPv4Address(0),
-                                self.interface.ip,
-                                transaction.clientHardwareAddr,
-                                MessageType.NAK)
-                    elif transaction.transactionType is TransactionType.RENEW:
+                    offset = self.__offsetOf(transaction)
+                    self.__unmarkIp(offset)
+                    requestOffset = self.__pool.offsetOf(packet.yourIpInt)
+                    if (requestOffset is None
+                            or not self.__leaseTimes[requestOffset]):
                         self.__leaseIp(
-                            transaction.yourIp,
+                            offset,
                             transaction.clientHardwareAddr)
+                    else:
+                        returnPacket = DhcpPacket.fromArgs(
+                            OpCode.REPLY,
+                            transaction.transactionId,
+                            packet.secondsElapsed,
+                            packet.yourIpInt,
+                            0,
+                            self.__serverIp,
+                            transaction.clientHardwareAddr,
+                            MessageType.NAK)
 
                     self.__freeTransaction(transaction.transactionId)
 
-        log.debug(f'Return packet: {returnPacket}')
+        if returnPacket is not None and packet.gatewayIpInt:
+            # replies go back through the relay agent
+            # along with its information (RFC 3046),
+            # copied undecoded as the lease may already be bound
+            returnPacket.gatewayIpInt = packet.gatewayIpInt
+            if 82 in packet.options:
+                returnPacket.options[82] = packet.options.rawValue(82)
+        if self.__logDebug:
+            log.debug('Return packet: %s', returnPacket)
+        if sampledEvents is not None and returnPacket is not None:
+            sampledEvents.emit(
+                self.__now,
+                EventType.REPLY,
+                returnPacket.messageType,
+                returnPacket.transactionId,
+                returnPacket.clientHardwareAddr,
+                returnPacket.yourIpInt)
         return returnPacket
 
+    def __ack(
+            self,
+            packet: DhcpPacket,
+            offset: int,
+            leaseTime: int) -> DhcpPacket:
+        """ACK of the lease of the IP at offset answering packet
+        with Rapid Commit if packet asked for it.
+        """
+
+        returnPacket = DhcpPacket.fromArgs(
+            OpCode.REPLY,
+            packet.transactionId,
+            packet.secondsElapsed,
+            packet.clientIpInt,
+            self.__pool.ipAt(offset),
+            self.__serverIp,
+            packet.clientHardwareAddr,
+            MessageType.ACK,
+            leaseTime)
+        if RAPID_COMMIT in packet.options:
+            returnPacket.options[RAPID_COMMIT] = b''
+        return returnPacket
+
+    def __checkLogLevels(self) -> None:
+        self.__logInfo = log.isEnabledFor(logging.INFO)
+        self.__logDebug = log.isEnabledFor(logging.DEBUG)
+
+    def sweep(self) -> Optional[Seconds]:
+        """Drop timed out transactions and expired leases.
+
+        Returns the (absolute) time of the next timeout or expiry
+        or None if there are no transactions or leases.
+        """
+
+        self.__now = self.clock()
+        self.__checkLogLevels()
+        self.__timeoutTransactions()
+        self.__timeoutIps()
+
+        self.__commitJournal(False)
+
+        deadlines = [
+            deadline for deadline in (
+                self.__curTransactions.peekTimeout(),
+                self.__closestLeases.peekExpiry(),
+                self.__quarantinedIps.peekExpiry())
+            if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def leases(self) -> List[LeaseRecord]:
+        """The current leases as (ip, mac, expiry)."""
+        leaseTimes = self.__leaseTimes
+        leaseMacs = self.__leaseMacs
+        return [
+            (self.__pool.ipAt(offset), leaseMacs[offset], leaseTimes[offset])
+            for offset in self.__leasedIpsByMacs.values()]
+
+    def compactJournal(self) -> None:
+        """Snapshot the current leases into the journal."""
+        if self.__journal is not None:
+            self.__journal.compact(self.leases())
+
+    def commitJournal(self) -> Optional[Callable[[], None]]:
+        """Detach the pending journal records, or a snapshot of the leases
+        if the journal needs compaction,
+        and return the function writing them to disk
+        or None if there is nothing to write.
+
+        The function does not touch the server
+        and can be run on another thread.
+        """
+
+        journal = self.__journal
+        if journal is None:
+            return None
+        if journal.needsCompaction(self.__leaseCount):
+            return journal.detachCompaction(self.leases())
+        return journal.detachFlush()
+
+    def applyBind(
+            self,
+            ip: int,
+            clientHardwareAddr: int,
+            expiry: Seconds) -> None:
+        """Take over a lease bound by a peer server without replicating it.
+
+        Leases already expired or older than the one held are ignored.
+        """
+
+        self.__now = self.clock()
+        self.__checkLogLevels()
+        offset = self.__pool.offsetOf(ip)
+        if offset is None:
+            log.warning(
+                'Ignored a lease of %s outside of the pool', IPv4Address(ip))
+            return
+        if expiry <= self.__now or (
+                self.__leaseMacs[offset] == clientHardwareAddr
+                and self.__leaseTimes[offset] >= expiry):
+            return
+        self.__leaseIp(offset, clientHardwareAddr, expiry, False)
+        self.__commitJournal(False)
+
+    def applyRelease(self, ip: int, clientHardwareAddr: int) -> None:
+        """Release a lease released by a peer server without replicating it."""
+        self.__checkLogLevels()
+        offset = self.__pool.offsetOf(ip)
+        if (offset is not None and self.__leaseTimes[offset]
+                and self.__leaseMacs[offset] == clientHardwareAddr):
+            self.__freeIp(offset, False)
+            self.__commitJournal(False)
+
+    def __commitJournal(self, force: bool) -> None:
+        """Flush the journal if forced or due and compact it if needed,
+        unless it is committed by the owner of the server.
+        """
+
+        journal = self.__journal
+        if journal is not None and self.inlineCommit:
+            if journal.needsCompaction(self.__leaseCount):
+                self.compactJournal()
+            elif force or journal.isFlushDue():
+                journal.flush()
+
+    def __restoreLeases(self, records: JournalColumns) -> None:
+        """Reinstate leases from a journal without recording them.
+
+        The records are applied to the lease arrays in a single pass
+        from the last one backwards, so the first record seen
+        of an IP or MAC is the one that wins,
+        and the pool and expiry heap are then built once.
+        """
+
+        pool = self.__pool
+        base = pool.ipAt(0)
+        # offset of the broadcast address
+        end = pool.network.num_addresses - 1
+        now = self.__now
+        bind = LeaseJournal.BIND
+        leaseTimes = self.__leaseTimes
+        leaseMacs = self.__leaseMacs
+        leasedIpsByMacs = self.__leasedIpsByMacs
+        seen = bytearray(end + 1)
+        offsets: List[int] = []
+        outside = 0
+        for ip, mac, expiry, op in zip(*map(reversed, records)):
+            offset = ip - base
+            if not 0 < offset < end:
+                outside += 1
+            elif not seen[offset]:
+                seen[offset] = 1
+                # not released, expired while down or superseded
+                if (op == bind and expiry > now
+                        and mac not in leasedIpsByMacs):
+                    leaseTimes[offset] = expiry
+                    leaseMacs[offset] = mac
+                    leasedIpsByMacs[mac] = offset
+                    offsets.append(offset)
+        if outside:
+            log.warning(
+                'Skipped restoring %s records outside of the pool', outside)
+
+        pool.takeMany(offsets)
+        self.__leaseCount = len(offsets)
+        self.__closestLeases.scheduleMany(
+            zip(offsets, map(leaseTimes.__getitem__, offsets)))
+        log.info('Restored %s leases', self.__leaseCount)
+
+    def decode(self, data: bytes) -> DhcpPacket:
+        """Decode a datagram for self.recv().
+
+        Raises a ValueError if the datagram is malformed.
+        """
+
+        metrics = self.__metrics
+        if metrics is None:
+            return DhcpPacket.decode(data)
+
+        sampled = metrics.sampleTiming()
+        start = time.perf_counter() if sampled else 0
+        try:
+            packet = DhcpPacket.decode(data)
+        except ValueError:
+            metrics.malformed += 1
+            raise
+        if sampled:
+            metrics.parseTime.observe(time.perf_counter() - start)
+        return packet
+
+    def encode(
+            self,
+            packet: DhcpPacket,
+            request: Optional[DhcpPacket] = None) -> bytes:
+        """Encode a packet returned by self.recv() with the server's options.
+
+        With the request it answers and a reply cache,
+        the reply is cached for retransmissions of the request.
+        """
+
+        metrics = self.__metrics
+        if metrics is None or not metrics.sampleTiming():
+            data = self.__encoder.encode(packet)
+        else:
+            start = time.perf_counter()
+            data = self.__encoder.encode(packet)
+            metrics.encodeTime.observe(time.perf_counter() - start)
+
+        cache = self.replyCache
+        if request is not None and cache is not None:
+            cache.put(
+                (request.transactionId,
+                    request.clientHardwareAddr,
+                    request.messageType._value_),
+                data,
+                self.clock())
+        return data
+
+    def cachedReply(self, request: DhcpPacket) -> Optional[bytes]:
+        """The reply already sent to request if it is a retransmission,
+        otherwise None.
+        """
+
+        cache = self.replyCache
+        if cache is None:
+            return None
+        reply = cache.get(
+            (request.transactionId,
+                request.clientHardwareAddr,
+                request.messageType._value_),
+            self.clock())
+        if reply is None:
+            return None
+        if self.__metrics is not None:
+            self.__metrics.countResent(
+                request, DhcpPacket.peekMessageType(reply))
+        if self.__logDebug:
+            log.debug(
+                'Resent the reply to %s with ID of %s',
+                request.messageType.name,
+                request.transactionId)
+        return reply
+
+    def admit(self, data: bytes) -> bool:
+        """Whether a datagram passes the admission filter, if any,
+        and is worth decoding.
+        """
+
+        admission = self.admission
+        return admission is None or admission.admit(data, self.clock())
+
+    def respond(self, data: bytes) -> Optional[bytes]:
+        """Decode a datagram, handle it and encode the reply, if any.
+
+        Datagrams not admitted are dropped without a reply
+        and retransmissions are answered from the reply cache.
+        Raises a ValueError if the datagram is malformed.
+        """
+
+        if not self.admit(data):
+            return None
+        packet = self.decode(data)
+        reply = self.cachedReply(packet)
+        if reply is not None:
+            return reply
+        returnPacket = self.recv(packet)
+        if returnPacket is None:
+            return None
+        return self.encode(returnPacket, packet)
+
+    @property
+    def leaseCount(self) -> int:
+        return self.__leaseCount
+
+    @property
+    def journal(self) -> Optional[LeaseJournal]:
+        return self.__journal
+
+    @property
+    def markedCount(self) -> int:
+        """Count of IPs reserved by in-flight transactions."""
+        return len(self.__markedIps)
+
+    @property
+    def freeCount(self) -> int:
+        return self.__pool.freeCount
+
+    @property
+    def transactionCount(self) -> int:
+        return len(self.__curTransactions)
+
+    def __offsetOf(self, transaction: ServerTransaction) -> int:
+        """Offset of the IP of a transaction, which is always in the pool."""
+        return cast(int, self.__pool.offsetOf(transaction.yourIp))
+
     def __registerTransaction(self, transaction: ServerTransaction):
         """Register a new transaction."""
 
-        timeout = time.time() + DEFAULT_TRANSACTION_TIMEOUT
-        self.__curTransactions[transaction.transactionId] = transaction
-        self.__transactionsByTimeouts.pushBack((timeout, transaction))
-        log.debug(
-            f'Registered transaction with '
-            f'ID {transaction.transactionId}')
+        evicted = self.__curTransactions.add(transaction, self.__now)
+        for oldTransaction in evicted:
+            self.__unmarkIp(self.__offsetOf(oldTransaction))
+            if self.__events is not None:
+                self.__events.emit(
+                    self.__now,
+                    EventType.EVICT,
+                    None,
+                    oldTransaction.transactionId,
+                    ip=oldTransaction.yourIp)
+            if self.__logDebug:
+                log.debug(
+                    'Evicted transaction with ID %s',
+                    oldTransaction.transactionId)
+        if self.__logDebug:
+            log.debug(
+                'Registered transaction with ID %s',
+                transaction.transactionId)
 
     def __timeoutTransactions(self) -> None:
         """Drop any transactions whose transaction has not completed
-        in a set period.
+        in a set period and unmark their IPs.
         """
 
-        if not self.__transactionsByTimeouts.isEmpty():
-            curTime = time.time()
-            while (
-                not self.__transactionsByTimeouts.isEmpty()
-                and self.__transactionsByTimeouts.peekFront()[0] <= curTime):
-                _, transaction = self.__transactionsByTimeouts.popFront()
-                del self.__curTransactions[transaction.transactionId]
+        for transaction in self.__curTransactions.popExpired(self.__now):
+            self.__unmarkIp(self.__offsetOf(transaction))
+            if self.__events is not None:
+                self.__events.emit(
+                    self.__now,
+                    EventType.TIMEOUT,
+                    None,
+                    transaction.transactionId,
+                    ip=transaction.yourIp)
+            if self.__logDebug:
+                log.debug(
+                    'Timed out transaction with ID %s',
+                    transaction.transactionId)
 
     def __freeTransaction(self, transactionId: int) -> None:
         """Remove the transaction from the server by ID. Assumes existence."""
-        self.__transactionsByTimeouts.removeBy(lambda t: t[1] == transactionId)
-        del self.__curTransactions[transactionId]
-        log.debug(f'Freed transaction with ID {transactionId}')
-
-    def __leaseIp(self, ip: IPv4Address, clientHardwareAddr: int) -> None:
-        """Reserve an IP address on the server."""
-        leaseTime = time.time() + DEFAULT_LEASE_TIME
-        self.__leasedIps[ip] = (leaseTime, clientHardwareAddr)
-        self.__leasedIpsByMacs[clientHardwareAddr] = ip
-        self.__closestLeases.pushBack((leaseTime, ip))
-        log.debug(f'Leased {ip} to {clientHardwareAddr}')
+        self.__curTransactions.remove(transactionId)
+        if self.__logDebug:
+            log.debug('Freed transaction with ID %s', transactionId)
+
+    def __leaseIp(
+            self,
+            offset: int,
+            clientHardwareAddr: int,
+            leaseTime: Optional[Seconds] = None,
+            replicate: bool = True) -> None:
+        """Reserve an IP address on the server
+        until leaseTime (absolute), by default a full lease from now.
+
+        Leasing an IP again renews it
+        and a MAC holds at most one lease.
+        """
+
+        oldOffset = self.__leasedIpsByMacs.get(clientHardwareAddr)
+        if oldOffset != offset:
+            self.__invalidateReplies(clientHardwareAddr)
+            if oldOffset is not None:
+                # the peer drops the old lease of the MAC on its own
+                self.__freeIp(oldOffset, False)
+        if self.__leaseTimes[offset]:
+            oldMac = self.__leaseMacs[offset]
+            if oldMac != clientHardwareAddr:
+                del self.__leasedIpsByMacs[oldMac]
+                self.__invalidateReplies(oldMac)
+        else:
+            self.__leaseCount += 1
+
+        if leaseTime is None:
+            leaseTime = self.__now + self.leaseTime
+        self.__leaseTimes[offset] = leaseTime
+        self.__leaseMacs[offset] = clientHardwareAddr
+        self.__leasedIpsByMacs[clientHardwareAddr] = offset
+        self.__closestLeases.schedule(offset, leaseTime)
+        self.__quarantinedIps.cancel(offset)
+        self.__pool.take(offset)
+        if self.history is not None:
+            # the MAC may have been moved off an address held for it
+            forgotten = self.history.forget(clientHardwareAddr)
+            if (forgotten is not None and forgotten != offset
+                    and self.__leaseMacs[forgotten] == clientHardwareAddr):
+                self.__pool.unhold(forgotten)
+        ip = self.__pool.ipAt(offset)
+        if self.__journal is not None:
+            self.__journal.bind(ip, clientHardwareAddr, leaseTime)
+        if replicate and self.__replication is not None:
+            self.__replication.bind(ip, clientHardwareAddr, leaseTime)
+        if self.__events is not None:
+            self.__events.emit(
+                self.__now,
+                EventType.LEASE,
+                clientHardwareAddr=clientHardwareAddr,
+                ip=ip)
+        if self.__logDebug:
+            log.debug(
+                'Leased %s to %s', IPv4Address(ip), clientHardwareAddr)
 
     def __timeoutIps(self) -> None:
-        """Unreserve IPs based on expired lease times."""
-        if not self.__closestLeases.isEmpty():
-            curTime = time.time()
-            while (
-                not self.__closestLeases.isEmpty()
-                and self.__closestLeases.peekFront()[0] <= curTime):
-                _, ip = self.__closestLeases.peekFront()
-                _, mac = self.__leasedIps[ip]
-                log.debug(f'Freed {ip} belonging to {mac}')
-                del self.__leasedIpsByMacs[mac]
-                del self.__leasedIps[ip]
-                self.__closestLeases.popFront()
-
-    def __freeIp(self, ip: IPv4Address) -> None:
-        """Unreserve a specific IP. Assumes existence."""
-        _, mac = self.__leasedIps[ip]
-        del self.__leasedIpsByMacs[mac]
-        del self.__leasedIps[ip]
-        self.__closestLeases.removeBy(lambda l: l[1] == ip)
-        log.debug(f'Freed {ip}')
+        """Unreserve IPs based on expired lease times
+        and return those whose quarantine ended to the pool.
+        """
 
-    def __markIp(self, ip: IPv4Address) -> None:
-        """Mark an IP as taken for
-        the purpose of reserving during a transaction.
+        for offset in self.__closestLeases.popExpired(self.__now):
+            mac = self.__leaseMacs[offset]
+            self.__leaseTimes[offset] = 0
+            self.__leaseCount -= 1
+            del self.__leasedIpsByMacs[mac]
+            self.__invalidateReplies(mac)
+            if offset not in self.__markedIps:
+                self.__pool.release(offset)
+            if self.history is not None:
+                self.__remember(offset, mac)
+            if self.__events is not None:
+                self.__events.emit(
+                    self.__now,
+                    EventType.EXPIRE,
+                    clientHardwareAddr=mac,
+                    ip=self.__pool.ipAt(offset))
+            if self.__logDebug:
+                log.debug(
+                    'Freed %s belonging to %s',
+                    IPv4Address(self.__pool.ipAt(offset)),
+                    mac)
+        for offset in self.__quarantinedIps.popExpired(self.__now):
+            self.__pool.release(offset)
+
+    def __declineIp(self, offset: int) -> None:
+        """Free a leased IP its client found in use
+        and keep it out of the pool for DECLINE_QUARANTINE.
+        """
+
+        self.__freeIp(offset, remember=False)
+        self.__pool.take(offset)
+        self.__quarantinedIps.schedule(
+            offset, self.__now + DECLINE_QUARANTINE)
+        if self.__logInfo:
+            log.info(
+                'Quarantined %s declined as in use',
+                IPv4Address(self.__pool.ipAt(offset)))
+
+    def __freeIp(
+            self,
+            offset: int,
+            replicate: bool = True,
+            remember: bool = True) -> None:
+        """Unreserve a specific IP. Assumes existence.
+
+        Unless remember is false,
+        the IP is offered again to its MAC if still free, see self.history.
         """
 
-        self.__markedIps.add(ip)
-        log.debug(f'{ip} marked')
+        mac = self.__leaseMacs[offset]
+        del self.__leasedIpsByMacs[mac]
+        self.__invalidateReplies(mac)
+        self.__leaseTimes[offset] = 0
+        self.__leaseCount -= 1
+        self.__closestLeases.cancel(offset)
+        ip = self.__pool.ipAt(offset)
+        if self.__journal is not None:
+            self.__journal.release(ip, mac)
+        if replicate and self.__replication is not None:
+            self.__replication.release(ip, mac)
+        if offset not in self.__markedIps:
+            self.__pool.release(offset)
+        if remember and self.history is not None:
+            self.__remember(offset, mac)
+        if self.__events is not None:
+            self.__events.emit(
+                self.__now,
+                EventType.FREE,
+                clientHardwareAddr=mac,
+                ip=ip)
+        if self.__logDebug:
+            log.debug('Freed %s', IPv4Address(ip))
+
+    def __invalidateReplies(self, clientHardwareAddr: int) -> None:
+        """Drop the cached replies of a MAC whose lease changed."""
+        if self.replyCache is not None:
+            self.replyCache.invalidate(clientHardwareAddr)
+
+    def __remember(self, offset: int, clientHardwareAddr: int) -> None:
+        """Record the end of the lease of a MAC in self.history
+        and hold its address for it if free.
+        """
 
-    def __unmarkIp(self, ip: IPv4Address) -> None:
-        """Unmark an IP. Assumes IP is marked. See __markIP()"""
-        self.__markedIps.remove(ip)
-        log.debug(f'{ip} unmarked')
+        history = cast(LeaseHistory, self.history)
+        evicted = history.record(clientHardwareAddr, offset)
+        if evicted is not None:
+            oldMac, oldOffset = evicted
+            # unless leased to another MAC since
+            if self.__leaseMacs[oldOffset] == oldMac:
+                self.__pool.unhold(oldOffset)
+        self.__pool.hold(offset)
 
-    def __setNextIp(self) -> None:
-        """Update self.__nextIp with the next available IP
-        or None if no such IP exists.
+    def __markIp(self, offset: int) -> None:
+        """Mark an IP as taken for
+        the purpose of reserving during a transaction.
         """
 
-        lastIp: IPv4Address
-        if self.__nextIp is None:
-            self.__nextIp = self.interface.network.network_address + 1
-            if self.__nextIp not in self.__leasedIps:
-                log.debug(f'Next IP: {self.__nextIp}')
-                return
+        self.__markedIps.add(offset)
+        self.__pool.take(offset)
+        if self.__logDebug:
+            log.debug('%s marked', IPv4Address(self.__pool.ipAt(offset)))
 
-        lastIp = self.__nextIp
-        self.__nextIp += 1
+    def __unmarkIp(self, offset: int) -> None:
+        """Unmark an IP. See __markIP()"""
+        self.__markedIps.discard(offset)
+        if not self.__leaseTimes[offset]:
+            self.__pool.release(offset)
+        if self.__logDebug:
+            log.debug('%s unmarked', IPv4Address(self.__pool.ipAt(offset)))
 
-        while (
-                self.__nextIp in self.__leasedIps
-                or self.__nextIp in self.__markedIps
-                ) and self.__nextIp != lastIp:
-            if self.__nextIp == self.interface.network.broadcast_address - 1:
-                self.__nextIp = self.interface.network.network_address + 1
-            else:
-                self.__nextIp += 1
+    def __setNextIp(self, clientHardwareAddr: int) -> None:
+        """Update self.__nextIp with the offset of the next available IP
+        for a MAC or None if no such IP exists.
 
-        if self.__nextIp == lastIp:
-            self.__nextIp = None
+        The IP the MAC last held comes first if it is still free.
+        """
 
-        log.debug(f'Next IP is {self.__nextIp}')
+        history = self.history
+        if history is not None:
+            offset = history.get(clientHardwareAddr)
+            if (offset is not None and self.__pool.isFree(offset)
+                    and self.__leaseMacs[offset] == clientHardwareAddr):
+                history.hits += 1
+                self.__nextIp = offset
+                return
+        self.__nextIp = self.__pool.peek()
+        if self.__logDebug:
+            log.debug(
+                'Next IP is %s',
+                None if self.__nextIp is None
+                else IPv4Address(self.__pool.ipAt(self.__nextIp)))
@@ -1,126 +1,148 @@
 from dhcp.packet import DhcpPacket, MessageType, OpCode
-from dhcp.transaction import Transaction, TransactionType
 
 import logging
-from typing import Optional, Tuple, Generator
+from enum import IntEnum
+from typing import Callable, Dict, Optional, Tuple
 from ipaddress import IPv4Address
 
 log = logging.getLogger(__name__)
 
+Seconds = float
 
-class ServerTransaction(Transaction):
-    """Class for representing an ongoing session with a client.
-
-    An ongoing session means there
-    is more than 1 packet exchanged.
-    A DHCP release is not a session.
 
-    Various differing pieces of data
-    are required for various transaction types.
-    It is the responsibility of the server
-    to set the appropriate variables
-    for the appropriate session type.
+class TransactionState(IntEnum):
+    """State of a ServerTransaction.
 
-    This class forms a tagged union or sum type
-    with the self.transactionType being the tag.
+    States are small ints so they fit an array('B').
     """
 
-    __transaction: Optional[
-        Generator[DhcpPacket, DhcpPacket, Optional[DhcpPacket]]]
-
-    yourIp: IPv4Address
-    serverIp: IPv4Address
-    leaseTime: int  # unsigned
-
-    requestIp: IPv4Address
-
-    def __init__(self):
-        self.__transaction = None
-
-    def __gen(self, packet: DhcpPacket) -> Generator[
-            DhcpPacket, DhcpPacket, Optional[DhcpPacket]]:
-        """Implements self.recv as a coroutine using a python generator."""
-
-        self.transactionId = packet.transactionId
-        self.clientHardwareAddr = packet.clientHardwareAddr
-
-        if packet.messageType is MessageType.DISCOVER:
-            self.transactionType = TransactionType.DISCOVER
-            log.info('Start DISCOVER transaction')
-            log.info(
-                'DISCOVER transaction: Reply with OFFER of '
-                f'{self.yourIp} for {self.leaseTime} seconds')
-            packet = yield DhcpPacket.fromArgs(
-                OpCode.REPLY,
-                self.transactionId,
-                packet.secondsElapsed,
-                packet.clientIp,
-                self.yourIp,
-                self.serverIp,
-                packet.clientHardwareAddr,
-                MessageType.OFFER,
-                self.leaseTime)
-
-            if packet.messageType is MessageType.REQUEST:
-                log.info(
-                    'DISCOVER transaction: Recieved REQUEST of '
-                    f'{packet.yourIp} for {packet.leaseTime} seconds')
-                self.requestIp = packet.yourIp
-                return DhcpPacket.fromArgs(
-                    OpCode.REPLY,
-                    self.transactionId,
-                    packet.secondsElapsed,
-                    packet.clientIp,
-                    self.yourIp,
-                    self.serverIp,
-                    packet.clientHardwareAddr,
-                    MessageType.ACK,
-                    self.leaseTime)
-            else:
-                raise ValueError(
-                    f'Expected DHCP REQUEST. Got {packet.messageType.name}.')
+    NEW = 0
+    OFFERED = 1
+    DONE = 2
 
-        elif packet.messageType is MessageType.REQUEST:
-            self.transactionType = TransactionType.RENEW
-            log.info('Start RENEW transaction')
-            log.info(
-                'RENEW transaction: Recieved REQUEST of '
-                f'{packet.yourIp} for {packet.leaseTime} seconds')
-            packet = yield DhcpPacket.fromArgs(
-                OpCode.REPLY,
-                self.transactionId,
-                packet.secondsElapsed,
-                packet.clientIp,
-                self.yourIp,
-                self.serverIp,
-                packet.clientHardwareAddr,
-                MessageType.ACK,
-                self.leaseTime)
-
-            if packet.messageType is MessageType.ACK:
-                self.requestIp = packet.yourIp
-                return None
-            else:
-                raise ValueError(
-                    f'Expected DHCP ACK. Got {packet.messageType.name}.')
+    def __repr__(self):
+        return f'<{self.__class__.__name__}.{self.name}>'
 
-        else:
-            raise ValueError('Unsupported transaction.')
 
-    def recv(self, packet: DhcpPacket) -> Tuple[bool, Optional[DhcpPacket]]:
+class ServerTransaction:
+    """Class for representing an ongoing session with a client.
+
+    An ongoing session means there
+    is more than 1 packet exchanged,
+    which is a DISCOVER/OFFER followed by a REQUEST/ACK.
+    A DHCP release is not a session
+    and neither is a renewal, which the server answers from its leases.
+
+    A transaction is a small record of ints
+    and its session a state machine
+    whose transitions are looked up in TRANSITIONS
+    by state and message type,
+    so a table of transactions could as well be kept in arrays.
+
+    IP addresses are kept as ints.
+    """
+
+    __slots__ = (
+        'state',
+        'transactionId',
+        'clientHardwareAddr',
+        'yourIp',
+        'timeout')
+
+    def __init__(
+            self,
+            transactionId: int,
+            clientHardwareAddr: int,
+            yourIp: int):
+        self.state = TransactionState.NEW
+        self.transactionId = transactionId
+        self.clientHardwareAddr = clientHardwareAddr
+        # the IP offered to the client
+        self.yourIp = yourIp
+        # set by the TransactionTable holding the transaction
+        self.timeout: Seconds = 0.0
+
+    def recv(
+            self,
+            packet: DhcpPacket,
+            serverIp: int,
+            leaseTime: int) -> Tuple[bool, Optional[DhcpPacket]]:
         """Receive a packet from the client.
 
+        serverIp and leaseTime are those of the server,
+        which are the same for all its transactions.
+
         Returns a bool that is true
         when the transaction has finished
         and an optional DhcpPacket that
         is to be returned to the client if not None.
+        Raises a ValueError if the packet is unexpected in this state.
         """
 
-        try:
-            if self.__transaction is None:
-                self.__transaction = self.__gen(packet)
-                return False, next(self.__transaction)
-            else:
-                return False, self.__transaction.send(packet)
-        except StopIteration as ex:
-            return True, ex.value
+        transition = TRANSITIONS.get((self.state, packet.messageType))
+        if transition is None:
+            if self.state is TransactionState.OFFERED:
+                raise ValueError(
+                    f'Expected DHCP REQUEST. Got {packet.messageType.name}.')
+            raise ValueError('Unsupported transaction.')
+
+        self.state, reply = transition(self, packet, serverIp, leaseTime)
+        return self.state is TransactionState.DONE, reply
+
+
+Transition = Callable[
+    [ServerTransaction, DhcpPacket, int, int],
+    Tuple[TransactionState, Optional[DhcpPacket]]]
+
+
+def _offer(
+        transaction: ServerTransaction,
+        packet: DhcpPacket,
+        serverIp: int,
+        leaseTime: int) -> Tuple[TransactionState, Optional[DhcpPacket]]:
+    if log.isEnabledFor(logging.INFO):
+        log.info('Start DISCOVER transaction')
+        log.info(
+            'DISCOVER transaction: Reply with OFFER of %s for %s seconds',
+            IPv4Address(transaction.yourIp),
+            leaseTime)
+    return TransactionState.OFFERED, DhcpPacket.fromArgs(
+        OpCode.REPLY,
+        transaction.transactionId,
+        packet.secondsElapsed,
+        packet.clientIpInt,
+        transaction.yourIp,
+        serverIp,
+        packet.clientHardwareAddr,
+        MessageType.OFFER,
+        leaseTime)
+
+
+def _acknowledge(
+        transaction: ServerTransaction,
+        packet: DhcpPacket,
+        serverIp: int,
+        leaseTime: int) -> Tuple[TransactionState, Optional[DhcpPacket]]:
+    if log.isEnabledFor(logging.INFO):
+        log.info(
+            'DISCOVER transaction: '
+            'Recieved REQUEST of %s for %s seconds',
+            packet.yourIp,
+            packet.leaseTime)
+    return TransactionState.DONE, DhcpPacket.fromArgs(
+        OpCode.REPLY,
+        transaction.transactionId,
+        packet.secondsElapsed,
+        packet.clientIpInt,
+        transaction.yourIp,
+        serverIp,
+        packet.clientHardwareAddr,
+        MessageType.ACK,
+        leaseTime)
+
+
+# transitions of a transaction by its state and the message received
+TRANSITIONS: Dict[Tuple[TransactionState, MessageType], Transition] = {
+    (TransactionState.NEW, MessageType.DISCOVER): _offer,
+    (TransactionState.OFFERED, MessageType.REQUEST): _acknowledge,
+}
@@ -0,0 +1,274 @@
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket
+from dhcp.async_server import (
+    DhcpServerProtocol, journalJobs, startBackgroundJobs)
+from dhcp.lease_journal import LeaseJournal
+from dhcp.reply_cache import DEFAULT_CAPACITY, ReplyCache
+from dhcp.admission import AdmissionFilter
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+from ipaddress import IPv4Interface, IPv4Network
+from typing import Any, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+Address = Tuple[str, int]
+
+# multiplier of Fibonacci hashing, so MACs differing in only a few bits,
+# e.g. of the same vendor, are spread evenly across workers
+HASH_MULTIPLIER = 0x9e3779b97f4a7c15
+CHANNEL_BUFFER_SIZE = 1 << 20
+
+
+def ownerOf(clientHardwareAddr: int, workers: int) -> int:
+    """Index of the worker owning a MAC."""
+    hashed = (clientHardwareAddr * HASH_MULTIPLIER) & 0xffffffffffffffff
+    return (hashed * workers) >> 64
+
+
+def poolSlice(network: IPv4Network, worker: int, workers: int) -> range:
+    """Offsets into network of the addresses owned by worker.
+
+    The host addresses are split into contiguous slices of equal size
+    give or take one.
+    """
+
+    hosts = max(network.num_addresses - 2, 1)
+    return range(
+        1 + hosts * worker // workers,
+        1 + hosts * (worker + 1) // workers)
+
+
+def openChannels(
+        workers: int) -> Tuple[List[socket.socket], List[socket.socket]]:
+    """Local datagram channels forwarding packets to each worker.
+
+    Returns the sending and the receiving ends of the channels by worker.
+    They must be opened before starting the workers
+    so every worker inherits all of them.
+    """
+
+    senders: List[socket.socket] = []
+    receivers: List[socket.socket] = []
+    for _ in range(workers):
+        sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setsockopt(
+            socket.SOL_SOCKET, socket.SO_SNDBUF, CHANNEL_BUFFER_SIZE)
+        receiver.setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF, CHANNEL_BUFFER_SIZE)
+        sender.setblocking(False)
+        receiver.setblocking(False)
+        senders.append(sender)
+        receivers.append(receiver)
+    return senders, receivers
+
+
+def bindSharedSocket(port: int) -> socket.socket:
+    """UDP socket on port shared with the other workers by SO_REUSEPORT,
+    the kernel spreading datagrams among them by source address.
+    """
+
+    serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    serverSocket.bind(('0.0.0.0', port))
+    serverSocket.setblocking(False)
+    return serverSocket
+
+
+class ShardedServerProtocol(DhcpServerProtocol):
+    """DhcpServerProtocol of one of several workers sharing a port.
+
+    Packets of MACs owned by another worker are forwarded to it unparsed.
+    A packet that cannot be forwarded because the channel is full
+    is dropped and left to the client to retransmit.
+    """
+
+    def __init__(
+            self,
+            server: DhcpServer,
+            replyAddress: Address,
+            worker: int,
+            senders: Sequence[socket.socket]):
+        super().__init__(server, replyAddress)
+        self.worker = worker
+        self.senders = senders
+        self.forwarded = 0
+        self.dropped = 0
+
+    def datagram_received(self, data: bytes, addr: Address) -> None:
+        try:
+            owner = ownerOf(
+                DhcpPacket.peekClientHardwareAddr(data), len(self.senders))
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet from {addr}: {ve}')
+            return
+
+        if owner == self.worker:
+            self.handleDatagram(data, addr)
+            return
+        try:
+            self.senders[owner].send(data)
+        except OSError as ose:
+            self.dropped += 1
+            log.debug('Dropped packet for worker %s: %s', owner, ose)
+        else:
+            self.forwarded += 1
+
+
+class ForwardedProtocol(asyncio.DatagramProtocol):
+    """Receiving end of the channel of a worker
+    handing the packets forwarded by the others to its protocol.
+    """
+
+    def __init__(self, owner: DhcpServerProtocol):
+        self.owner = owner
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        self.owner.handleDatagram(data, addr)
+
+
+async def serveWorker(
+        server: DhcpServer,
+        worker: int,
+        port: int,
+        replyAddress: Address,
+        senders: Sequence[socket.socket],
+        receiver: socket.socket) -> None:
+    """Serve the MACs owned by worker on the shared port until cancelled,
+    committing the journal of server in the background.
+    """
+
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: ShardedServerProtocol(server, replyAddress, worker, senders),
+        sock=bindSharedSocket(port))
+    channel, _ = await loop.create_datagram_endpoint(
+        lambda: ForwardedProtocol(protocol), sock=receiver)
+    log.info(f'Worker {worker} bound to port {port}')
+    tasks = startBackgroundJobs(journalJobs(server))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        channel.close()
+        transport.close()
+
+
+def runWorker(
+        interface: IPv4Interface,
+        worker: int,
+        workers: int,
+        port: int,
+        replyAddress: Address,
+        senders: Sequence[socket.socket],
+        receiver: socket.socket,
+        journalDirectory: Optional[str],
+        replyCacheSize: int,
+        admission: Optional[AdmissionFilter]) -> None:
+    """Entry point of a worker process.
+
+    The journal of each worker is kept in its own subdirectory
+    of journalDirectory.
+    A replyCacheSize of 0 disables the reply cache.
+    Every worker gets its own copy of admission when forked.
+    """
+
+    journal = None
+    if journalDirectory is not None:
+        journal = LeaseJournal(
+            os.path.join(journalDirectory, f'worker-{worker}'))
+    server = DhcpServer(
+        interface,
+        # swept from an event loop timer
+        inlineExpiry=False,
+        journal=journal,
+        # committed by a background job of the event loop
+        inlineCommit=False,
+        poolOffsets=poolSlice(interface.network, worker, workers),
+        replyCache=(
+            ReplyCache(replyCacheSize) if replyCacheSize > 0 else None),
+        admission=admission)
+    try:
+        asyncio.run(serveWorker(
+            server, worker, port, replyAddress, senders, receiver))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def startWorkers(
+        interface: IPv4Interface,
+        workers: int,
+        port: int,
+        replyAddress: Address,
+        journalDirectory: Optional[str] = None,
+        replyCacheSize: int = DEFAULT_CAPACITY,
+        admission: Optional[AdmissionFilter] = None
+        ) -> List[multiprocessing.Process]:
+    """Start that many worker processes serving DHCP on port together.
+
+    Each worker owns the MACs hashing to it by ownerOf()
+    and hands out the slice of the pool given by poolSlice().
+    """
+
+    if workers < 1:
+        raise ValueError('Worker count must be positive')
+
+    # forked so the workers inherit the channels and the logging setup
+    context = multiprocessing.get_context('fork')
+    senders, receivers = openChannels(workers)
+    processes = [
+        context.Process(
+            target=runWorker,
+            args=(
+                interface,
+                worker,
+                workers,
+                port,
+                replyAddress,
+                senders,
+                receivers[worker],
+                journalDirectory,
+                replyCacheSize,
+                admission),
+            name=f'dhcp-worker-{worker}')
+        for worker in range(workers)]
+    for process in processes:
+        process.start()
+    for channel in senders + receivers:
+        channel.close()
+    return processes
+
+
+def serveSharded(
+        interface: IPv4Interface,
+        workers: int,
+        port: int,
+        replyAddress: Address,
+        journalDirectory: Optional[str] = None,
+        replyCacheSize: int = DEFAULT_CAPACITY,
+        admission: Optional[AdmissionFilter] = None) -> None:
+    """Serve DHCP on port with workers processes until interrupted."""
+    processes = startWorkers(
+        interface,
+        workers,
+        port,
+        replyAddress,
+        journalDirectory,
+        replyCacheSize,
+        admission)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # the workers got the interrupt too
+        for process in processes:
+            process.join()
@@ -0,0 +1,494 @@
+from dhcp.server import DhcpServer
+from dhcp.client_transaction import ClientTransaction
+from dhcp.transaction import TransactionType
+from dhcp.packet import DhcpPacket, MessageType
+from dhcp.lease_history import LeaseHistory
+from dhcp.client_timers import (
+    renewalRetry, renewalTimes, retransmissionTimeout, startDelay)
+
+import heapq
+import logging
+import random
+import time
+from array import array
+from enum import Enum
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Dict, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+Seconds = float
+
+# first synthetic MAC, a locally administered unicast address
+FIRST_MAC = 0x020000000000
+DEFAULT_SESSION_TIME: Seconds = 8 * 3600
+DEFAULT_OFF_TIME: Seconds = 4 * 3600
+DEFAULT_RELEASE_PROBABILITY = 0.5
+# time before a client without an offer tries again, in lockstep
+DEFAULT_RETRY_DELAY: Seconds = 10
+DEFAULT_SWEEP_INTERVAL: Seconds = 1
+DEFAULT_SAMPLE_INTERVAL: Seconds = 3600
+# allocation latencies are grouped by utilization of the pool in steps of this
+UTILIZATION_STEP = 10
+
+
+class VirtualClock:
+    """Clock only moving when told to, to pass as the clock of a DhcpServer
+    or ClientTransaction.
+    """
+
+    __slots__ = ('now',)
+
+    def __init__(self, now: Seconds = 0):
+        self.now = now
+
+    def __call__(self) -> Seconds:
+        return self.now
+
+    def advance(self, seconds: Seconds) -> None:
+        if seconds < 0:
+            raise ValueError('A clock cannot go back in time')
+        self.now += seconds
+
+
+class ClientAction(Enum):
+    ARRIVE = 0
+    RENEW = 1
+    LEAVE = 2
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}.{self.name}>'
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """percent-th percentile of sorted values or 0 if there are none."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class SimulationStats:
+    """Outcome of a simulation."""
+
+    def __init__(self, poolSize: int):
+        self.poolSize = poolSize
+        self.virtualTime: Seconds = 0
+        self.cpuTime: Seconds = 0
+        self.discovers = 0
+        # packets sent to the server by every client
+        self.packets = 0
+        self.leases = 0
+        # leases of clients arriving again
+        # and of those the same address as before
+        self.returns = 0
+        self.sameAddress = 0
+        self.renewals = 0
+        self.renewalNaks = 0
+        self.naks = 0
+        self.noOffers = 0
+        # DISCOVERs sent again after a failed one
+        self.retries = 0
+        # packets the server dropped for being over its rate
+        self.dropped = 0
+        # packets sent to the server by virtual second
+        self.loads: Dict[int, int] = {}
+        # virtual time by which every client had leased once
+        self.allLeasedTime: Optional[Seconds] = None
+        self.releases = 0
+        self.expiries = 0
+        self.sweeps = 0
+        # real seconds of every sweep
+        self.sweepTimes = array('d')
+        # real seconds of handling each DISCOVER
+        # by utilization of the pool in steps of UTILIZATION_STEP percent
+        self.allocationTimes = [
+            array('d') for _ in range(100 // UTILIZATION_STEP + 1)]
+        # (virtual time, leases, marked IPs, transactions) at every sample
+        self.samples: List[Tuple[Seconds, int, int, int]] = []
+
+    def report(self) -> str:
+        lines = [
+            f'virtual time: {self.virtualTime / 3600:.1f} h',
+            f'CPU time:     {self.cpuTime:.2f} s '
+            f'({self.virtualTime / max(self.cpuTime, 1e-9):.0f}x real time)',
+            f'DISCOVERs:    {self.discovers}',
+            f'packets:      {self.packets} sent to the server',
+            f'leases:       {self.leases}',
+            f'returns:      {self.returns} '
+            f'({self.sameAddress} to the same address as before)',
+            f'no offer:     {self.noOffers}',
+            f'NAKs:         {self.naks}',
+            f'retries:      {self.retries} DISCOVERs',
+            f'dropped:      {self.dropped} packets over the server rate',
+            f'renewals:     {self.renewals} ({self.renewalNaks} NAKed)',
+            f'releases:     {self.releases}',
+            f'expiries:     {self.expiries}',
+            'all leased:   ' + (
+                'never' if self.allLeasedTime is None
+                else f'after {self.allLeasedTime:.0f} s')]
+
+        if self.loads:
+            second, peak = max(self.loads.items(), key=lambda load: load[1])
+            loads = sorted(self.loads.values())
+            lines.append(
+                f'load:         peak {peak} packets/s at {second} s, '
+                f'p99 {percentile(loads, 99)} packets/s '
+                f'over {len(loads)} busy seconds')
+
+        sweepTimes = sorted(self.sweepTimes)
+        lines.append(
+            f'sweeps:       {self.sweeps} taking {sum(sweepTimes):.3f} s, '
+            + '  '.join(
+                f'p{percent}={percentile(sweepTimes, percent) * 1e6:.1f}'
+                for percent in (50, 99, 100))
+            + ' us')
+
+        lines.append('DISCOVER handling by pool utilization:')
+        for step, times in enumerate(self.allocationTimes):
+            if not times:
+                continue
+            times = array('d', sorted(times))
+            low = step * UTILIZATION_STEP
+            lines.append(
+                f'  {low:>3}-{min(low + UTILIZATION_STEP, 100):>3}% '
+                f'{len(times):>9} '
+                + '  '.join(
+                    f'p{percent}={percentile(times, percent) * 1e6:.1f}'
+                    for percent in (50, 99, 100))
+                + ' us')
+
+        lines.append('utilization over time:')
+        for virtualTime, leases, marked, transactions in self.samples:
+            lines.append(
+                f'  {virtualTime / 3600:>6.1f} h '
+                f'{leases:>9} leases {leases / self.poolSize:>7.1%} '
+                f'{marked:>6} marked {transactions:>6} transactions')
+        return '\n'.join(lines)
+
+
+class Simulation:
+    """Discrete-event simulation of many clients of a DhcpServer
+    in virtual time.
+
+    Every client arrives, leases an address with DISCOVER/OFFER/REQUEST/ACK,
+    or DISCOVER/ACK with Rapid Commit,
+    renews it with REQUEST/ACK at T1
+    and leaves after a session, releasing its lease or letting it expire.
+    It comes back after some time off.
+    Session and off times are exponentially distributed.
+
+    Clients time their packets as RFC 2131 asks,
+    see dhcp.client_timers:
+    they wait a random delay before their first DISCOVER,
+    retry failed DISCOVERs with randomized exponential backoff,
+    renew at a jittered T1, retry unanswered renewals until T2
+    and keep rebinding until the lease ends.
+    In lockstep, they instead retry after a fixed delay,
+    renew halfway through the lease and start over
+    as soon as a renewal fails,
+    so clients leased together keep sending together.
+
+    Packets are handed to the server directly without encoding them
+    and replies are instant,
+    so only the time spent in the server and its sweeps is measured.
+    The same seed gives the same run.
+    """
+
+    def __init__(
+            self,
+            interface: IPv4Interface,
+            clients: int,
+            sessionTime: Seconds = DEFAULT_SESSION_TIME,
+            offTime: Seconds = DEFAULT_OFF_TIME,
+            releaseProbability: float = DEFAULT_RELEASE_PROBABILITY,
+            retryDelay: Seconds = DEFAULT_RETRY_DELAY,
+            sweepInterval: Seconds = DEFAULT_SWEEP_INTERVAL,
+            sampleInterval: Seconds = DEFAULT_SAMPLE_INTERVAL,
+            seed: int = 0,
+            history: Optional[LeaseHistory] = None,
+            rapidCommit: bool = False,
+            bootStorm: bool = False,
+            serverRate: Optional[int] = None,
+            lockstep: bool = False):
+        """history is passed on to the server, see DhcpServer.
+        With rapidCommit, clients lease with DISCOVER/ACK.
+        With bootStorm, every client is powered on at the start
+        instead of arriving over the first off time.
+        serverRate is the count of packets the server handles
+        per (virtual) second, it drops the others.
+        lockstep is for clients with fixed timers, see above.
+        """
+        if clients < 1:
+            raise ValueError('Client count must be positive')
+        if sweepInterval <= 0 or sampleInterval <= 0:
+            raise ValueError('Intervals must be positive')
+
+        self.clock = VirtualClock()
+        # swept on a timer as when serving with asyncio
+        self.server = DhcpServer(
+            interface,
+            maxTransactions=clients,
+            inlineExpiry=False,
+            clock=self.clock,
+            history=history)
+        self.sessionTime = sessionTime
+        self.offTime = offTime
+        self.releaseProbability = releaseProbability
+        self.retryDelay = retryDelay
+        self.rapidCommit = rapidCommit
+        self.serverRate = serverRate
+        self.lockstep = lockstep
+        self.sweepInterval = sweepInterval
+        self.sampleInterval = sampleInterval
+        self.random = random.Random(seed)
+        self.stats = SimulationStats(self.server.freeCount)
+
+        # per client by index: leased IP or 0, last leased IP or 0,
+        # end of session, T2 and end of lease,
+        # failed DISCOVERs in a row and next action
+        self.__ips = array('Q', bytes(8 * clients))
+        self.__lastIps = array('Q', bytes(8 * clients))
+        self.__sessionEnds = array('d', bytes(8 * clients))
+        self.__rebindTimes = array('d', bytes(8 * clients))
+        self.__leaseEnds = array('d', bytes(8 * clients))
+        self.__attempts = array('I', bytes(4 * clients))
+        self.__actions: List[ClientAction] = [ClientAction.ARRIVE] * clients
+        # (time, client index) of the next action of every client
+        self.__queue: List[Tuple[Seconds, int]] = []
+        self.__nextTransactionId = 1
+        self.__unleased = clients
+
+        # arrivals are spread over the first off time
+        # unless every client is powered on at once
+        for client in range(clients):
+            arrival = 0 if bootStorm else self.random.expovariate(1 / offTime)
+            if not lockstep:
+                arrival += startDelay(self.random)
+            self.__queue.append((arrival, client))
+        heapq.heapify(self.__queue)
+
+    def run(self, duration: Seconds) -> SimulationStats:
+        """Simulate duration (virtual) seconds and return the stats."""
+        clock = self.clock
+        queue = self.__queue
+        stats = self.stats
+        end = clock.now + duration
+        nextSweep = clock.now + self.sweepInterval
+        nextSample = clock.now
+        cpuStart = time.process_time()
+
+        while True:
+            nextClient = queue[0][0] if queue else end
+            nextEvent = min(nextClient, nextSweep, nextSample)
+            if nextEvent > end:
+                break
+            clock.now = max(clock.now, nextEvent)
+            if nextEvent == nextSample:
+                self.__sample()
+                nextSample += self.sampleInterval
+            elif nextEvent == nextSweep:
+                self.__sweep()
+                nextSweep += self.sweepInterval
+            else:
+                _, client = heapq.heappop(queue)
+                self.__act(client)
+
+        clock.now = end
+        stats.virtualTime += duration
+        stats.cpuTime += time.process_time() - cpuStart
+        return stats
+
+    def __sample(self) -> None:
+        server = self.server
+        self.stats.samples.append((
+            self.clock.now,
+            server.leaseCount,
+            server.markedCount,
+            server.transactionCount))
+
+    def __sweep(self) -> None:
+        server = self.server
+        leaseCount = server.leaseCount
+        start = time.perf_counter()
+        server.sweep()
+        self.stats.sweepTimes.append(time.perf_counter() - start)
+        self.stats.sweeps += 1
+        self.stats.expiries += leaseCount - server.leaseCount
+
+    def __schedule(self, client: int, delay: Seconds) -> None:
+        heapq.heappush(self.__queue, (self.clock.now + delay, client))
+
+    def __act(self, client: int) -> None:
+        action = self.__actions[client]
+        now = self.clock.now
+        if action is ClientAction.ARRIVE:
+            self.__sessionEnds[client] = (
+                now + self.random.expovariate(1 / self.sessionTime))
+            self.__discover(client)
+        elif action is ClientAction.RENEW:
+            if now >= self.__sessionEnds[client]:
+                self.__leave(client)
+            elif not self.lockstep and now >= self.__leaseEnds[client]:
+                # never renewed nor rebound, start over
+                self.__ips[client] = 0
+                self.__discover(client)
+            else:
+                self.__renew(client)
+        else:
+            self.__leave(client)
+
+    def __discover(self, client: int) -> None:
+        transaction = self.__begin(client)
+        transaction.clientIp = IPv4Address(0)
+        self.stats.discovers += 1
+        dropped = self.stats.dropped
+        reply = self.__exchange(
+            transaction, transaction.start(TransactionType.DISCOVER), True)
+        if reply is None or reply.messageType is not MessageType.ACK:
+            # no address to offer, dropped or NAKed, try again later
+            if reply is None and self.stats.dropped == dropped:
+                self.stats.noOffers += 1
+            self.stats.retries += 1
+            self.__ips[client] = 0
+            self.__actions[client] = ClientAction.ARRIVE
+            self.__schedule(client, self.__retryDelay(client))
+            return
+        self.stats.leases += 1
+        self.__attempts[client] = 0
+        lastIp = self.__lastIps[client]
+        if not lastIp:
+            self.__unleased -= 1
+            if not self.__unleased:
+                self.stats.allLeasedTime = self.clock.now
+        if lastIp and self.__actions[client] is ClientAction.ARRIVE:
+            self.stats.returns += 1
+            if reply.yourIpInt == lastIp:
+                self.stats.sameAddress += 1
+        self.__leased(client, reply)
+
+    def __renew(self, client: int) -> None:
+        ip = IPv4Address(self.__ips[client])
+        transaction = self.__begin(client)
+        transaction.clientIp = ip
+        transaction.yourIp = ip
+        self.stats.renewals += 1
+        reply = self.__exchange(
+            transaction, transaction.start(TransactionType.RENEW), False)
+        if reply is not None and reply.messageType is MessageType.ACK:
+            self.__leased(client, reply)
+            return
+        if reply is not None and reply.messageType is MessageType.NAK:
+            self.stats.renewalNaks += 1
+        if reply is not None or self.lockstep:
+            # the lease is lost so start over
+            self.__ips[client] = 0
+            self.__discover(client)
+            return
+        # unanswered, retry until T2, then rebind until the lease ends
+        now = self.clock.now
+        rebindTime = self.__rebindTimes[client]
+        deadline = (
+            rebindTime if now < rebindTime else self.__leaseEnds[client])
+        self.__scheduleRenewal(client, now + renewalRetry(deadline - now))
+
+    def __leave(self, client: int) -> None:
+        if self.__ips[client] and (
+                self.random.random() < self.releaseProbability):
+            release = ClientTransaction(
+                FIRST_MAC + client, 0, self.clock).release()
+            if not self.__drop():
+                self.server.recv(release)
+            self.stats.releases += 1
+        self.__ips[client] = 0
+        self.__actions[client] = ClientAction.ARRIVE
+        self.__schedule(client, self.random.expovariate(1 / self.offTime))
+
+    def __retryDelay(self, client: int) -> Seconds:
+        """Delay before a client whose DISCOVER failed tries again."""
+        if self.lockstep:
+            return self.retryDelay
+        attempt = self.__attempts[client]
+        self.__attempts[client] = attempt + 1
+        return retransmissionTimeout(attempt, self.random)
+
+    def __leased(self, client: int, ack: DhcpPacket) -> None:
+        """Schedule renewing the lease of an ACK or leaving before that."""
+        self.__ips[client] = ack.yourIpInt
+        self.__lastIps[client] = ack.yourIpInt
+        now = self.clock.now
+        if self.lockstep:
+            renewAt = now + max(ack.leaseTime / 2, 1)
+        else:
+            renewTime, rebindTime = renewalTimes(ack.leaseTime, self.random)
+            renewAt = now + max(renewTime, 1)
+            self.__rebindTimes[client] = now + rebindTime
+        self.__leaseEnds[client] = now + ack.leaseTime
+        self.__scheduleRenewal(client, renewAt)
+
+    def __scheduleRenewal(self, client: int, renewAt: Seconds) -> None:
+        """Schedule renewing a lease at renewAt or leaving before that."""
+        sessionEnd = self.__sessionEnds[client]
+        if sessionEnd <= renewAt:
+            self.__actions[client] = ClientAction.LEAVE
+            self.__schedule(client, sessionEnd - self.clock.now)
+        else:
+            self.__actions[client] = ClientAction.RENEW
+            self.__schedule(client, renewAt - self.clock.now)
+
+    def __begin(self, client: int) -> ClientTransaction:
+        transactionId = self.__nextTransactionId
+        self.__nextTransactionId = (transactionId + 1) & 0xffffffff or 1
+        return ClientTransaction(
+            FIRST_MAC + client, transactionId, self.clock, self.rapidCommit)
+
+    def __exchange(
+            self,
+            transaction: ClientTransaction,
+            packet: DhcpPacket,
+            isDiscover: bool) -> Optional[DhcpPacket]:
+        """Run a transaction against the server
+        and return the last reply of the server,
+        None if it did not reply.
+        """
+
+        server = self.server
+        stats = self.stats
+        if self.__drop():
+            return None
+        if isDiscover:
+            # the pool is considered used by leases and offers
+            used = 1 - server.freeCount / stats.poolSize
+            start = time.perf_counter()
+            reply = server.recv(packet)
+            stats.allocationTimes[
+                int(used * 100) // UTILIZATION_STEP].append(
+                    time.perf_counter() - start)
+        else:
+            reply = server.recv(packet)
+
+        while reply is not None:
+            if reply.messageType is MessageType.NAK:
+                stats.naks += 1
+                return reply
+            isTransactionOver, response = transaction.recv(reply)
+            if isTransactionOver or response is None:
+                return reply
+            if self.__drop():
+                return None
+            reply = server.recv(response)
+        return None
+
+    def __drop(self) -> bool:
+        """Count a packet sent to the server
+        and return whether the server drops it for being over its rate.
+        """
+
+        stats = self.stats
+        stats.packets += 1
+        second = int(self.clock.now)
+        load = stats.loads.get(second, 0) + 1
+        stats.loads[second] = load
+        if self.serverRate is not None and load > self.serverRate:
+            stats.dropped += 1
+            return True
+        return False
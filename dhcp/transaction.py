@@ -12,6 +12,9 @@ class TransactionType(Enum):
 
 class Transaction:
     """Base class for all trnsactions."""
+
+    __slots__ = ('transactionType', 'transactionId', '_phase')
+
     transactionType: TransactionType
     transactionId: int
 
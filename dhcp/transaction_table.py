@@ -0,0 +1,118 @@
+from dhcp.server_transaction import ServerTransaction
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+Seconds = float
+
+
+class TransactionTable:
+    """Bounded table of in-flight transactions by transaction ID.
+
+    Every transaction gets the same time to live
+    so transactions are added in order of timeout
+    and a FIFO queue of them is all the ordering needed.
+    The timeout is kept in the transaction itself.
+    Removing a transaction is O(1): it is left in the queue
+    and skipped when it reaches the front,
+    since the table no longer holds it by its ID.
+
+    When the table is full the oldest transaction is evicted
+    to make room for the new one.
+    """
+
+    def __init__(self, timeToLive: Seconds, capacity: int):
+        if capacity < 1:
+            raise ValueError('Capacity must be positive')
+
+        self.timeToLive = timeToLive
+        self.capacity = capacity
+        self.__transactions: Dict[int, ServerTransaction] = {}
+        self.__transactionsByTimeouts: Deque[ServerTransaction] = deque()
+
+    def __len__(self) -> int:
+        return len(self.__transactions)
+
+    def __contains__(self, transactionId: int) -> bool:
+        return transactionId in self.__transactions
+
+    def get(self, transactionId: int) -> Optional[ServerTransaction]:
+        return self.__transactions.get(transactionId)
+
+    def add(
+            self,
+            transaction: ServerTransaction,
+            curTime: Seconds) -> List[ServerTransaction]:
+        """Add a transaction timing out self.timeToLive after curTime.
+
+        Replaces any transaction with the same ID.
+        Returns the transactions evicted to stay within capacity.
+        """
+
+        evicted: List[ServerTransaction] = []
+        oldTransaction = self.remove(transaction.transactionId)
+        if oldTransaction is not None:
+            evicted.append(oldTransaction)
+
+        while len(self.__transactions) >= self.capacity:
+            evicted.append(self.__popOldest())
+
+        transaction.timeout = curTime + self.timeToLive
+        self.__transactions[transaction.transactionId] = transaction
+        self.__transactionsByTimeouts.append(transaction)
+        return evicted
+
+    def remove(self, transactionId: int) -> Optional[ServerTransaction]:
+        """Remove a transaction.
+
+        Returns the removed transaction or None if there was none.
+        """
+
+        transaction = self.__transactions.pop(transactionId, None)
+        if transaction is None:
+            return None
+
+        # keep removed transactions from piling up in the queue
+        # when transactions finish well before they time out
+        queue = self.__transactionsByTimeouts
+        if len(queue) > 2 * len(self.__transactions) + 64:
+            self.__transactionsByTimeouts = deque(
+                t for t in queue if self.__holds(t))
+        return transaction
+
+    def peekTimeout(self) -> Optional[Seconds]:
+        """Closest timeout or None if there are no transactions."""
+        queue = self.__transactionsByTimeouts
+        while queue and not self.__holds(queue[0]):
+            queue.popleft()
+        return queue[0].timeout if queue else None
+
+    def popExpired(self, curTime: Seconds) -> List[ServerTransaction]:
+        """Remove and return all transactions timed out by curTime."""
+        expired: List[ServerTransaction] = []
+        queue = self.__transactionsByTimeouts
+        transactions = self.__transactions
+        while queue:
+            transaction = queue[0]
+            held = transactions.get(transaction.transactionId) is transaction
+            if held and transaction.timeout > curTime:
+                break
+            queue.popleft()
+            if held:
+                del transactions[transaction.transactionId]
+                expired.append(transaction)
+        return expired
+
+    def __holds(self, transaction: ServerTransaction) -> bool:
+        """Whether transaction is in the table and not just in the queue."""
+        return (
+            self.__transactions.get(transaction.transactionId)
+            is transaction)
+
+    def __popOldest(self) -> ServerTransaction:
+        """Remove the transaction closest to timing out. Assumes existence."""
+        transaction = self.__transactionsByTimeouts.popleft()
+        while not self.__holds(transaction):
+            transaction = self.__transactionsByTimeouts.popleft()
+        del self.__transactions[transaction.transactionId]
+        return transaction
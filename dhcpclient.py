@@ -1,6 +1,10 @@
 from dhcp.client_class import DhcpClient
 from dhcp.transaction import TransactionType
 from ipaddress import IPv4Address
+import logging
+
+# show the progress of transactions like the rest of the client's output
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 class DhcpClientUI:
     """Client UI"""
@@ -18,7 +22,8 @@ class DhcpClientUI:
                   "_____________________________ \n"+
                   "(1) Renew lease \n"+
                   "(2) Release IP address\n"+
-                  "(3) Exit\n"+
+                  "(3) Keep lease renewed (Ctrl-C to stop)\n"+
+                  "(4) Exit\n"+
                   "_____________________________ \n")
             userInput: str = input()
 
@@ -28,8 +33,13 @@ class DhcpClientUI:
 
             elif userInput == "2":
                 self.dhcpClient.release()
+            elif userInput == "3":
+                try:
+                    self.dhcpClient.maintain()
+                except KeyboardInterrupt:
+                    print(f'Client: IP address is {self.dhcpClient.clientIp}')
             else:
-                if userInput == "3":
+                if userInput == "4":
                     print("Client: Exiting.")
 
                 else:
@@ -0,0 +1,91 @@
+from dhcp.load_generator import (
+    DEFAULT_MAX_RETRANSMITS, DEFAULT_RETRANSMIT_TIMEOUT, Scenario,
+    generateLoad)
+
+import argparse
+import asyncio
+import logging
+from typing import Tuple
+
+SERVER_ADDRESS = ('127.0.0.1', 4200)
+LOCAL_ADDRESS = ('127.0.0.1', 4201)
+
+Address = Tuple[str, int]
+
+
+def parseAddress(address: str) -> Address:
+    """Parse HOST:PORT."""
+    host, _, port = address.rpartition(':')
+    if not host:
+        raise argparse.ArgumentTypeError(f'Expected HOST:PORT, got {address}')
+    return host, int(port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='DHCP load generator',
+        epilog='Start the server replying to the load generator first, e.g. '
+               'python dhcpserver.py --interface 10.0.0.1/16 '
+               '--reply-to 127.0.0.1:4201')
+    parser.add_argument(
+        'scenario',
+        type=Scenario,
+        choices=list(Scenario),
+        metavar='{' + ','.join(scenario.value for scenario in Scenario) + '}',
+        help='boot: every client DISCOVERs, '
+             'renew: leased clients renew, '
+             'churn: leased clients release and DISCOVER again')
+    parser.add_argument(
+        '--server',
+        type=parseAddress,
+        default=SERVER_ADDRESS,
+        metavar='HOST:PORT',
+        help='address of the server (default: %s:%s)' % SERVER_ADDRESS)
+    parser.add_argument(
+        '--local',
+        type=parseAddress,
+        default=LOCAL_ADDRESS,
+        metavar='HOST:PORT',
+        help='address the server replies to (default: %s:%s)' % LOCAL_ADDRESS)
+    parser.add_argument(
+        '--clients',
+        type=int,
+        default=10_000,
+        help='simulated clients (default: %(default)s)')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=1000,
+        help='transactions started per second (default: %(default)s)')
+    parser.add_argument(
+        '--transactions',
+        type=int,
+        help='transactions to measure (default: one per client)')
+    parser.add_argument(
+        '--retransmit-timeout',
+        type=float,
+        default=DEFAULT_RETRANSMIT_TIMEOUT,
+        metavar='SECONDS',
+        help='time to wait for a reply before resending '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--max-retransmits',
+        type=int,
+        default=DEFAULT_MAX_RETRANSMITS,
+        help='resends before a transaction times out (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(levelname)s: %(name)s - %(message)s')
+
+    stats = asyncio.run(generateLoad(
+        args.server,
+        args.local,
+        args.scenario,
+        args.clients,
+        args.rate,
+        args.clients if args.transactions is None else args.transactions,
+        args.retransmit_timeout,
+        args.max_retransmits))
+    print(stats.report())
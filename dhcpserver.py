@@ -1,46 +1,346 @@
-from dhcp.server import DhcpServer
+from dhcp.server import DEFAULT_LEASE_TIME, DhcpServer
 from dhcp.packet import DhcpPacket
+from dhcp.async_server import journalJobs, serve
+from dhcp.batch_io import serveBatched
+from dhcp.sharding import poolSlice, serveSharded
+from dhcp.replication import LeaseReplication, servePair
+from dhcp.lease_journal import LeaseJournal
+from dhcp.event_log import BinarySink, EventLog, JsonLinesSink
+from dhcp.metrics import ServerMetrics, serveMetrics
+from dhcp.reply_cache import DEFAULT_CAPACITY, ReplyCache
+from dhcp.lease_history import (
+    DEFAULT_CAPACITY as HISTORY_CAPACITY, LeaseHistory)
+from dhcp.admission import DEFAULT_BURST, DEFAULT_RATE, AdmissionFilter
+from dhcp.scopes import RELAY_PORT, MultiScopeServer, serveScopes
 
+import argparse
+import asyncio
+import gc
+import json
 import logging
 import socket
+import sys
 from ipaddress import IPv4Address, IPv4Interface
+from typing import Any, Tuple
 
 SERVER_PORT = 4200
 SERVER_INTERFACE = IPv4Interface('192.168.1.255/24')
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(levelname)s: %(name)s - %(message)s')
+REPLY_ADDRESS = ('144.37.199.171', SERVER_PORT)
+REPLICATION_PORT = 4210
+# REPLY_ADDRESS = (str(IPv4Address('255.255.255.255')), SERVER_PORT)
 
 log = logging.getLogger(__name__)
 
+Address = Tuple[str, int]
 
-def parsePacket(packet: bytes) -> DhcpPacket:
-    partialPacket = DhcpPacket.fromPacket(
-        packet[:DhcpPacket.initialPacketSize])
-    offset: int = DhcpPacket.initialPacketSize
-    while partialPacket.bytesNeeded > 0:
-        nextOffset = offset + partialPacket.bytesNeeded
-        partialPacket.parseMore(
-            packet[offset:offset + partialPacket.bytesNeeded])
-        offset = nextOffset
 
-    return partialPacket.packet
+def parsePacket(packet: bytes) -> DhcpPacket:
+    return DhcpPacket.decode(packet)
 
 
-if __name__ == '__main__':
+def bindServerSocket(port: int = SERVER_PORT) -> socket.socket:
     serverSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    serverSocket.bind(('', SERVER_PORT))
+    serverSocket.bind(('', port))
     serverSocket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    log.info(f'Server bound to port {SERVER_PORT}')
-    server = DhcpServer(SERVER_INTERFACE)
+    log.info(f'Server bound to port {port}')
+    return serverSocket
+
+
+def parseAddress(address: str) -> Address:
+    """Parse HOST:PORT."""
+    host, _, port = address.rpartition(':')
+    if not host:
+        raise argparse.ArgumentTypeError(f'Expected HOST:PORT, got {address}')
+    return host, int(port)
+
+
+def parseOptionValue(value: Any) -> Any:
+    """Option value of a scope file, where IPs are strings."""
+    if isinstance(value, list):
+        return [parseOptionValue(item) for item in value]
+    if isinstance(value, str):
+        try:
+            return IPv4Address(value)
+        except ValueError:
+            pass
+    return value
+
+
+def loadScopes(server: MultiScopeServer, path: str) -> None:
+    """Add the scopes of a JSON file to server.
+
+    The file holds a list of objects with an "interface",
+    the relay agent's address on the network, e.g. "10.1.0.1/24",
+    and optionally a "leaseTime", "options" by option type
+    and "circuitIds" of option 82.
+    """
 
+    with open(path) as file:
+        scopes = json.load(file)
+    for scope in scopes:
+        options = scope.get('options')
+        server.addScope(
+            IPv4Interface(scope['interface']),
+            scope.get('leaseTime', DEFAULT_LEASE_TIME),
+            None if options is None else {
+                int(optionType): parseOptionValue(value)
+                for optionType, value in options.items()},
+            [circuitId.encode() for circuitId in scope.get('circuitIds', [])])
+    log.info(f'Loaded {len(scopes)} scopes from {path}')
+
+
+def serveBlocking(
+        server: DhcpServer,
+        port: int = SERVER_PORT,
+        replyAddress: Address = REPLY_ADDRESS) -> None:
+    """Serve one packet at a time on a blocking socket."""
+    serverSocket = bindServerSocket(port)
     while True:
         packetBytes = serverSocket.recv(4096)
-        packet = parsePacket(packetBytes)
-        response = server.recv(packet)
-        if response is not None:
-            serverSocket.sendto(
-                # response.encode(), (int(IPv4Address('255.255.255.255'), SERVER_PORT)))
-                response.encode(), ('144.37.199.171', SERVER_PORT))
-            # serverSocket.recv(4096)
+        try:
+            reply = server.respond(packetBytes)
+        except ValueError as ve:
+            log.warning(f'Dropped malformed packet: {ve}')
+            continue
+        if reply is not None:
+            serverSocket.sendto(reply, replyAddress)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DHCP server')
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=SERVER_PORT,
+        help='port to serve on (default: %(default)s)')
+    parser.add_argument(
+        '--interface',
+        type=IPv4Interface,
+        default=SERVER_INTERFACE,
+        help='address and network of the server (default: %(default)s)')
+    parser.add_argument(
+        '--reply-to',
+        type=parseAddress,
+        default=REPLY_ADDRESS,
+        metavar='HOST:PORT',
+        help='address replies are sent to (default: %s:%s)' % REPLY_ADDRESS)
+    parser.add_argument(
+        '--blocking',
+        action='store_true',
+        help='serve with the blocking socket loop instead of asyncio')
+    parser.add_argument(
+        '--batch',
+        type=int,
+        metavar='SIZE',
+        help='serve in batches of up to SIZE packets on a non-blocking socket')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        metavar='N',
+        help='serve with N processes sharing the port, '
+             'each owning a slice of the pool and of the MACs')
+    parser.add_argument(
+        '--peer',
+        type=parseAddress,
+        metavar='HOST:PORT',
+        help='serve as one of an active/active pair, '
+             'replicating leases to the peer listening on HOST:PORT')
+    parser.add_argument(
+        '--replication-port',
+        type=int,
+        default=REPLICATION_PORT,
+        help='port to receive the replication of the peer on '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--half',
+        type=int,
+        choices=[0, 1],
+        default=0,
+        help='half of the clients and of the pool served in a pair '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--scopes',
+        metavar='FILE',
+        help='also serve the relayed scopes of a JSON file, '
+             'see loadScopes()')
+    parser.add_argument(
+        '--relay-port',
+        type=int,
+        default=RELAY_PORT,
+        help='port relay agents are sent replies on (default: %(default)s)')
+    parser.add_argument(
+        '--journal',
+        metavar='DIR',
+        help='persist leases to a journal in DIR and restore them on start')
+    parser.add_argument(
+        '--reply-cache',
+        type=int,
+        default=DEFAULT_CAPACITY,
+        metavar='SIZE',
+        help='replies kept to resend to retransmissions, 0 to disable '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--history',
+        type=int,
+        metavar='SIZE',
+        help='MACs whose last address is offered to them again, '
+             f'0 to disable (default: {HISTORY_CAPACITY})')
+    parser.add_argument(
+        '--rate-limit',
+        type=float,
+        default=DEFAULT_RATE,
+        metavar='RATE',
+        help='packets per second allowed per MAC, 0 to disable '
+             'the admission filter in front of parsing (default: %(default)s)')
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=DEFAULT_BURST,
+        help='packets a MAC may send at once (default: %(default)s)')
+    parser.add_argument(
+        '--log-level',
+        default='WARNING',
+        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+        help='level of the log, per packet logging starts at INFO '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--events',
+        metavar='FILE',
+        help='write structured events of the server to FILE')
+    parser.add_argument(
+        '--events-format',
+        default='jsonl',
+        choices=['jsonl', 'binary'],
+        help='format of the events (default: %(default)s)')
+    parser.add_argument(
+        '--events-sample',
+        type=int,
+        default=1,
+        metavar='N',
+        help='keep the events of every Nth packet (default: %(default)s)')
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='serve Prometheus metrics on localhost:PORT')
+    args = parser.parse_args()
+    if args.workers is not None and (
+            args.blocking or args.batch is not None
+            or args.events is not None or args.metrics_port is not None
+            or args.history is not None):
+        parser.error(
+            '--workers cannot be combined with --blocking, --batch, '
+            '--events, --metrics-port or --history')
+    if args.peer is not None and (
+            args.blocking or args.batch is not None
+            or args.workers is not None):
+        parser.error(
+            '--peer cannot be combined with --blocking, --batch or --workers')
+    if args.scopes is not None and (
+            args.blocking or args.batch is not None
+            or args.workers is not None or args.peer is not None
+            or args.journal is not None or args.events is not None
+            or args.metrics_port is not None or args.history is not None):
+        parser.error(
+            '--scopes cannot be combined with --blocking, --batch, '
+            '--workers, --peer, --journal, --events, --metrics-port '
+            'or --history')
+
+    logging.basicConfig(
+        level=args.log_level,
+        format='%(levelname)s: %(name)s - %(message)s')
+
+    admission = None
+    if args.rate_limit > 0:
+        admission = AdmissionFilter(args.rate_limit, args.burst)
+
+    replyCache = (
+        ReplyCache(args.reply_cache) if args.reply_cache > 0 else None)
+
+    if args.scopes is not None:
+        scopes = MultiScopeServer(
+            args.interface.ip, replyCache=replyCache, admission=admission)
+        # the network of the server itself
+        scopes.addScope(args.interface)
+        loadScopes(scopes, args.scopes)
+        # the scopes live as long as the process,
+        # spare the garbage collector from walking them
+        gc.freeze()
+        try:
+            asyncio.run(serveScopes(
+                scopes, args.port, args.reply_to, args.relay_port))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if args.workers is not None:
+        serveSharded(
+            args.interface,
+            args.workers,
+            args.port,
+            args.reply_to,
+            args.journal,
+            args.reply_cache,
+            admission)
+        sys.exit(0)
+
+    journal = None if args.journal is None else LeaseJournal(args.journal)
+    events = None
+    if args.events is not None:
+        if args.events_format == 'binary':
+            sink = BinarySink(open(args.events, 'ab'))
+        else:
+            sink = JsonLinesSink(open(args.events, 'a'))
+        events = EventLog(sink, args.events_sample)
+    metrics = None if args.metrics_port is None else ServerMetrics()
+    replication = None
+    if args.peer is not None:
+        replication = LeaseReplication(
+            ('0.0.0.0', args.replication_port), args.peer)
+    history = HISTORY_CAPACITY if args.history is None else args.history
+    server = DhcpServer(
+        args.interface,
+        # the asyncio front end sweeps from an event loop timer
+        # and commits the journal from a background job
+        inlineExpiry=args.blocking or args.batch is not None,
+        journal=journal,
+        inlineCommit=args.blocking or args.batch is not None,
+        events=events,
+        metrics=metrics,
+        poolOffsets=(
+            None if replication is None
+            else poolSlice(args.interface.network, args.half, 2)),
+        replication=replication,
+        replyCache=replyCache,
+        admission=admission,
+        history=LeaseHistory(history) if history > 0 else None)
+    if metrics is not None:
+        serveMetrics(metrics, server, args.metrics_port)
+    try:
+        if replication is not None:
+            asyncio.run(servePair(
+                server,
+                args.port,
+                args.reply_to,
+                replication,
+                args.half,
+                journalJobs(server)))
+        elif args.blocking:
+            serveBlocking(server, args.port, args.reply_to)
+        elif args.batch is not None:
+            serveBatched(
+                server,
+                bindServerSocket(args.port),
+                args.reply_to,
+                args.batch)
+        else:
+            asyncio.run(serve(
+                server, args.port, args.reply_to, journalJobs(server)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+        if events is not None:
+            events.flush()
+            events.sink.file.close()
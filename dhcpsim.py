@@ -0,0 +1,112 @@
+from dhcp.simulation import (
+    DEFAULT_OFF_TIME, DEFAULT_RELEASE_PROBABILITY, DEFAULT_SAMPLE_INTERVAL,
+    DEFAULT_SESSION_TIME, DEFAULT_SWEEP_INTERVAL, Simulation)
+from dhcp.lease_history import LeaseHistory
+
+import argparse
+import logging
+from ipaddress import IPv4Interface
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Simulate clients of the DHCP server in virtual time')
+    parser.add_argument(
+        '--interface',
+        type=IPv4Interface,
+        default=IPv4Interface('10.0.0.1/16'),
+        help='address and network of the server (default: %(default)s)')
+    parser.add_argument(
+        '--clients',
+        type=int,
+        default=10_000,
+        help='simulated clients (default: %(default)s)')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=24 * 3600,
+        metavar='SECONDS',
+        help='virtual time to simulate (default: %(default)s)')
+    parser.add_argument(
+        '--session-time',
+        type=float,
+        default=DEFAULT_SESSION_TIME,
+        metavar='SECONDS',
+        help='mean time a client stays (default: %(default)s)')
+    parser.add_argument(
+        '--off-time',
+        type=float,
+        default=DEFAULT_OFF_TIME,
+        metavar='SECONDS',
+        help='mean time a client is away (default: %(default)s)')
+    parser.add_argument(
+        '--release-probability',
+        type=float,
+        default=DEFAULT_RELEASE_PROBABILITY,
+        help='chance a leaving client releases its lease '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--sweep-interval',
+        type=float,
+        default=DEFAULT_SWEEP_INTERVAL,
+        metavar='SECONDS',
+        help='virtual time between sweeps of the server '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--sample-interval',
+        type=float,
+        default=DEFAULT_SAMPLE_INTERVAL,
+        metavar='SECONDS',
+        help='virtual time between samples of utilization '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--history',
+        type=int,
+        default=0,
+        metavar='SIZE',
+        help='MACs whose last address the server remembers, 0 to disable '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--rapid-commit',
+        action='store_true',
+        help='clients lease with DISCOVER/ACK (option 80)')
+    parser.add_argument(
+        '--boot-storm',
+        action='store_true',
+        help='power every client on at the start')
+    parser.add_argument(
+        '--server-rate',
+        type=int,
+        metavar='PACKETS',
+        help='packets the server handles per second, '
+             'dropping the others (default: unlimited)')
+    parser.add_argument(
+        '--lockstep',
+        action='store_true',
+        help='clients retry after a fixed delay and renew halfway '
+             'through their lease, without backoff or jitter')
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='seed of the random choices of clients (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(levelname)s: %(name)s - %(message)s')
+
+    simulation = Simulation(
+        args.interface,
+        args.clients,
+        args.session_time,
+        args.off_time,
+        args.release_probability,
+        sweepInterval=args.sweep_interval,
+        sampleInterval=args.sample_interval,
+        seed=args.seed,
+        history=LeaseHistory(args.history) if args.history > 0 else None,
+        rapidCommit=args.rapid_commit,
+        bootStorm=args.boot_storm,
+        serverRate=args.server_rate,
+        lockstep=args.lockstep)
+    print(simulation.run(args.duration).report())
@@ -39,20 +39,6 @@ if __name__ == '__main__':
 
     ret2 = server.recv(packet2)
     print()
-
-    packet3 = DhcpPacket.fromArgs(
-        OpCode.REQUEST,
-        8,
-        34,
-        IPv4Address(0),
-        ret1.yourIp,
-        ret1.serverIp,
-        4,
-        MessageType.ACK,
-        leaseTime - 2)
-
-    ret3 = server.recv(packet3)
-    print()
     print()
 
     packet4 = DhcpPacket.fromArgs(
@@ -84,21 +70,6 @@ if __name__ == '__main__':
     ret5 = server.recv(packet5)
     print()
 
-    packet6 = DhcpPacket.fromArgs(
-        OpCode.REQUEST,
-        8,
-        34,
-        IPv4Address(0),
-        ret1.yourIp + 20,
-        ret1.serverIp,
-        4,
-        MessageType.ACK,
-        leaseTime)
-
-    ret6 = server.recv(packet6)
-    print()
-    print()
-
-    # Error in ServerTransaction
+    # the lease of a known MAC is ACKed again
     server.recv(packet1)
     server.recv(packet1)
@@ -0,0 +1,32 @@
+from dhcp.admission import AdmissionFilter
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+
+NOW = 1000.0
+
+
+def datagram(messageType: MessageType, mac: int = 1) -> bytes:
+    """A datagram of messageType sent with the op of a client."""
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, mac, 0, 0, 0, 0, mac, messageType).encode()
+
+
+@pytest.mark.parametrize(
+    'messageType', [MessageType.OFFER, MessageType.ACK, MessageType.NAK])
+def test_server_message_types_are_dropped(messageType):
+    admission = AdmissionFilter()
+    assert not admission.admit(datagram(messageType), NOW)
+    assert admission.fromServers == 1
+
+
+@pytest.mark.parametrize('messageType', [
+    MessageType.DISCOVER,
+    MessageType.REQUEST,
+    MessageType.DECLINE,
+    MessageType.RELEASE,
+    MessageType.INFORM])
+def test_client_message_types_are_admitted(messageType):
+    admission = AdmissionFilter()
+    assert admission.admit(datagram(messageType), NOW)
+    assert admission.dropped == 0
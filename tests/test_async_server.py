@@ -0,0 +1,28 @@
+from dhcp.async_server import runPeriodically
+
+import asyncio
+import threading
+
+
+def test_job_runs_on_the_loop_and_its_write_off_it():
+    calls = []
+
+    def write() -> None:
+        calls.append(('write', threading.get_ident()))
+
+    def job():
+        calls.append(('job', threading.get_ident()))
+        return write
+
+    async def run() -> None:
+        task = asyncio.create_task(runPeriodically(0.001, job))
+        while len(calls) < 6:
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(run())
+
+    loopThread = threading.get_ident()
+    assert [name for name, _ in calls[:6]] == ['job', 'write'] * 3
+    assert all(
+        (thread == loopThread) == (name == 'job') for name, thread in calls)
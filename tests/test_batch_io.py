@@ -0,0 +1,92 @@
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.reply_cache import ReplyCache
+from dhcp.admission import AdmissionFilter
+from dhcp.batch_io import BatchStats, PacketRing, handleBatch
+
+import pytest
+import socket
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+
+
+def discover(mac: int, gatewayIp: int = 0, options=None) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, mac, 0, 0, 0, 0, mac, MessageType.DISCOVER,
+        options=options, gatewayIp=gatewayIp)
+
+
+def datagram(packet: DhcpPacket) -> memoryview:
+    return memoryview(packet.encode())
+
+
+def test_ring_drains_up_to_a_batch():
+    sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    with sender, receiver:
+        receiver.setblocking(False)
+        for size in range(1, 6):
+            sender.send(bytes([size]) * size)
+        ring = PacketRing(3, 16)
+        stats = BatchStats()
+
+        assert [bytes(view) for view in ring.recvBatch(receiver, stats)] \
+            == [b'\x01', b'\x02\x02', b'\x03\x03\x03']
+        assert stats.recvCalls == 3
+        # the second batch reuses the buffers of the first
+        assert [bytes(view) for view in ring.recvBatch(receiver, stats)] \
+            == [b'\x04' * 4, b'\x05' * 5]
+        assert stats.recvCalls == 6
+        assert ring.recvBatch(receiver, stats) == []
+        assert stats.recvCalls == 7
+
+
+def test_ring_size_must_be_positive():
+    with pytest.raises(ValueError):
+        PacketRing(0)
+
+
+def test_recv_many_answers_in_order_despite_bad_packets():
+    server = DhcpServer(INTERFACE)
+    # relay information too long to be echoed back
+    bad = discover(3, int(IPv4Address('10.0.0.254')), {82: {1: bytes(300)}})
+    replies = server.recvMany([discover(1), bad, discover(2)])
+
+    assert len(replies) == 3 and replies[1] is None
+    assert [reply.messageType for reply in (replies[0], replies[2])] \
+        == [MessageType.OFFER, MessageType.OFFER]
+    assert [replies[0].clientHardwareAddr, replies[2].clientHardwareAddr] \
+        == [1, 2]
+    assert replies[0].yourIp != replies[2].yourIp
+
+    requests = [
+        DhcpPacket.fromArgs(
+            OpCode.REQUEST, mac, 0, 0, reply.yourIp, 0, mac,
+            MessageType.REQUEST)
+        for mac, reply in ((2, replies[2]), (1, replies[0]))]
+    acks = server.recvMany(requests)
+    assert [(ack.messageType, ack.clientHardwareAddr) for ack in acks] \
+        == [(MessageType.ACK, 2), (MessageType.ACK, 1)]
+    assert server.leaseCount == 2
+
+
+def test_batch_replies_keep_the_order_of_arrival():
+    server = DhcpServer(
+        INTERFACE, replyCache=ReplyCache(), admission=AdmissionFilter())
+    first = handleBatch(server, [datagram(discover(1))])
+    assert len(first) == 1
+
+    replies = handleBatch(server, [
+        datagram(discover(2)),
+        memoryview(b'not a DHCP packet'),
+        # a retransmission answered from the cache
+        datagram(discover(1)),
+        # dropped by the admission filter
+        datagram(DhcpPacket.fromArgs(
+            OpCode.REPLY, 4, 0, 0, 0, 0, 4, MessageType.OFFER)),
+        datagram(discover(3)),
+    ])
+
+    assert replies[1] == first[0]
+    assert [DhcpPacket.decode(reply).transactionId for reply in replies] \
+        == [2, 1, 3]
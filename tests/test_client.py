@@ -0,0 +1,76 @@
+from dhcp.client_class import MAX_RETRANSMISSIONS, DhcpClient
+from dhcp.client_transaction import ClientTransaction
+from dhcp.transaction import TransactionType
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import random
+from ipaddress import IPv4Address
+from typing import List, Optional
+
+MAC = 0x0a0b0c0d0e0f
+TRANSACTION_ID = 7
+
+
+class Socket:
+    """A socket receiving the given datagrams, then timing out."""
+
+    def __init__(self, datagrams: List[bytes]):
+        self.datagrams = datagrams
+        self.sent: List[bytes] = []
+
+    def settimeout(self, timeout: float) -> None:
+        pass
+
+    def recv(self, size: int) -> bytes:
+        if not self.datagrams:
+            raise TimeoutError()
+        return self.datagrams.pop(0)
+
+    def sendto(self, data: bytes, address) -> None:
+        self.sent.append(data)
+
+
+def exchange(datagrams: List[bytes]) -> tuple:
+    """Run a DISCOVER with the server sending datagrams.
+
+    Returns the reply and the packets sent.
+    """
+
+    # without __init__, which binds a real socket and sleeps
+    client = DhcpClient.__new__(DhcpClient)
+    client.clientSocket = Socket(datagrams)
+    client.random = random.Random(0)
+    client.transaction = ClientTransaction(MAC, TRANSACTION_ID)
+    client.transaction.clientIp = IPv4Address(0)
+    discover = client.transaction.start(TransactionType.DISCOVER)
+    reply: Optional[DhcpPacket] = client._DhcpClient__exchange(discover)
+    return reply, client.clientSocket.sent
+
+
+def ack(transactionId: int = TRANSACTION_ID) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REPLY,
+        transactionId,
+        0,
+        0,
+        IPv4Address('10.0.0.2'),
+        IPv4Address('10.0.0.1'),
+        MAC,
+        MessageType.ACK,
+        600).encode()
+
+
+def test_malformed_datagrams_are_dropped():
+    reply, sent = exchange([b'', b'\x02' * 10, ack()[:-1], ack()])
+
+    assert reply is not None and reply.messageType is MessageType.ACK
+    assert reply.yourIp == IPv4Address('10.0.0.2')
+    # none of them counted as a reply or caused a retransmission
+    assert len(sent) == 1
+
+
+def test_only_malformed_datagrams_time_out():
+    reply, sent = exchange([b'garbage', ack(TRANSACTION_ID + 1)])
+
+    assert reply is None
+    assert len(sent) == MAX_RETRANSMISSIONS + 1
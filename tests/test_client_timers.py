@@ -0,0 +1,59 @@
+from dhcp.client_timers import (
+    MIN_RENEWAL_RETRY, renewalRetry, renewalTimes, retransmissionTimeout,
+    startDelay)
+
+import pytest
+import random
+
+
+class Extreme:
+    """A random.Random always drawing the low or the high bound."""
+
+    def __init__(self, high: bool):
+        self.high = high
+
+    def uniform(self, a: float, b: float) -> float:
+        return b if self.high else a
+
+
+@pytest.mark.parametrize('attempt, timeout', [
+    (0, 4), (1, 8), (2, 16), (3, 32), (4, 64), (5, 64), (100, 64)])
+def test_backoff_doubles_up_to_64_seconds(attempt, timeout):
+    assert retransmissionTimeout(attempt, Extreme(False)) == timeout - 1
+    assert retransmissionTimeout(attempt, Extreme(True)) == timeout + 1
+    rand = random.Random(attempt)
+    for _ in range(100):
+        assert abs(retransmissionTimeout(attempt, rand) - timeout) <= 1
+
+
+def test_renewal_times_are_jittered_by_a_tenth():
+    assert renewalTimes(1000, Extreme(False)) == pytest.approx((450, 787.5))
+    assert renewalTimes(1000, Extreme(True)) == pytest.approx((550, 962.5))
+
+    rand = random.Random(3)
+    renewals = [renewalTimes(1000, rand) for _ in range(1000)]
+    for t1, t2 in renewals:
+        assert 450 <= t1 <= 550 and 787.5 <= t2 <= 962.5
+    # spread over the whole range, not just its middle
+    assert min(t1 for t1, _ in renewals) < 460
+    assert max(t1 for t1, _ in renewals) > 540
+
+
+@pytest.mark.parametrize('timeLeft, retry', [
+    # half the time left
+    (1000, 500),
+    (2 * MIN_RENEWAL_RETRY, MIN_RENEWAL_RETRY),
+    # but at least a minute
+    (100, MIN_RENEWAL_RETRY),
+    # unless less is left
+    (30, 30),
+    (0, 0),
+    (-5, 0),
+])
+def test_renewal_retry(timeLeft, retry):
+    assert renewalRetry(timeLeft) == retry
+
+
+def test_start_delay_is_1_to_10_seconds():
+    assert startDelay(Extreme(False)) == 1
+    assert startDelay(Extreme(True)) == 10
@@ -0,0 +1,139 @@
+from dhcp.server import DEFAULT_TRANSACTION_TIMEOUT, DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.event_log import BinarySink, EventLog, EventType, JsonLinesSink
+
+import io
+import json
+import pytest
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+FIRST_IP = int(IPv4Address('10.0.0.2'))
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record) -> None:
+        self.records.append(record)
+
+    def flush(self) -> None:
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        messageType: MessageType,
+        ip: int = 0) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, transactionId, 0, 0, ip, 0, mac, messageType)
+
+
+def events(sink: ListSink) -> list:
+    return [
+        (EventType(event), MessageType(messageType) if messageType else None)
+        for _, event, messageType, _, _, _ in sink.records]
+
+
+def test_server_emits_the_events_of_a_lease():
+    sink = ListSink()
+    clock = Clock()
+    server = DhcpServer(INTERFACE, clock=clock, events=EventLog(sink))
+    offer = server.recv(packet(1, 7, MessageType.DISCOVER))
+    server.recv(packet(1, 7, MessageType.REQUEST, offer.yourIpInt))
+    server.recv(packet(2, 7, MessageType.RELEASE))
+
+    assert events(sink) == [
+        (EventType.RECV, MessageType.DISCOVER),
+        (EventType.REPLY, MessageType.OFFER),
+        (EventType.RECV, MessageType.REQUEST),
+        (EventType.LEASE, None),
+        (EventType.REPLY, MessageType.ACK),
+        (EventType.RECV, MessageType.RELEASE),
+        (EventType.FREE, None),
+    ]
+    assert sink.records[0] == (
+        clock.now, EventType.RECV.value, MessageType.DISCOVER.value, 1, 7, 0)
+    assert sink.records[3] == (
+        clock.now, EventType.LEASE.value, 0, 0, 7, FIRST_IP)
+
+
+def test_server_emits_timeouts_and_expiries():
+    sink = ListSink()
+    clock = Clock()
+    server = DhcpServer(INTERFACE, clock=clock, events=EventLog(sink))
+    server.recv(packet(1, 7, MessageType.REQUEST, FIRST_IP))
+    server.recv(packet(2, 8, MessageType.DISCOVER))
+    sink.records.clear()
+
+    clock.now += DEFAULT_TRANSACTION_TIMEOUT
+    server.sweep()
+    assert events(sink) == [(EventType.TIMEOUT, None)]
+    assert sink.records[0][3] == 2
+    clock.now += server.leaseTime
+    server.sweep()
+    assert events(sink)[1:] == [(EventType.EXPIRE, None)]
+    assert sink.records[1][4:] == (7, FIRST_IP)
+
+
+def test_packet_events_are_sampled():
+    sink = ListSink()
+    server = DhcpServer(INTERFACE, events=EventLog(sink, 2))
+    for mac in range(1, 5):
+        server.recv(packet(mac, mac, MessageType.DISCOVER))
+        server.recv(packet(
+            mac, mac, MessageType.REQUEST,
+            int(IPv4Address('10.0.0.1')) + mac))
+
+    received = [
+        record for record in sink.records
+        if record[1] == EventType.RECV.value]
+    # every other packet, so the DISCOVERs only
+    assert [record[2] for record in received] \
+        == [MessageType.DISCOVER.value] * 4
+    # but every lease
+    assert events(sink).count((EventType.LEASE, None)) == 4
+    with pytest.raises(ValueError):
+        EventLog(sink, 0)
+
+
+def test_json_lines_sink():
+    file = io.StringIO()
+    log = EventLog(JsonLinesSink(file))
+    log.emit(1.5, EventType.RECV, MessageType.DISCOVER, 3, 4, 5)
+    log.emit(2.5, EventType.FREE, clientHardwareAddr=4, ip=5)
+
+    assert [json.loads(line) for line in file.getvalue().splitlines()] == [
+        {'time': 1.5, 'event': 'RECV', 'messageType': 'DISCOVER',
+            'transactionId': 3, 'mac': 4, 'ip': 5},
+        {'time': 2.5, 'event': 'FREE', 'messageType': None,
+            'transactionId': 0, 'mac': 4, 'ip': 5},
+    ]
+
+
+def test_binary_sink_round_trip():
+    file = io.BytesIO()
+    log = EventLog(BinarySink(file))
+    records = [
+        (1.5, EventType.RECV.value, MessageType.DISCOVER.value, 3,
+            0xffffffffffff, 5),
+        (2.5, EventType.FREE.value, 0, 0, 4, 0xffffffff),
+    ]
+    log.emit(1.5, EventType.RECV, MessageType.DISCOVER, 3, 0xffffffffffff, 5)
+    log.emit(2.5, EventType.FREE, clientHardwareAddr=4, ip=0xffffffff)
+
+    data = file.getvalue()
+    assert len(data) == 2 * BinarySink.record.size
+    assert list(BinarySink.read(data)) == records
+    # a record cut short by a crash is skipped
+    assert list(BinarySink.read(data[:-1])) == records[:1]
@@ -0,0 +1,68 @@
+from dhcp.expiry_heap import ExpiryHeap
+
+import random
+
+
+def test_keys_pop_in_order_of_expiry():
+    heap: ExpiryHeap[int] = ExpiryHeap()
+    for key, expiry in [(1, 30.0), (2, 10.0), (3, 20.0), (4, 10.0)]:
+        heap.schedule(key, expiry)
+
+    assert heap.peekExpiry() == 10.0
+    assert heap.popExpired(5.0) == []
+    assert heap.popExpired(20.0) == [2, 4, 3]
+    assert heap.popExpired(100.0) == [1]
+    assert heap.isEmpty() and heap.peekExpiry() is None
+
+
+def test_rescheduled_and_cancelled_keys_skip_their_dead_entries():
+    heap: ExpiryHeap[int] = ExpiryHeap()
+    heap.schedule(1, 10.0)
+    heap.schedule(2, 20.0)
+    heap.schedule(3, 30.0)
+    # later, earlier, the same expiry again and cancelled
+    heap.schedule(1, 40.0)
+    heap.schedule(3, 5.0)
+    heap.schedule(2, 20.0)
+    assert heap.cancel(2)
+    assert not heap.cancel(2)
+
+    assert len(heap) == 2 and 2 not in heap
+    assert heap.expiryOf(1) == 40.0
+    assert heap.peekExpiry() == 5.0
+    assert heap.popExpired(35.0) == [3]
+    # the dead entry of 1 at 10 is not a live expiry
+    assert heap.peekExpiry() == 40.0
+    assert heap.popExpired(40.0) == [1]
+    assert heap.popExpired(100.0) == []
+
+
+def test_order_survives_compaction():
+    rand = random.Random(7)
+    heap: ExpiryHeap[int] = ExpiryHeap()
+    expiries = {}
+    # enough reschedules and cancels for the heap to be compacted
+    for _ in range(2000):
+        key = rand.randrange(50)
+        if rand.random() < 0.2:
+            assert heap.cancel(key) == (key in expiries)
+            expiries.pop(key, None)
+        else:
+            expiries[key] = rand.uniform(0, 100)
+            heap.schedule(key, expiries[key])
+
+    assert len(heap) == len(expiries)
+    expected = sorted(expiries, key=lambda key: (expiries[key], key))
+    assert heap.popExpired(50.0) == [
+        key for key in expected if expiries[key] <= 50.0]
+    assert heap.popExpired(100.0) == [
+        key for key in expected if expiries[key] > 50.0]
+
+
+def test_schedule_many_replaces_previous_expiries():
+    heap: ExpiryHeap[int] = ExpiryHeap()
+    heap.schedule(1, 5.0)
+    heap.scheduleMany([(3, 30.0), (1, 20.0), (2, 10.0)])
+
+    assert len(heap) == 3
+    assert heap.popExpired(100.0) == [2, 1, 3]
@@ -0,0 +1,120 @@
+from dhcp.ip_pool import IpPool
+
+from ipaddress import IPv4Address, IPv4Network
+
+NETWORK = IPv4Network('10.0.0.0/28')
+SERVER_IP = IPv4Address('10.0.0.1')
+# host addresses but the server's
+HOSTS = 13
+
+
+def invariants(pool: IpPool) -> None:
+    """Check the counts of pool against the state of every offset."""
+    offsets = range(1, NETWORK.num_addresses - 1)
+    free = [offset for offset in offsets if pool.isFree(offset)]
+    held = [offset for offset in offsets if pool.isHeld(offset)]
+    assert len(free) == pool.freeCount
+    assert len(held) == pool.heldCount
+    assert set(held) <= set(free)
+    assert pool.usedCount == pool.size - pool.freeCount
+    assert pool.isExhausted() == (pool.freeCount == 0)
+    assert not pool.isFree(pool.offsetOf(int(SERVER_IP)))
+    if free:
+        # held addresses are handed out last
+        assert pool.isHeld(pool.peek()) == (len(held) == len(free))
+    else:
+        assert pool.peek() is None
+
+
+def test_allocate_lowest_first_and_reuse_freed():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    assert pool.size == HOSTS
+    invariants(pool)
+
+    assert [pool.allocate() for _ in range(3)] == [2, 3, 4]
+    invariants(pool)
+    assert pool.release(3)
+    invariants(pool)
+    assert pool.allocate() == 3
+    invariants(pool)
+
+
+def test_take_and_release_specific_offsets():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    assert pool.take(7)
+    assert not pool.take(7)
+    invariants(pool)
+    assert pool.release(7)
+    assert not pool.release(7)
+    invariants(pool)
+    # excluded addresses are never returned to the pool
+    assert not pool.release(pool.offsetOf(int(SERVER_IP)))
+    invariants(pool)
+
+
+def test_held_addresses_are_allocated_last():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    assert pool.hold(2)
+    assert not pool.hold(2)
+    invariants(pool)
+
+    allocated = [pool.allocate() for _ in range(HOSTS)]
+    assert allocated[-1] == 2
+    assert pool.heldCount == 0
+    invariants(pool)
+
+    assert pool.release(2) and pool.hold(2)
+    assert pool.unhold(2)
+    assert not pool.unhold(2)
+    invariants(pool)
+
+
+def test_taking_a_held_address():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    pool.hold(5)
+    pool.hold(6)
+    assert pool.take(5)
+    assert pool.heldCount == 1 and pool.isHeld(6)
+    invariants(pool)
+
+
+def test_exhaustion():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    for _ in range(HOSTS):
+        assert pool.allocate() is not None
+        invariants(pool)
+    assert pool.isExhausted()
+    assert pool.allocate() is None
+    invariants(pool)
+
+    assert pool.release(9)
+    assert pool.allocate() == 9
+    invariants(pool)
+
+
+def test_offsets_limit_the_addresses_handed_out():
+    pool = IpPool(NETWORK, [SERVER_IP], range(8, 16))
+    assert pool.size == 7
+    allocated = {pool.allocate() for _ in range(pool.size)}
+    assert allocated == set(range(8, 15))
+    assert pool.allocate() is None
+    # the others are treated as excluded
+    assert not pool.isFree(3)
+    assert not pool.take(3)
+    assert not pool.release(3)
+
+
+def test_take_many_keeps_held_addresses_last():
+    pool = IpPool(NETWORK, [SERVER_IP])
+    pool.hold(14)
+    pool.hold(3)
+    pool.take(6)
+
+    assert pool.takeMany([4, 6, 14, 2]) == 3
+    invariants(pool)
+    assert pool.heldCount == 1 and pool.isHeld(3)
+    allocated = [pool.allocate() for _ in range(pool.freeCount)]
+    assert set(allocated) == {3, 5, 7, 8, 9, 10, 11, 12, 13}
+    assert allocated[-1] == 3
+    assert pool.isExhausted()
+    invariants(pool)
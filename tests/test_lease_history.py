@@ -0,0 +1,28 @@
+from dhcp.lease_history import LeaseHistory
+
+import pytest
+
+
+def test_least_recently_recorded_mac_is_evicted():
+    history = LeaseHistory(2)
+    assert history.record(1, 10) is None
+    assert history.record(2, 20) is None
+    # recording 1 again makes 2 the oldest
+    assert history.record(1, 11) is None
+
+    assert history.record(3, 30) == (2, 20)
+    assert len(history) == 2
+    assert history.get(1) == 11 and history.get(2) is None
+
+
+def test_forget():
+    history = LeaseHistory()
+    history.record(1, 10)
+    assert history.forget(1) == 10
+    assert history.forget(1) is None
+    assert len(history) == 0
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        LeaseHistory(0)
@@ -0,0 +1,124 @@
+from dhcp.server import DhcpServer
+from dhcp.lease_journal import LeaseJournal
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+NOW = 1000.0
+
+
+def ip(last: int) -> int:
+    return int(IPv4Address(f'10.0.0.{last}'))
+
+
+def restored(directory: str) -> DhcpServer:
+    return DhcpServer(INTERFACE, journal=LeaseJournal(directory),
+                      clock=lambda: NOW)
+
+
+def test_restore_applies_records_in_order(tmp_path):
+    journal = LeaseJournal(str(tmp_path))
+    journal.compact([
+        (ip(2), 1, NOW + 60),
+        (ip(3), 2, NOW + 60),
+        (ip(4), 3, NOW + 60),
+        (ip(5), 4, NOW - 1)])
+    # released, rebound to another MAC and extended
+    journal.release(ip(2), 1)
+    journal.bind(ip(3), 5, NOW + 120)
+    journal.bind(ip(4), 3, NOW + 300)
+    # outside of the pool
+    journal.bind(int(IPv4Address('10.0.1.2')), 6, NOW + 60)
+    journal.close()
+
+    server = restored(str(tmp_path))
+
+    assert sorted(server.leases()) == [
+        (ip(3), 5, NOW + 120), (ip(4), 3, NOW + 300)]
+    assert server.leaseCount == 2
+    assert server.freeCount == 254 - 1 - 2  # the server's own IP excluded
+    assert server.sweep() == NOW + 120
+
+
+def test_restore_keeps_the_last_lease_of_a_mac(tmp_path):
+    journal = LeaseJournal(str(tmp_path))
+    journal.bind(ip(2), 1, NOW + 60)
+    journal.bind(ip(3), 1, NOW + 30)
+    journal.close()
+
+    server = restored(str(tmp_path))
+
+    assert server.leases() == [(ip(3), 1, NOW + 30)]
+    # the address given up is free again
+    ack = server.recv(DhcpPacket.fromArgs(
+        OpCode.REQUEST, 7, 0, 0, ip(2), 0, 2, MessageType.REQUEST))
+    assert ack is not None and ack.messageType is MessageType.ACK
+    nak = server.recv(DhcpPacket.fromArgs(
+        OpCode.REQUEST, 8, 0, 0, ip(3), 0, 2, MessageType.REQUEST))
+    assert nak is not None and nak.messageType is MessageType.NAK
+
+
+def request(mac: int, last: int) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, mac, 0, 0, ip(last), 0, mac, MessageType.REQUEST)
+
+
+def test_deferred_commit_writes_only_from_commit_journal(tmp_path):
+    server = DhcpServer(
+        INTERFACE,
+        journal=LeaseJournal(str(tmp_path), groupCommitSize=1),
+        clock=lambda: NOW,
+        inlineCommit=False)
+    size = (tmp_path / 'leases.journal').stat().st_size
+    for mac in range(1, 11):
+        assert server.recv(request(mac, mac + 1)).messageType \
+            is MessageType.ACK
+    server.sweep()
+    assert (tmp_path / 'leases.journal').stat().st_size == size
+
+    write = server.commitJournal()
+    assert write is not None and server.commitJournal() is None
+    write()
+
+    assert sorted(restored(str(tmp_path)).leases()) \
+        == sorted(server.leases())
+
+
+def test_records_after_detached_compaction_are_kept(tmp_path):
+    journal = LeaseJournal(str(tmp_path))
+    journal.bind(ip(2), 1, NOW + 60)
+    journal.bind(ip(3), 2, NOW + 60)
+    journal.flush()
+    write = journal.detachCompaction([(ip(2), 1, NOW + 60)])
+    # bound while the snapshot is being written
+    journal.bind(ip(4), 3, NOW + 60)
+    write()
+    journal.close()
+
+    assert sorted(restored(str(tmp_path)).leases()) == [
+        (ip(2), 1, NOW + 60), (ip(4), 3, NOW + 60)]
+
+
+def test_journal_left_by_a_crashed_compaction_is_skipped(tmp_path):
+    journal = LeaseJournal(str(tmp_path))
+    journal.bind(ip(2), 1, NOW + 60)
+    journal.release(ip(2), 1)
+    journal.flush()
+    journal.bind(ip(2), 2, NOW + 60)
+    write = journal.detachCompaction([(ip(2), 2, NOW + 60)])
+    stale = (tmp_path / 'leases.journal').read_bytes()
+    write()
+    journal.close()
+    # crash after replacing the snapshot but before emptying the journal
+    (tmp_path / 'leases.journal').write_bytes(stale)
+
+    assert LeaseJournal(str(tmp_path)).loadColumns().ops == bytes(
+        [LeaseJournal.BIND])
+    server = restored(str(tmp_path))
+    assert server.leases() == [(ip(2), 2, NOW + 60)]
+    # the stale journal was emptied so new records are replayed
+    server.recv(request(3, 3))
+    server.journal.close()
+    assert sorted(restored(str(tmp_path)).leases()) == [
+        (ip(2), 2, NOW + 60), (ip(3), 3, NOW + server.leaseTime)]
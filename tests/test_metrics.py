@@ -0,0 +1,101 @@
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.metrics import Histogram, ServerMetrics
+from dhcp.reply_cache import ReplyCache
+from dhcp.admission import AdmissionFilter
+
+import pytest
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Dict
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+
+
+def datagram(messageType: MessageType, ip: int = 0) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, 1, 0, 0, ip, 0, 1, messageType).encode()
+
+
+def samples(text: str) -> Dict[str, str]:
+    """Values of the metrics text by name and labels."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = value
+    return values
+
+
+def test_render_counts_packets_and_retransmissions():
+    metrics = ServerMetrics(timingSampleEvery=1)
+    server = DhcpServer(
+        INTERFACE,
+        metrics=metrics,
+        replyCache=ReplyCache(),
+        admission=AdmissionFilter())
+    offer = DhcpPacket.decode(
+        server.respond(datagram(MessageType.DISCOVER)))
+    # a retransmission, answered from the reply cache
+    assert server.respond(datagram(MessageType.DISCOVER)) \
+        == offer.encode()
+    server.respond(datagram(MessageType.REQUEST, offer.yourIpInt))
+    # admitted but cut short of its end option
+    with pytest.raises(ValueError):
+        server.respond(datagram(MessageType.RELEASE)[:-1])
+    assert server.respond(
+        DhcpPacket.fromArgs(
+            OpCode.REPLY, 2, 0, 0, 0, 0, 2, MessageType.OFFER).encode()) \
+        is None
+
+    text = metrics.render(server)
+    values = samples(text)
+    assert values['dhcp_packets_received_total{type="DISCOVER"}'] == '2'
+    assert values['dhcp_packets_received_total{type="REQUEST"}'] == '1'
+    assert values['dhcp_packets_received_total{type="RELEASE"}'] == '0'
+    assert values['dhcp_replies_total{type="OFFER"}'] == '2'
+    assert values['dhcp_replies_total{type="ACK"}'] == '1'
+    assert values['dhcp_packets_malformed_total'] == '1'
+    assert values['dhcp_reply_cache_hits_total'] == '1'
+    assert values[
+        'dhcp_packets_not_admitted_total{reason="from_server"}'] == '1'
+    assert values['dhcp_leases'] == '1'
+    assert values['dhcp_transactions'] == '0'
+    assert values['dhcp_free_addresses'] == str(server.freeCount)
+    # every handled packet was timed
+    assert values['dhcp_handle_seconds_count'] == '2'
+    assert values['dhcp_encode_seconds_count'] == '2'
+    assert values['dhcp_parse_seconds_count'] == '3'
+    assert '# TYPE dhcp_packets_received_total counter' in text
+    assert '# TYPE dhcp_leases gauge' in text
+    assert '# TYPE dhcp_handle_seconds histogram' in text
+    assert text.endswith('\n')
+
+
+def test_optional_counters_are_left_out():
+    server = DhcpServer(INTERFACE, replyCache=None)
+    names = {name.split('{')[0] for name in samples(
+        ServerMetrics().render(server))}
+    assert 'dhcp_reply_cache_hits_total' not in names
+    assert 'dhcp_packets_not_admitted_total' not in names
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = ServerMetrics(latencyBuckets=[1e-6, 1e-3])
+    for value in (5e-7, 1e-6, 2e-4, 0.5):
+        metrics.handleTime.observe(value)
+    values = samples(metrics.render(DhcpServer(INTERFACE)))
+
+    assert values['dhcp_handle_seconds_bucket{le="1e-06"}'] == '2'
+    assert values['dhcp_handle_seconds_bucket{le="0.001"}'] == '3'
+    assert values['dhcp_handle_seconds_bucket{le="+Inf"}'] == '4'
+    assert values['dhcp_handle_seconds_count'] == '4'
+    assert float(values['dhcp_handle_seconds_sum']) \
+        == pytest.approx(0.5002015)
+
+
+def test_timing_is_sampled():
+    metrics = ServerMetrics(timingSampleEvery=4)
+    assert [metrics.sampleTiming() for _ in range(9)] \
+        == [True, False, False, False, True, False, False, False, True]
+    with pytest.raises(ValueError):
+        ServerMetrics(timingSampleEvery=0)
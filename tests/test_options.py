@@ -0,0 +1,102 @@
+from dhcp.options import DhcpOptions, encodeOption
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+from ipaddress import IPv4Address
+
+OPTIONS = {
+    1: IPv4Address('255.255.255.0'),
+    3: [IPv4Address('10.0.0.1'), IPv4Address('10.0.0.2')],
+    12: 'host',
+    55: [1, 3, 6],
+    57: 1500,
+    61: b'\x01\x02\x03',
+    82: {1: b'circuit', 2: b'remote'},
+    # unknown options are kept as bytes
+    224: b'\x00\xff',
+}
+
+
+def discover(options=None) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, 1, 0, 0, 0, 0, 1, MessageType.DISCOVER,
+        options=options)
+
+
+def withRawOptions(raw: bytes, terminated: bool = True) -> bytes:
+    """A DISCOVER with raw appended to its options."""
+    packetBytes = discover().encode()
+    assert packetBytes[-1] == 255
+    return packetBytes[:-1] + raw + (b'\xff' if terminated else b'')
+
+
+def test_options_round_trip():
+    decoded = DhcpPacket.decode(discover(OPTIONS).encode())
+    assert {t: decoded.options[t] for t in OPTIONS} == OPTIONS
+
+    # parsed options are copied undecoded
+    again = DhcpPacket.decode(discover(decoded.options).encode())
+    assert {t: again.options[t] for t in OPTIONS} == OPTIONS
+    for optionType in OPTIONS:
+        assert again.options.rawValue(optionType) \
+            == encodeOption(optionType, OPTIONS[optionType])[2:]
+
+
+@pytest.mark.parametrize('raw, terminated', [
+    # longer than the rest of the packet
+    (b'\x0c\x05ab', False),
+    (b'\x0c\x05ab', True),
+    # no length
+    (b'\x0c', False),
+    # no end option
+    (b'\x0c\x02ab', False),
+])
+def test_truncated_options_raise(raw, terminated):
+    with pytest.raises(ValueError):
+        DhcpPacket.decode(withRawOptions(raw, terminated))
+
+
+@pytest.mark.parametrize('raw, optionType', [
+    # an IP of 3 bytes
+    (b'\x01\x03\xff\xff\xff', 1),
+    # routers of 5 bytes
+    (b'\x03\x05\x0a\x00\x00\x01\x0a', 3),
+    # a max message size of 4 bytes
+    (b'\x39\x04\x00\x00\x05\xdc', 57),
+    # a circuit ID of 5 bytes holding 2
+    (b'\x52\x04\x01\x05ab', 82),
+    # a sub option without its length
+    (b'\x52\x01\x01', 82),
+])
+def test_malformed_values_raise_on_access(raw, optionType):
+    packet = DhcpPacket.decode(withRawOptions(raw))
+    with pytest.raises(ValueError):
+        packet.options[optionType]
+    # but can still be copied as is
+    assert packet.options.rawValue(optionType) == raw[2:]
+
+
+def test_malformed_lease_time_raises_on_decode():
+    with pytest.raises(ValueError):
+        DhcpPacket.decode(withRawOptions(b'\x33\x03\x00\x00\x01'))
+
+
+def test_overlong_options_raise():
+    with pytest.raises(ValueError):
+        encodeOption(12, 'x' * 256)
+    with pytest.raises(ValueError):
+        encodeOption(224, bytes(256))
+    assert len(encodeOption(12, 'x' * 255)) == 257
+
+    options = DhcpOptions()
+    options[82] = {1: bytes(200), 2: bytes(60)}
+    with pytest.raises(ValueError):
+        options.encode()
+    with pytest.raises(ValueError):
+        discover(options).encode()
+
+
+@pytest.mark.parametrize('optionType', [0, 255])
+def test_pad_and_end_options_hold_no_value(optionType):
+    with pytest.raises(ValueError):
+        DhcpOptions()[optionType] = b''
@@ -0,0 +1,116 @@
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+from ipaddress import IPv4Address
+
+# everything up to and including the magic cookie,
+# the hardware address taking 8 bytes
+HEADER_SIZE = 232
+
+
+def request() -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        0x12345678,
+        7,
+        IPv4Address('10.0.0.5'),
+        IPv4Address('10.0.0.6'),
+        IPv4Address('10.0.0.1'),
+        0xaabbccddeeff,
+        MessageType.REQUEST,
+        3600,
+        {12: 'host', 55: [1, 3, 6]})
+
+
+def fields(packet: DhcpPacket) -> tuple:
+    return (
+        packet.opCode,
+        packet.transactionId,
+        packet.secondsElapsed,
+        packet.clientIpInt,
+        packet.yourIpInt,
+        packet.serverIpInt,
+        packet.gatewayIpInt,
+        packet.clientHardwareAddr,
+        packet.messageType,
+        packet.leaseTime)
+
+
+def test_decode_round_trip():
+    packet = request()
+    packet.gatewayIp = IPv4Address('10.1.0.1')
+    packetBytes = packet.encode()
+    decoded = DhcpPacket.decode(packetBytes)
+
+    assert fields(decoded) == fields(packet)
+    assert decoded.options[12] == 'host'
+    assert decoded.options[55] == [1, 3, 6]
+    assert decoded.encode() == packetBytes
+    assert DhcpPacket.peekClientHardwareAddr(packetBytes) == 0xaabbccddeeff
+
+
+@pytest.mark.parametrize('messageType', list(MessageType))
+def test_every_message_type_round_trips(messageType):
+    packet = DhcpPacket.fromArgs(
+        OpCode.REPLY, 1, 0, 0, 0, 0, 1, messageType)
+    assert fields(DhcpPacket.decode(packet.encode())) == fields(packet)
+
+
+def test_options_may_be_padded_and_in_any_order():
+    packetBytes = request().encode()
+    # pad, then the hostname before the message type
+    options = b'\x00\x00\x0c\x01x\x35\x01\x01\xff'
+    decoded = DhcpPacket.decode(packetBytes[:HEADER_SIZE] + options)
+
+    assert decoded.messageType is MessageType.DISCOVER
+    assert decoded.leaseTime is None
+    assert decoded.options[12] == 'x'
+
+
+@pytest.mark.parametrize('size', [0, 1, 44, HEADER_SIZE - 1, HEADER_SIZE])
+def test_short_datagrams_raise(size):
+    with pytest.raises(ValueError):
+        DhcpPacket.decode(request().encode()[:size])
+
+
+def test_truncated_datagrams_raise():
+    packetBytes = request().encode()
+    # every cut short of the end option
+    for size in range(HEADER_SIZE, len(packetBytes)):
+        with pytest.raises(ValueError):
+            DhcpPacket.decode(packetBytes[:size])
+
+
+def test_bad_magic_cookie_raises():
+    packetBytes = bytearray(request().encode())
+    packetBytes[HEADER_SIZE - 1] ^= 0xff
+    with pytest.raises(ValueError, match='magic cookie'):
+        DhcpPacket.decode(bytes(packetBytes))
+
+
+@pytest.mark.parametrize('options', [
+    # no message type
+    b'\x0c\x01x\xff',
+    # a message type of 2 bytes
+    b'\x35\x02\x01\x01\xff',
+    # an unknown message type
+    b'\x35\x01\x63\xff',
+    # a lease time of 2 bytes
+    b'\x35\x01\x01\x33\x02\x00\x01\xff',
+])
+def test_malformed_header_options_raise(options):
+    packetBytes = request().encode()[:HEADER_SIZE] + options
+    with pytest.raises(ValueError):
+        DhcpPacket.decode(packetBytes)
+
+
+def test_unknown_op_code_raises():
+    packetBytes = bytearray(request().encode())
+    packetBytes[0] = 3
+    with pytest.raises(ValueError, match='op code'):
+        DhcpPacket.decode(bytes(packetBytes))
+
+
+def test_peek_of_short_datagram_raises():
+    with pytest.raises(ValueError):
+        DhcpPacket.peekClientHardwareAddr(bytes(35))
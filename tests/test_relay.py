@@ -0,0 +1,55 @@
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.batch_io import handleBatch
+
+import pytest
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+RELAY = IPv4Address('10.0.0.254')
+# circuit ID sub option claiming 5 bytes but holding 2
+TRUNCATED = b'\x01\x05ab'
+
+
+def relayedRequest(mac: int, ip: str, relayInfo: bytes) -> DhcpPacket:
+    """A REQUEST of ip as decoded from the wire after a relay agent."""
+    return DhcpPacket.decode(DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        mac,
+        0,
+        IPv4Address(0),
+        IPv4Address(ip),
+        IPv4Address(0),
+        mac,
+        MessageType.REQUEST,
+        options={82: relayInfo},
+        gatewayIp=int(RELAY)).encode())
+
+
+def test_truncated_option_82_is_echoed_undecoded():
+    server = DhcpServer(INTERFACE)
+    request = relayedRequest(1, '10.0.0.2', TRUNCATED)
+    with pytest.raises(ValueError):
+        request.options[82]
+
+    reply = server.recv(request)
+
+    assert reply is not None
+    assert reply.messageType is MessageType.ACK
+    assert server.leaseCount == 1
+    encoded = DhcpPacket.decode(server.encode(reply, request))
+    assert encoded.gatewayIp == RELAY
+    assert encoded.options.rawValue(82) == TRUNCATED
+
+
+def test_truncated_option_82_does_not_drop_the_batch():
+    server = DhcpServer(INTERFACE)
+    datagrams = [
+        memoryview(relayedRequest(mac, f'10.0.0.{mac + 1}', info).encode())
+        for mac, info in ((1, b'\x01\x02ab'), (2, TRUNCATED), (3, b''))]
+
+    replies = [DhcpPacket.decode(reply)
+               for reply in handleBatch(server, datagrams)]
+
+    assert [reply.messageType for reply in replies] == [MessageType.ACK] * 3
+    assert server.leaseCount == 3
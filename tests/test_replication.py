@@ -0,0 +1,208 @@
+from dhcp.server import DhcpServer
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+from dhcp.replication import (
+    LeaseReplication, bucketOf, pairBuckets, servePair)
+from dhcp.sharding import poolSlice
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from ipaddress import IPv4Address, IPv4Interface
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List
+
+import pytest
+
+INTERFACE = IPv4Interface('10.0.0.1/22')
+CLIENTS = 200
+HEARTBEAT_INTERVAL = 0.05
+PEER_TIMEOUT = 0.5
+# time to answer a probe once the peer is known to be down
+PROBE_SLACK = 0.25
+# longest wait for the pair to connect or converge
+DEADLINE = 10
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, 'fork'), reason='the pair is forked')
+
+
+def freePorts(kind: int, count: int) -> List[int]:
+    sockets = [socket.socket(socket.AF_INET, kind) for _ in range(count)]
+    for sock in sockets:
+        sock.bind(('127.0.0.1', 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+def runPairServer(
+        half: int,
+        serverPort: int,
+        replicationPorts: List[int],
+        replyPort: int,
+        control: Connection) -> None:
+    """Serve half of the pair, answering stats requests on control."""
+    logging.disable(logging.CRITICAL)
+    replication = LeaseReplication(
+        ('127.0.0.1', replicationPorts[half]),
+        ('127.0.0.1', replicationPorts[1 - half]),
+        heartbeatInterval=HEARTBEAT_INTERVAL,
+        peerTimeout=PEER_TIMEOUT)
+    server = DhcpServer(
+        INTERFACE,
+        inlineExpiry=False,
+        poolOffsets=poolSlice(INTERFACE.network, half, 2),
+        replication=replication)
+
+    def sendStats() -> None:
+        control.recv()
+        control.send({
+            'leaseCount': server.leaseCount,
+            'recordsSent': replication.recordsSent,
+            'recordsReceived': replication.recordsReceived,
+            'connected': replication.isConnected and replication.peerIsUp})
+
+    async def serve() -> None:
+        asyncio.get_running_loop().add_reader(control.fileno(), sendStats)
+        await servePair(
+            server, serverPort, ('127.0.0.1', replyPort), replication, half)
+
+    asyncio.run(serve())
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        ip: IPv4Address,
+        messageType: MessageType) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        ip,
+        IPv4Address(0),
+        mac,
+        messageType).encode()
+
+
+class Pair:
+    """Both halves of a pair, each in its own process,
+    and a client socket their replies are sent to.
+    """
+
+    def __init__(self):
+        self.serverPorts = freePorts(socket.SOCK_DGRAM, 2)
+        replicationPorts = freePorts(socket.SOCK_STREAM, 2)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(1)
+
+        context = multiprocessing.get_context('fork')
+        self.controls: List[Connection] = []
+        self.processes: List[multiprocessing.Process] = []
+        for half in (0, 1):
+            control, workerControl = context.Pipe()
+            process = context.Process(
+                target=runPairServer,
+                args=(
+                    half,
+                    self.serverPorts[half],
+                    replicationPorts,
+                    self.sock.getsockname()[1],
+                    workerControl),
+                daemon=True)
+            process.start()
+            self.controls.append(control)
+            self.processes.append(process)
+
+    def stats(self, half: int) -> Dict[str, Any]:
+        self.controls[half].send('stats')
+        return self.controls[half].recv()
+
+    def waitFor(self, condition) -> List[Dict[str, Any]]:
+        """Stats of both halves once they satisfy condition."""
+        deadline = time.monotonic() + DEADLINE
+        while True:
+            stats = [self.stats(0), self.stats(1)]
+            if condition(stats) or time.monotonic() > deadline:
+                return stats
+            time.sleep(0.05)
+
+    def sendToBoth(self, data: bytes) -> None:
+        for port in self.serverPorts:
+            self.sock.sendto(data, ('127.0.0.1', port))
+
+    def lease(self, mac: int) -> DhcpPacket:
+        """Lease an address to mac through whichever half answers it."""
+        self.sendToBoth(
+            packet(mac, mac, IPv4Address(0), MessageType.DISCOVER))
+        offer = DhcpPacket.decode(self.sock.recv(4096))
+        assert offer.messageType is MessageType.OFFER
+        self.sendToBoth(packet(
+            mac, mac, offer.yourIp, MessageType.REQUEST))
+        return DhcpPacket.decode(self.sock.recv(4096))
+
+    def close(self) -> None:
+        for process in self.processes:
+            process.kill()
+            process.join()
+        self.sock.close()
+
+
+@pytest.fixture
+def pair():
+    pair = Pair()
+    try:
+        yield pair
+    finally:
+        pair.close()
+
+
+def test_pair_replicates_leases_and_takes_over(pair):
+    stats = pair.waitFor(lambda stats: all(s['connected'] for s in stats))
+    assert all(s['connected'] for s in stats)
+
+    acks = [pair.lease(mac) for mac in range(1, CLIENTS + 1)]
+    assert all(ack.messageType is MessageType.ACK for ack in acks)
+    # both halves leased
+    halves = {
+        bucketOf(mac) in pairBuckets(0) for mac in range(1, CLIENTS + 1)}
+    assert halves == {True, False}
+
+    stats = pair.waitFor(lambda stats: (
+        stats[0]['leaseCount'] == stats[1]['leaseCount'] == CLIENTS
+        and stats[0]['recordsReceived'] == stats[1]['recordsSent']
+        and stats[1]['recordsReceived'] == stats[0]['recordsSent']))
+    assert stats[0]['leaseCount'] == stats[1]['leaseCount'] == CLIENTS
+    assert stats[0]['recordsReceived'] == stats[1]['recordsSent'] > 0
+    assert stats[1]['recordsReceived'] == stats[0]['recordsSent'] > 0
+
+    # freeze the first half so the second only notices by missing heartbeats
+    os.kill(pair.processes[0].pid, signal.SIGSTOP)
+    start = time.monotonic()
+    buckets = pairBuckets(0)
+    mac = CLIENTS + 1
+    pair.sock.settimeout(0.01)
+    while time.monotonic() - start < DEADLINE:
+        while bucketOf(mac) not in buckets:
+            mac += 1
+        pair.sock.sendto(
+            packet(mac, mac, IPv4Address(0), MessageType.DISCOVER),
+            ('127.0.0.1', pair.serverPorts[1]))
+        mac += 1
+        try:
+            reply = DhcpPacket.decode(pair.sock.recv(4096))
+        except socket.timeout:
+            continue
+        if bucketOf(reply.clientHardwareAddr) in buckets:
+            break
+    else:
+        pytest.fail('The second half did not take over the first')
+    takeover = time.monotonic() - start
+    assert takeover <= PEER_TIMEOUT + PROBE_SLACK
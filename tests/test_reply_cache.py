@@ -0,0 +1,95 @@
+from dhcp.server import DhcpServer
+from dhcp.reply_cache import ReplyCache
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+from ipaddress import IPv4Address, IPv4Interface
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+IP = IPv4Address('10.0.0.2')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def packet(transactionId: int, mac: int, messageType: MessageType) -> bytes:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        IP,
+        IPv4Address(0),
+        mac,
+        messageType).encode()
+
+
+def leased(clock: Clock) -> DhcpServer:
+    """A server caching the ACK of a lease of IP to MAC 1."""
+    server = DhcpServer(
+        INTERFACE, replyCache=ReplyCache(), clock=clock, leaseTime=5)
+    ack = server.respond(packet(7, 1, MessageType.REQUEST))
+    assert server.respond(packet(7, 1, MessageType.REQUEST)) == ack
+    assert server.replyCache.hits == 1
+    return server
+
+
+def test_invalidate_drops_only_the_entries_of_a_mac():
+    cache = ReplyCache(capacity=3)
+    cache.put((1, 1, 3), b'a', 0)
+    cache.put((2, 1, 1), b'b', 0)
+    cache.put((3, 2, 3), b'c', 0)
+    # evicts the oldest entry of MAC 1
+    cache.put((4, 3, 3), b'd', 0)
+
+    cache.invalidate(1)
+    cache.invalidate(4)
+
+    assert len(cache) == 2
+    assert cache.get((2, 1, 1), 0) is None
+    assert cache.get((3, 2, 3), 0) == b'c'
+    # expired entries leave the index too
+    assert cache.get((4, 3, 3), 20) is None
+    cache.invalidate(2)
+    cache.invalidate(3)
+    assert len(cache) == 0
+
+
+def test_release_invalidates_the_cached_ack():
+    server = leased(Clock())
+    server.respond(packet(8, 1, MessageType.RELEASE))
+    assert server.replyCache.hits == 1
+    assert len(server.replyCache) == 0
+
+
+def test_decline_invalidates_the_cached_ack():
+    server = leased(Clock())
+    server.respond(packet(8, 1, MessageType.DECLINE))
+    assert len(server.replyCache) == 0
+
+
+def test_expiry_invalidates_the_cached_ack():
+    clock = Clock()
+    server = leased(clock)
+    server.replyCache.timeToLive = 60
+    server.respond(packet(9, 1, MessageType.REQUEST))
+    clock.now += 6
+    server.sweep()
+    assert server.leaseCount == 0
+    assert len(server.replyCache) == 0
+
+
+def test_another_mac_taking_the_address_invalidates_the_cached_ack():
+    server = leased(Clock())
+    server.applyBind(int(IP), 2, server.clock() + 60)
+    assert len(server.replyCache) == 0
+
+
+def test_renewal_keeps_the_cached_ack():
+    server = leased(Clock())
+    server.respond(packet(9, 1, MessageType.REQUEST))
+    assert len(server.replyCache) == 2
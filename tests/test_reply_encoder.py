@@ -0,0 +1,128 @@
+from dhcp.reply_encoder import ReplyEncoder
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+from ipaddress import IPv4Address
+
+SERVER_IP = IPv4Address('10.0.0.1')
+SERVER_OPTIONS = {
+    1: IPv4Address('255.255.255.0'),
+    3: [IPv4Address('10.0.0.1')],
+    6: [IPv4Address('10.0.0.2'), IPv4Address('10.0.0.3')],
+}
+
+
+def reply(
+        messageType: MessageType,
+        transactionId: int = 0x01020304,
+        leaseTime=None,
+        options=None) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REPLY,
+        transactionId,
+        12,
+        IPv4Address('10.0.0.9'),
+        IPv4Address('10.0.0.10'),
+        SERVER_IP,
+        0x0a0b0c0d0e0f,
+        messageType,
+        leaseTime,
+        options)
+
+
+def expected(packet: DhcpPacket) -> bytes:
+    """packet encoded by DhcpPacket.encode() with the server options."""
+    options = dict(SERVER_OPTIONS)
+    options.update(packet.options)
+    return DhcpPacket.fromArgs(
+        packet.opCode,
+        packet.transactionId,
+        packet.secondsElapsed,
+        packet.clientIpInt,
+        packet.yourIpInt,
+        packet.serverIpInt,
+        packet.clientHardwareAddr,
+        packet.messageType,
+        packet.leaseTime,
+        options,
+        packet.gatewayIpInt).encode()
+
+
+@pytest.fixture
+def encodeCalls(monkeypatch) -> list:
+    """Packets encoded by DhcpPacket.encode(), i.e. the fallback."""
+    calls = []
+    encode = DhcpPacket.encode
+
+    def countingEncode(packet):
+        calls.append(packet)
+        return encode(packet)
+
+    monkeypatch.setattr(DhcpPacket, 'encode', countingEncode)
+    return calls
+
+
+@pytest.mark.parametrize('messageType, leaseTime', [
+    (MessageType.OFFER, 600),
+    (MessageType.ACK, 86400),
+    (MessageType.NAK, None),
+])
+def test_template_matches_packet_encode(messageType, leaseTime):
+    encoder = ReplyEncoder(SERVER_IP, SERVER_OPTIONS)
+    packet = reply(messageType, leaseTime=leaseTime)
+    packet.gatewayIp = IPv4Address('10.1.0.1')
+    assert encoder.encode(packet) == expected(packet)
+
+
+def test_template_is_patched_at_fixed_offsets(encodeCalls):
+    encoder = ReplyEncoder(SERVER_IP, SERVER_OPTIONS)
+    encodeCalls.clear()
+    encoded = encoder.encode(reply(MessageType.ACK, leaseTime=0x11223344))
+
+    assert encodeCalls == []
+    # option 53 then option 51 right after the magic cookie
+    assert encoded[228:232] == b'\x63\x82\x53\x63'
+    assert encoded[232:234] == b'\x35\x01'
+    assert encoded[234] == MessageType.ACK.value
+    assert encoded[235:237] == b'\x33\x04'
+    assert encoded[237:241] == b'\x11\x22\x33\x44'
+
+
+def test_reused_templates_keep_no_stale_fields(encodeCalls):
+    encoder = ReplyEncoder(SERVER_IP, SERVER_OPTIONS)
+    packets = [
+        reply(MessageType.OFFER, 1, 600),
+        reply(MessageType.NAK, 2),
+        reply(MessageType.ACK, 3, 300),
+        reply(MessageType.NAK, 4),
+    ]
+    packets[1].clientHardwareAddr = 5
+    packets[2].gatewayIp = IPv4Address('10.1.0.1')
+    encodeCalls.clear()
+
+    encoded = [encoder.encode(packet) for packet in packets]
+    assert encodeCalls == []
+    assert encoded == [expected(packet) for packet in packets]
+
+
+@pytest.mark.parametrize('packet', [
+    # options of its own
+    reply(MessageType.ACK, leaseTime=600, options={80: b''}),
+    reply(MessageType.OFFER, leaseTime=600, options={1: b'\xff\xff\x00\x00'}),
+    # not a reply
+    DhcpPacket.fromArgs(
+        OpCode.REQUEST, 1, 0, 0, 0, 0, 1, MessageType.DISCOVER),
+])
+def test_fallback_to_packet_encode(packet, encodeCalls):
+    encoder = ReplyEncoder(SERVER_IP, SERVER_OPTIONS)
+    encodeCalls.clear()
+    encoded = encoder.encode(packet)
+
+    assert len(encodeCalls) == 1
+    assert encoded == expected(packet)
+
+
+@pytest.mark.parametrize('optionType', [0, 51, 53, 255])
+def test_reserved_options_can_not_be_server_wide(optionType):
+    with pytest.raises(ValueError):
+        ReplyEncoder(SERVER_IP, {optionType: b'\x00'})
@@ -0,0 +1,208 @@
+from dhcp.server import DECLINE_QUARANTINE, RAPID_COMMIT, DhcpServer
+from dhcp.lease_history import LeaseHistory
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Optional
+
+INTERFACE = IPv4Interface('10.0.0.1/24')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def packet(
+        transactionId: int,
+        mac: int,
+        messageType: MessageType,
+        ip: Optional[IPv4Address] = None,
+        options=None) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST,
+        transactionId,
+        0,
+        IPv4Address(0),
+        IPv4Address(0) if ip is None else ip,
+        IPv4Address(0),
+        mac,
+        messageType,
+        options=options)
+
+
+def lease(server: DhcpServer, transactionId: int, mac: int) -> IPv4Address:
+    """Lease an address to mac with DISCOVER/OFFER/REQUEST/ACK."""
+    offer = server.recv(packet(transactionId, mac, MessageType.DISCOVER))
+    assert offer is not None and offer.messageType is MessageType.OFFER
+    ack = server.recv(packet(
+        transactionId, mac, MessageType.REQUEST, offer.yourIp))
+    assert ack is not None and ack.messageType is MessageType.ACK
+    assert ack.yourIp == offer.yourIp
+    return ack.yourIp
+
+
+def test_declined_address_is_quarantined():
+    clock = Clock()
+    server = DhcpServer(
+        INTERFACE, clock=clock, leaseTime=2 * DECLINE_QUARANTINE)
+    declined = lease(server, 1, 1)
+    freeCount = server.freeCount
+
+    assert server.recv(packet(2, 1, MessageType.DECLINE, declined)) is None
+    assert server.leaseCount == 0
+    assert server.freeCount == freeCount
+    assert lease(server, 3, 1) != declined
+    # nor can it be requested directly
+    nak = server.recv(packet(4, 2, MessageType.REQUEST, declined))
+    assert nak is not None and nak.messageType is MessageType.NAK
+
+    clock.now += DECLINE_QUARANTINE
+    server.sweep()
+    assert server.freeCount == freeCount
+    ack = server.recv(packet(5, 2, MessageType.REQUEST, declined))
+    assert ack is not None and ack.messageType is MessageType.ACK
+
+
+def test_declined_address_is_not_offered_again_from_history():
+    server = DhcpServer(INTERFACE, history=LeaseHistory())
+    declined = lease(server, 1, 1)
+    server.recv(packet(2, 1, MessageType.DECLINE, declined))
+
+    assert server.history.get(1) is None
+    assert lease(server, 3, 1) != declined
+
+
+def test_request_for_a_free_address_is_acked():
+    server = DhcpServer(INTERFACE)
+    ip = IPv4Address('10.0.0.20')
+    ack = server.recv(packet(1, 1, MessageType.REQUEST, ip))
+
+    assert ack is not None and ack.messageType is MessageType.ACK
+    assert ack.yourIp == ip
+    assert server.leaseCount == 1 and server.transactionCount == 0
+
+
+def test_request_for_an_address_leased_to_the_same_mac_is_acked():
+    clock = Clock()
+    server = DhcpServer(INTERFACE, clock=clock)
+    ip = lease(server, 1, 1)
+    clock.now += server.leaseTime / 2
+    ack = server.recv(packet(2, 1, MessageType.REQUEST, ip))
+
+    assert ack is not None and ack.messageType is MessageType.ACK
+    assert ack.yourIp == ip and ack.leaseTime == int(server.leaseTime)
+    assert server.leaseCount == 1
+    # the renewed lease outlives the first one
+    clock.now += server.leaseTime * 3 / 4
+    server.sweep()
+    assert server.leaseCount == 1
+
+
+def offeredToAnother(server: DhcpServer) -> IPv4Address:
+    offer = server.recv(packet(1, 2, MessageType.DISCOVER))
+    assert offer is not None and offer.messageType is MessageType.OFFER
+    return offer.yourIp
+
+
+@pytest.mark.parametrize('requested', [
+    lambda server: lease(server, 1, 2),
+    offeredToAnother,
+    lambda server: IPv4Address('10.0.1.5'),
+])
+def test_request_for_an_unavailable_address_is_naked(requested):
+    server = DhcpServer(INTERFACE)
+    ip = requested(server)
+    leaseCount = server.leaseCount
+    nak = server.recv(packet(2, 1, MessageType.REQUEST, ip))
+
+    assert nak is not None and nak.messageType is MessageType.NAK
+    assert int(nak.yourIp) == 0 and nak.clientHardwareAddr == 1
+    assert server.leaseCount == leaseCount
+
+
+def test_discover_with_rapid_commit_is_acked():
+    server = DhcpServer(INTERFACE)
+    ack = server.recv(packet(
+        1, 1, MessageType.DISCOVER, options={RAPID_COMMIT: b''}))
+
+    assert ack is not None and ack.messageType is MessageType.ACK
+    assert RAPID_COMMIT in ack.options
+    assert server.leaseCount == 1 and server.transactionCount == 0
+    # asked again, the lease is acked as is
+    again = server.recv(packet(
+        2, 1, MessageType.DISCOVER, options={RAPID_COMMIT: b''}))
+    assert again is not None and again.messageType is MessageType.ACK
+    assert again.yourIp == ack.yourIp and RAPID_COMMIT in again.options
+    assert server.leaseCount == 1
+
+
+def release(server: DhcpServer, transactionId: int, mac: int) -> None:
+    assert server.recv(packet(transactionId, mac, MessageType.RELEASE)) \
+        is None
+
+
+def offer(server: DhcpServer, transactionId: int, mac: int) -> IPv4Address:
+    reply = server.recv(packet(transactionId, mac, MessageType.DISCOVER))
+    assert reply is not None and reply.messageType is MessageType.OFFER
+    return reply.yourIp
+
+
+def test_returning_mac_is_offered_its_last_address():
+    history = LeaseHistory()
+    server = DhcpServer(INTERFACE, history=history)
+    last = lease(server, 1, 1)
+    release(server, 2, 1)
+    # held for 1 while others lease
+    assert lease(server, 3, 2) != last
+
+    assert offer(server, 4, 1) == last
+    assert history.hits == 1
+
+
+def test_held_address_is_released_when_its_entry_is_evicted():
+    server = DhcpServer(INTERFACE, history=LeaseHistory(1))
+    first = lease(server, 1, 1)
+    second = lease(server, 2, 2)
+    release(server, 3, 1)
+    assert lease(server, 4, 3) not in (first, second)
+    release(server, 5, 3)
+
+    # 1 was evicted by 3, so its address is handed out again
+    assert server.history.get(1) is None
+    assert offer(server, 6, 4) == first
+
+
+def test_eviction_keeps_an_address_held_for_a_later_mac():
+    server = DhcpServer(INTERFACE, history=LeaseHistory(2))
+    held = lease(server, 1, 1)
+    release(server, 2, 1)
+    # taken over by 2 with a REQUEST, then held for 2
+    ack = server.recv(packet(3, 2, MessageType.REQUEST, held))
+    assert ack is not None and ack.messageType is MessageType.ACK
+    release(server, 4, 2)
+    other = lease(server, 5, 3)
+    release(server, 6, 3)
+
+    # the entry of 1 was evicted but the address is still 2's
+    assert server.history.get(1) is None
+    assert offer(server, 7, 4) not in (held, other)
+    assert offer(server, 8, 2) == held
+
+
+def test_held_address_is_handed_out_last():
+    # 10.0.0.2 to 10.0.0.6 besides the server
+    server = DhcpServer(
+        IPv4Interface('10.0.0.1/29'), history=LeaseHistory())
+    held = lease(server, 1, 1)
+    release(server, 2, 1)
+    leased = [lease(server, 2 + mac, mac) for mac in range(2, 6)]
+    assert held not in leased
+
+    # taken by another MAC once nothing else is left
+    assert lease(server, 10, 6) == held
+    assert server.freeCount == 0
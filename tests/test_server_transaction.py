@@ -0,0 +1,78 @@
+from dhcp.server import DhcpServer
+from dhcp.server_transaction import (
+    TRANSITIONS, ServerTransaction, TransactionState)
+from dhcp.packet import DhcpPacket, MessageType, OpCode
+
+import pytest
+from ipaddress import IPv4Address, IPv4Interface
+
+SERVER_IP = int(IPv4Address('10.0.0.1'))
+YOUR_IP = int(IPv4Address('10.0.0.7'))
+LEASE_TIME = 600
+
+
+def packet(messageType: MessageType, mac: int = 5) -> DhcpPacket:
+    return DhcpPacket.fromArgs(
+        OpCode.REQUEST, 9, 3, 0, 0, 0, mac, messageType)
+
+
+def test_transitions_lead_from_discover_to_ack():
+    assert set(TRANSITIONS) == {
+        (TransactionState.NEW, MessageType.DISCOVER),
+        (TransactionState.OFFERED, MessageType.REQUEST)}
+    transaction = ServerTransaction(9, 5, YOUR_IP)
+
+    isOver, offer = transaction.recv(
+        packet(MessageType.DISCOVER), SERVER_IP, LEASE_TIME)
+    assert not isOver and transaction.state is TransactionState.OFFERED
+    assert offer is not None and offer.messageType is MessageType.OFFER
+    assert offer.opCode is OpCode.REPLY
+    assert (offer.transactionId, offer.clientHardwareAddr) == (9, 5)
+    assert offer.yourIpInt == YOUR_IP and offer.serverIpInt == SERVER_IP
+    assert offer.leaseTime == LEASE_TIME
+
+    isOver, ack = transaction.recv(
+        packet(MessageType.REQUEST), SERVER_IP, LEASE_TIME)
+    assert isOver and transaction.state is TransactionState.DONE
+    assert ack is not None and ack.messageType is MessageType.ACK
+    assert ack.yourIpInt == YOUR_IP and ack.leaseTime == LEASE_TIME
+
+
+@pytest.mark.parametrize('messages, unexpected, message', [
+    ([], MessageType.REQUEST, 'Unsupported transaction.'),
+    ([], MessageType.RELEASE, 'Unsupported transaction.'),
+    ([MessageType.DISCOVER], MessageType.DISCOVER,
+     'Expected DHCP REQUEST. Got DISCOVER.'),
+    ([MessageType.DISCOVER], MessageType.DECLINE,
+     'Expected DHCP REQUEST. Got DECLINE.'),
+    ([MessageType.DISCOVER, MessageType.REQUEST], MessageType.REQUEST,
+     'Unsupported transaction.'),
+])
+def test_unexpected_packets_raise(messages, unexpected, message):
+    transaction = ServerTransaction(9, 5, YOUR_IP)
+    for messageType in messages:
+        transaction.recv(packet(messageType), SERVER_IP, LEASE_TIME)
+    state = transaction.state
+
+    with pytest.raises(ValueError) as error:
+        transaction.recv(packet(unexpected), SERVER_IP, LEASE_TIME)
+    assert str(error.value) == message
+    assert transaction.state is state
+
+
+def test_offered_ip_is_unmarked_after_an_error():
+    server = DhcpServer(IPv4Interface('10.0.0.1/24'))
+    freeCount = server.freeCount
+    offer = server.recv(packet(MessageType.DISCOVER))
+    assert offer is not None and offer.messageType is MessageType.OFFER
+    assert server.markedCount == 1 and server.freeCount == freeCount - 1
+
+    # a second DISCOVER of the same transaction
+    nak = server.recv(packet(MessageType.DISCOVER))
+    assert nak is not None and nak.messageType is MessageType.NAK
+    assert nak.transactionId == 9 and nak.clientHardwareAddr == 5
+    assert server.markedCount == 0 and server.transactionCount == 0
+    assert server.freeCount == freeCount and server.leaseCount == 0
+    # and it is offered again
+    again = server.recv(packet(MessageType.DISCOVER, mac=6))
+    assert again is not None and again.yourIp == offer.yourIp
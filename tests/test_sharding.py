@@ -0,0 +1,37 @@
+from dhcp.sharding import ownerOf, poolSlice
+
+import pytest
+from collections import Counter
+from ipaddress import IPv4Network
+
+
+@pytest.mark.parametrize(
+    'network', ['10.0.0.0/24', '10.0.0.0/29', '10.0.0.0/16'])
+@pytest.mark.parametrize('workers', [1, 2, 3, 7])
+def test_pool_slices_partition_the_hosts(network, workers):
+    network = IPv4Network(network)
+    slices = [
+        poolSlice(network, worker, workers) for worker in range(workers)]
+
+    offsets = [offset for part in slices for offset in part]
+    assert offsets == list(range(1, network.num_addresses - 1))
+    sizes = [len(part) for part in slices]
+    assert max(sizes) - min(sizes) <= 1
+
+
+@pytest.mark.parametrize('workers', [1, 2, 3, 8])
+def test_owner_is_stable_and_in_range(workers):
+    macs = range(0x0a0b0c000000, 0x0a0b0c000000 + 4000)
+    owners = [ownerOf(mac, workers) for mac in macs]
+
+    assert owners == [ownerOf(mac, workers) for mac in macs]
+    assert set(owners) == set(range(workers))
+    # MACs of a vendor, differing in their last bits, are spread evenly
+    counts = Counter(owners)
+    assert max(counts.values()) < 1.2 * len(macs) / workers
+
+
+def test_owner_does_not_depend_on_the_process():
+    # unlike hash(), so every worker agrees on the owner of a MAC
+    assert [ownerOf(mac, 4) for mac in (0, 1, 0x0a0b0c0d0e0f)] == [0, 2, 2]
+    assert ownerOf(0xffffffffffff, 4) == 3
@@ -0,0 +1,67 @@
+from dhcp.server_transaction import ServerTransaction
+from dhcp.transaction_table import TransactionTable
+
+import pytest
+
+
+def transaction(transactionId: int) -> ServerTransaction:
+    return ServerTransaction(transactionId, transactionId, 0)
+
+
+def ids(transactions) -> list:
+    return [t.transactionId for t in transactions]
+
+
+def test_full_table_evicts_the_oldest_first():
+    table = TransactionTable(10, 3)
+    for transactionId, curTime in [(1, 0), (2, 1), (3, 2)]:
+        assert table.add(transaction(transactionId), curTime) == []
+
+    assert ids(table.add(transaction(4), 3)) == [1]
+    assert ids(table.add(transaction(5), 4)) == [2]
+    assert len(table) == 3
+    assert 1 not in table and 2 not in table
+    assert all(t in table for t in (3, 4, 5))
+    assert table.peekTimeout() == 12
+
+
+def test_eviction_skips_removed_transactions():
+    table = TransactionTable(10, 3)
+    for transactionId in (1, 2, 3):
+        table.add(transaction(transactionId), transactionId)
+    assert table.remove(1).transactionId == 1
+    assert table.remove(1) is None
+
+    # room was made by the removal
+    assert table.add(transaction(4), 4) == []
+    # 1 is still queued but no longer held, so 2 is the oldest
+    assert ids(table.add(transaction(5), 5)) == [2]
+    assert len(table) == 3
+
+
+def test_readding_an_id_replaces_and_requeues_it():
+    table = TransactionTable(10, 3)
+    for transactionId in (1, 2, 3):
+        table.add(transaction(transactionId), transactionId)
+    replaced = table.add(transaction(1), 4)
+
+    assert ids(replaced) == [1] and table.get(1) is not replaced[0]
+    assert ids(table.add(transaction(5), 5)) == [2]
+    assert ids(table.add(transaction(6), 6)) == [3]
+    assert ids(table.add(transaction(7), 7)) == [1]
+
+
+def test_expired_transactions_pop_in_order():
+    table = TransactionTable(10, 8)
+    for transactionId in (1, 2, 3, 4):
+        table.add(transaction(transactionId), transactionId)
+    table.remove(2)
+
+    assert ids(table.popExpired(12)) == [1]
+    assert ids(table.popExpired(14)) == [3, 4]
+    assert table.peekTimeout() is None and len(table) == 0
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        TransactionTable(10, 0)